@@ -0,0 +1,54 @@
+from itertools import groupby
+from operator import itemgetter
+
+import archive
+import directory
+from schema import day_of
+
+STOP_PROJECTS = ('стоп', 'ушел')
+
+def iter_range(start_ts, end_ts, employee=None, projects=None, after=None, batch_size=1000):
+    """
+    Записи (id, ts, employee, project, comment) за период [start_ts, end_ts] после
+    ключа after=(ts, id) в порядке (ts, id). Читаются пачками по batch_size
+    по тому же ключу, поэтому память не растет с периодом, а транзакция
+    чтения не держится, пока ответ уходит клиенту.
+    """
+    sql = 'SELECT id, ts, employee, project, comment FROM user WHERE ts BETWEEN ? AND ? AND (ts > ? OR id > ?)'
+    params = []
+    if employee:
+        sql += ' AND employee_key = ?'
+        params.append(directory.resolve(employee))
+    if projects:
+        sql += f' AND project IN ({", ".join("?" * len(projects))})'
+        params.extend(projects)
+    sql += ' ORDER BY ts, id LIMIT ?'
+    params.append(batch_size)
+
+    # нижняя граница ts сдвигается к ключу, чтобы каждая пачка начиналась с поиска по индексу
+    after = after or (start_ts - 1, 0)
+    while True:
+        rows = archive.query(sql, [max(start_ts, after[0]), end_ts, after[0], after[1], *params],
+                             day_of(max(start_ts, after[0])), day_of(end_ts), key=itemgetter(1, 0))[:batch_size]
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1][1], rows[-1][0])
+
+def iter_employee_rows(start_ts, end_ts, employee=None):
+    """
+    Один упорядоченный запрос за период [start_ts, end_ts].
+    Строки (id, ts, employee, project, comment, employee_key) отдаются
+    сгруппированными по сотруднику и упорядоченными по времени.
+    """
+    sql = ('SELECT id, ts, employee, project, comment, employee_key '
+           'FROM user WHERE ts BETWEEN ? AND ?')
+    params = [start_ts, end_ts]
+    if employee:
+        sql += ' AND employee_key = ?'
+        params.append(directory.resolve(employee))
+    sql += ' ORDER BY employee_key, ts, id'
+
+    ordered = archive.query(sql, params, day_of(start_ts), day_of(end_ts), key=itemgetter(5, 1, 0))
+    for key, rows in groupby(ordered, key=itemgetter(5)):
+        yield key, list(rows)
@@ -1,51 +1,307 @@
-from flask import Flask, render_template, request
-import sqlite3
+import csv
+import functools
+import io
+import json
+from datetime import datetime
+
+from flask import (Flask, Response, jsonify, make_response, render_template, request, stream_template,
+                   stream_with_context)
+
+from aggregation import iter_range
+import config
+import metrics
+import report_cache
+import reporting
+import storage
+from rollup import project_key
+from bootstrap import init_db
+from schema import DAY_SECONDS, data_version, day_of, day_start, from_ts, to_ts
+from storage import get_connection, query
 
 app = Flask(__name__)
+app.json.ensure_ascii = False
 
-DB_NAME = 'bd_nikos.sql'
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+EXPORT_COLUMNS = ('id', 'time', 'employee', 'project', 'comment')
+EXPORT_CHUNK_ROWS = 200
+
+@app.teardown_appcontext
+def release_connection(exc):
+    """
+    сервер запускает поток на запрос: соединение возвращается в пул storage
+    """
+    storage.release()
 
-def get_data(query, params=()):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute(query, params)
-    data = cur.fetchall()
-    conn.close()
-    return data
+def get_data(sql, params=()):
+    return query(sql, params)
 
-def init_db():
+def conditional(view):
     """
-    Инициализирует базу данных и создает таблицу, если она еще не существует.
+    ETag по версии данных (schema.data_version): пока записи не менялись,
+    повторный запрос получает 304 без выполнения запроса отчета
     """
-    with sqlite3.connect(DB_NAME) as conn:
-        cur = conn.cursor()
-        cur.execute('CREATE TABLE IF NOT EXISTS user('
-                    'id INTEGER PRIMARY KEY AUTOINCREMENT,'
-                    'employee TEXT,'
-                    'project TEXT,'
-                    'time_stamp TEXT,'
-                    'comment TEXT);')
-        conn.commit()
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = data_version(get_connection())
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        # браузер и прокси каждый раз сверяют ETag
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/report')
+@conditional
 def report():
     date = request.args.get('date', '')
     if not date:
         return "Ошибка: укажите дату в параметрах (?date=YYYY-MM-DD)", 400
 
-    records = get_data("SELECT time_stamp, employee, project, comment "
-                       "FROM user WHERE date(time_stamp) = ?",
-                       (date,))
+    try:
+        start_ts = to_ts(datetime.strptime(date, '%Y-%m-%d'))
+    except ValueError:
+        return "Записей на указанную дату не найдено", 404
+
+    records = reporting.records(day_of(start_ts))
 
     if not records:
         return "Записей на указанную дату не найдено", 404
 
     return render_template('report.html', records=records)
 
-if __name__ == '__main__':
+class Page:
+    """
+    Страница записей для потокового шаблона: отдает не больше limit строк
+    и после обхода знает ключ следующей страницы (next) или None.
+    """
+
+    def __init__(self, rows, limit):
+        self.rows = rows
+        self.limit = limit
+        self.next = None
+
+    def __iter__(self):
+        count = 0
+        last_key = None
+        for row in self.rows:
+            if count == self.limit:
+                self.next = f'{last_key[0]}_{last_key[1]}'
+                return
+            count += 1
+            last_key = (row[1], row[0])
+            yield row[0], from_ts(row[1]).strftime('%Y-%m-%d %H:%M'), row[2], row[3], row[4]
+
+def _range_params(args):
+    """
+    фильтры /range из параметров запроса; ValueError при ошибке
+    """
+    start = datetime.strptime(args['start'], '%Y-%m-%d')
+    end = datetime.strptime(args.get('end') or args['start'], '%Y-%m-%d')
+    if end < start:
+        raise ValueError('end раньше start')
+
+    after = None
+    if args.get('after'):
+        ts, record_id = args['after'].split('_')
+        after = (int(ts), int(record_id))
+
+    project = args.get('project', '').strip()
+    return {
+        'start_ts': to_ts(start),
+        'end_ts': to_ts(end) + DAY_SECONDS - 1,
+        'employee': args.get('employee', '').strip() or None,
+        'projects': [project_key(project), project[:1].upper() + project[1:]] if project else None,
+        'after': after,
+    }
+
+def _csv_lines(rows):
+    """
+    CSV частями по EXPORT_CHUNK_ROWS строк
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for i, row in enumerate(rows, 1):
+        writer.writerow((row[0], from_ts(row[1]).isoformat(sep=' '), *row[2:]))
+        if i % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _ndjson_lines(rows):
+    """
+    NDJSON частями по EXPORT_CHUNK_ROWS строк
+    """
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(EXPORT_COLUMNS, (row[0], from_ts(row[1]).isoformat(sep=' '), *row[2:]))),
+                                ensure_ascii=False))
+        if len(lines) == EXPORT_CHUNK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+@app.route('/range')
+@conditional
+def range_report():
+    """
+    Записи за период start..end (YYYY-MM-DD) с фильтрами employee и project.
+    HTML отдается страницами по limit строк с переходом по ключу (ts, id),
+    format=csv|ndjson - выгрузка всего периода потоком.
+    """
+    try:
+        params = _range_params(request.args)
+        limit = max(1, min(int(request.args.get('limit') or PAGE_SIZE), MAX_PAGE_SIZE))
+    except (KeyError, ValueError):
+        return "Ошибка: укажите период (?start=YYYY-MM-DD&end=YYYY-MM-DD)", 400
+
+    export = request.args.get('format', 'html')
+    if export == 'csv':
+        return Response(stream_with_context(_csv_lines(iter_range(**params))), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=report.csv'})
+    if export == 'ndjson':
+        return Response(stream_with_context(_ndjson_lines(iter_range(**params))),
+                        mimetype='application/x-ndjson')
+
+    page = Page(iter_range(**params, batch_size=min(limit + 1, 1000)), limit)
+    query_args = {key: value for key, value in request.args.items() if key not in ('after', 'format')}
+    return Response(stream_template('range.html', page=page, args=query_args))
+
+def _json_value(name, value):
+    """
+    результат reporting для JSON: кортежи - объекты, дни - "ГГГГ-ММ-ДД", секунды - дата и время
+    """
+    if hasattr(value, '_asdict'):
+        return {field: _json_value(field, item) for field, item in value._asdict().items()}
+    if isinstance(value, list):
+        return [_json_value(name, item) for item in value]
+    if value is not None and name == 'day':
+        return day_start(value).strftime('%Y-%m-%d')
+    if value is not None and (name == 'ts' or name.endswith('_ts')):
+        return from_ts(value).isoformat(sep=' ')
+    return value
+
+def _api_days(args):
+    """
+    дни (начало, конец) из параметров start/end или date (ГГГГ-ММ-ДД); ValueError при ошибке
+    """
+    start = args.get('start') or args['date']
+    start_day = day_of(to_ts(datetime.strptime(start, '%Y-%m-%d')))
+    end_day = day_of(to_ts(datetime.strptime(args.get('end') or start, '%Y-%m-%d')))
+    if end_day < start_day:
+        raise ValueError('end раньше start')
+    return start_day, end_day
+
+def api(view):
+    """
+    JSON API: view(start_day, end_day) возвращает результат reporting,
+    неверный период - 400, None - 404
+    """
+    @functools.wraps(view)
+    def wrapper():
+        try:
+            start_day, end_day = _api_days(request.args)
+        except (KeyError, ValueError):
+            return jsonify(error='укажите период: ?start=ГГГГ-ММ-ДД&end=ГГГГ-ММ-ДД или ?date=ГГГГ-ММ-ДД'), 400
+        result = view(start_day, end_day)
+        if result is None:
+            return jsonify(error='записей не найдено'), 404
+        return jsonify(_json_value('', result))
+    return wrapper
+
+@app.route('/api/day')
+@api
+def api_day(start_day, end_day):
+    """
+    интервалы и минуты за день (как /report и /reportAll); без ETag:
+    открытый интервал последней записи растет со временем
+    """
+    employee = request.args.get('employee', '').strip()
+    if employee:
+        return reporting.employee_day(employee, start_day)
+    return reporting.all_employees_day(start_day, request.args.get('all') == '1') or []
+
+@app.route('/api/period')
+@conditional
+@api
+def api_period(start_day, end_day):
+    """
+    минуты по дням за период по сотрудникам справочника (как /periodAll)
+    """
+    return reporting.period_all(start_day, end_day, request.args.get('all') == '1') or []
+
+@app.route('/api/hours')
+@conditional
+@api
+def api_hours(start_day, end_day):
+    """
+    минуты по дням только внутри дня, по сотруднику employee или всем (как /period)
+    """
+    return reporting.period_hours(start_day, end_day, request.args.get('employee', '').strip() or None)
+
+@app.route('/api/projects')
+@conditional
+@api
+def api_projects(start_day, end_day):
+    """
+    минуты по проектам и сотрудникам (как /projectsPeriod)
+    """
+    return reporting.projects(start_day, end_day) or []
+
+@app.route('/api/records')
+@conditional
+@api
+def api_records(start_day, end_day):
+    """
+    все записи за период
+    """
+    return reporting.records(start_day, end_day)
+
+@app.route('/api/now')
+def api_now():
+    """
+    кто сейчас работает (как /now); ?all=1 - также не закрытые с прошлых дней
+    и выключенные; без ETag: минуты растут со временем
+    """
+    return jsonify(_json_value('', reporting.working_now(request.args.get('all') == '1')))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(report_cache.stats()), mimetype='text/plain')
+
+def run_with_webhook():
+    """
+    один процесс отдает HTML-отчеты и принимает обновления Telegram
+    """
+    from webhook import init_webhook
+
     init_db()
-    app.run(debug=True)
\ No newline at end of file
+    init_webhook(app)
+    app.run(host=config.WEB_HOST, port=config.WEB_PORT, threaded=True)
+
+if __name__ == '__main__':
+    if config.BOT_MODE == 'webhook':
+        run_with_webhook()
+    else:
+        # отладочный сервер: python app.py --debug, рабочий режим - serve.py
+        import sys
+
+        if '--debug' in sys.argv:
+            init_db()
+            app.run(debug=True)
+        else:
+            import serve
+
+            serve.main()
\ No newline at end of file
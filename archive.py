@@ -0,0 +1,265 @@
+"""
+Архив закрытых месяцев.
+
+Записи месяца вместе с дневными итогами переносятся из основной БД в отдельный
+файл SQLite (archive/ГГГГ-ММ.sql рядом с БД) и регистрируются в таблице
+archive_partitions. Файлы после создания не меняются и открываются только
+на чтение; запрос за период читает основную БД и лишь те месяцы архива,
+которые пересекаются с периодом, и сливает упорядоченные выборки.
+Записи архивных месяцев только читаются: добавить или удалить их нельзя,
+пока месяц не возвращен командой restore.
+
+    python archive.py run [--months 12] [--db bd_nikos.sql]
+    python archive.py month 2024-01
+    python archive.py restore 2024-01
+    python archive.py list
+"""
+import argparse
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import config
+import storage
+from schema import DAY_SECONDS, create_user_indexes, day_of, from_ts, to_ts
+
+_lock = threading.Lock()
+_connections = {}
+
+def create_registry(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS archive_partitions('
+                 'month TEXT PRIMARY KEY,'
+                 'path TEXT NOT NULL,'
+                 'start_day INTEGER NOT NULL,'
+                 'end_day INTEGER NOT NULL,'
+                 'rows INTEGER NOT NULL,'
+                 'created INTEGER NOT NULL)')
+
+def month_days(month):
+    """
+    первый и последний день месяца "ГГГГ-ММ"
+    """
+    start = datetime.strptime(month, '%Y-%m')
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return day_of(to_ts(start)), day_of(to_ts(end)) - 1
+
+def archive_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(storage.DB_NAME)), config.ARCHIVE_DIR)
+
+def partitions(start_day=None, end_day=None):
+    """
+    месяцы архива (month, path, created), пересекающиеся с днями [start_day, end_day]
+    """
+    if start_day is None:
+        return storage.query('SELECT month, path, created FROM archive_partitions ORDER BY start_day')
+    return storage.query('SELECT month, path, created FROM archive_partitions '
+                         'WHERE start_day <= ? AND end_day >= ? ORDER BY start_day', (end_day, start_day))
+
+def _connection(path, created):
+    """
+    общее соединение только на чтение с файлом архива и его блокировка
+    """
+    key = (path, created)
+    with _lock:
+        item = _connections.get(key)
+        if item is None:
+            uri = f'file:{os.path.join(archive_dir(), path)}?mode=ro&immutable=1'
+            item = _connections[key] = (sqlite3.connect(uri, uri=True, check_same_thread=False),
+                                        threading.Lock())
+        return item
+
+def query(sql, params, start_day, end_day, key=None):
+    """
+    Выполняет запрос в основной БД и в месяцах архива, пересекающихся с днями
+    [start_day, end_day]. key - ключ порядка выборки: упорядоченные выборки
+    сливаются, без key - объединяются по порядку месяцев.
+    """
+    conn = storage.get_connection()
+    # реестр и основная таблица читаются в одном снимке: перенос месяца их меняет вместе
+    own_snapshot = not conn.in_transaction
+    if own_snapshot:
+        conn.execute('BEGIN')
+    try:
+        found = partitions(start_day, end_day)
+        main_rows = storage.query(sql, params)
+    finally:
+        if own_snapshot:
+            conn.execute('COMMIT')
+    if not found:
+        return main_rows
+
+    results = []
+    for _, path, created in found:
+        part, lock = _connection(path, created)
+        with lock:
+            results.append(part.execute(sql, params).fetchall())
+    results.append(main_rows)
+    if key is None:
+        return [row for rows in results for row in rows]
+    return list(heapq.merge(*results, key=key))
+
+def check_writable(days):
+    """
+    ValueError, если один из дней относится к архивному месяцу
+    """
+    days = [day for day in days if day is not None]
+    if not days:
+        return
+    for month, start_day, end_day in storage.query('SELECT month, start_day, end_day FROM archive_partitions '
+                                                   'WHERE start_day <= ? AND end_day >= ?',
+                                                   (max(days), min(days))):
+        if any(start_day <= day <= end_day for day in days):
+            raise ValueError(f'месяц {month} перенесен в архив, записи за него не меняются')
+
+def _create_partition(path, month, start_day, end_day):
+    """
+    копирует записи и итоги месяца из основной БД в новый файл
+    """
+    import rollup
+
+    part = sqlite3.connect(path, isolation_level=None)
+    try:
+        part.execute('PRAGMA journal_mode = OFF')
+        part.execute('CREATE TABLE user('
+                     'id INTEGER PRIMARY KEY,'
+                     'employee TEXT,'
+                     'project TEXT,'
+                     'time_stamp TEXT,'
+                     'comment TEXT,'
+                     'ts INTEGER,'
+                     'employee_key TEXT,'
+                     'day INTEGER)')
+        rollup.create_tables(part)
+
+        part.execute('ATTACH DATABASE ? AS hot', (os.path.abspath(storage.DB_NAME),))
+        part.execute('BEGIN')
+        part.execute('INSERT INTO user SELECT id, employee, project, time_stamp, comment, ts, employee_key, day '
+                     'FROM hot.user WHERE ts BETWEEN ? AND ?',
+                     (start_day * DAY_SECONDS, (end_day + 1) * DAY_SECONDS - 1))
+        part.execute('INSERT INTO daily_totals SELECT * FROM hot.daily_totals WHERE day BETWEEN ? AND ?',
+                     (start_day, end_day))
+        part.execute('INSERT INTO daily_bounds SELECT * FROM hot.daily_bounds WHERE day BETWEEN ? AND ?',
+                     (start_day, end_day))
+        part.execute('COMMIT')
+        part.execute('DETACH DATABASE hot')
+
+        create_user_indexes(part)
+        part.execute('VACUUM')
+        return part.execute('SELECT COUNT(*) FROM user').fetchone()[0]
+    finally:
+        part.close()
+
+def archive_month(month):
+    """
+    Переносит месяц "ГГГГ-ММ" в архив, возвращает число перенесенных записей.
+    Пока идет копирование, основная БД закрыта для записи.
+    """
+    start_day, end_day = month_days(month)
+    if end_day >= day_of(to_ts(datetime.now())):
+        raise ValueError(f'месяц {month} еще не закончился')
+
+    os.makedirs(archive_dir(), exist_ok=True)
+    name = f'{month}.sql'
+    path = os.path.join(archive_dir(), name)
+    with storage.transaction() as conn:
+        if conn.execute('SELECT 1 FROM archive_partitions WHERE month = ?', (month,)).fetchone():
+            raise ValueError(f'месяц {month} уже в архиве')
+        expected = conn.execute('SELECT COUNT(*) FROM user WHERE ts BETWEEN ? AND ?',
+                                (start_day * DAY_SECONDS, (end_day + 1) * DAY_SECONDS - 1)).fetchone()[0]
+        if not expected:
+            return 0
+
+        temporary = path + '.tmp'
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        if _create_partition(temporary, month, start_day, end_day) != expected:
+            os.remove(temporary)
+            raise RuntimeError(f'месяц {month}: число записей в архиве не совпало')
+        os.replace(temporary, path)
+
+        conn.execute('DELETE FROM user WHERE ts BETWEEN ? AND ?',
+                     (start_day * DAY_SECONDS, (end_day + 1) * DAY_SECONDS - 1))
+        conn.execute('DELETE FROM daily_totals WHERE day BETWEEN ? AND ?', (start_day, end_day))
+        conn.execute('DELETE FROM daily_bounds WHERE day BETWEEN ? AND ?', (start_day, end_day))
+        conn.execute('INSERT INTO archive_partitions(month, path, start_day, end_day, rows, created) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', (month, name, start_day, end_day, expected, time.time_ns()))
+    return expected
+
+def restore_month(month):
+    """
+    возвращает месяц из архива в основную БД
+    """
+    row = storage.query_one('SELECT path, created FROM archive_partitions WHERE month = ?', (month,))
+    if row is None:
+        raise ValueError(f'месяца {month} нет в архиве')
+    path = os.path.join(archive_dir(), row[0])
+
+    conn = storage.get_connection()
+    # ATTACH и DETACH внутри транзакции невозможны
+    conn.execute('ATTACH DATABASE ? AS part', (path,))
+    try:
+        with storage.transaction():
+            conn.execute('INSERT INTO user(id, employee, project, time_stamp, comment, ts, employee_key, day) '
+                         'SELECT id, employee, project, time_stamp, comment, ts, employee_key, day FROM part.user')
+            conn.execute('INSERT INTO daily_totals SELECT * FROM part.daily_totals')
+            conn.execute('INSERT INTO daily_bounds SELECT * FROM part.daily_bounds')
+            conn.execute('DELETE FROM archive_partitions WHERE month = ?', (month,))
+    finally:
+        conn.execute('DETACH DATABASE part')
+
+    with _lock:
+        item = _connections.pop(tuple(row), None)
+    if item is not None:
+        item[0].close()
+    os.remove(path)
+
+def closed_months(older_than):
+    """
+    месяцы с записями в основной БД, закончившиеся больше older_than месяцев назад
+    """
+    now = datetime.now()
+    index = now.year * 12 + now.month - 1 - older_than
+    boundary = day_of(to_ts(datetime(index // 12, index % 12 + 1, 1)))
+    first = storage.query_one('SELECT MIN(day) FROM daily_bounds WHERE day < ?', (boundary,))[0]
+    if first is None:
+        return []
+
+    months = []
+    day = first
+    while day < boundary:
+        month = from_ts(day * DAY_SECONDS).strftime('%Y-%m')
+        months.append(month)
+        day = month_days(month)[1] + 1
+    return months
+
+def main():
+    parser = argparse.ArgumentParser(description='Архив закрытых месяцев')
+    parser.add_argument('command', choices=['run', 'month', 'restore', 'list'])
+    parser.add_argument('month', nargs='?')
+    parser.add_argument('--months', type=int, default=config.ARCHIVE_AFTER_MONTHS,
+                        help='переносить месяцы старше стольких месяцев')
+    parser.add_argument('--db', default=None)
+    args = parser.parse_args()
+
+    from bootstrap import init_db
+    if args.db:
+        storage.configure(args.db)
+    init_db()
+
+    if args.command == 'list':
+        for month, path, start_day, end_day, rows, _ in storage.query(
+                'SELECT * FROM archive_partitions ORDER BY start_day'):
+            print(f'{month}: {rows} записей, {path}')
+    elif args.command == 'restore':
+        restore_month(args.month)
+        print(f'{args.month} возвращен из архива')
+    else:
+        months = [args.month] if args.command == 'month' else closed_months(args.months)
+        for month in months:
+            print(f'{month}: перенесено записей {archive_month(month)}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Массовая загрузка (database.import_logs) синтетических записей в пустую БД:
+время и прирост пиковой памяти процесса. Записи генерируются на лету
+(workload.iter_entries), поэтому память растет только за счет загрузки.
+В RSS входят страницы SQLite (mmap, кэш страниц, сортировка при создании
+индексов); с --trace-memory отдельно замеряется пик памяти Python (tracemalloc,
+загрузка при этом медленнее) - он не должен расти с числом записей.
+
+    python benchmarks/bench_import.py --employees 200 --days 730 --drop-indexes
+    python benchmarks/bench_import.py --employees 60 --trace-memory
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from bootstrap import init_db
+from database import import_logs
+from workload import iter_entries
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер массовой загрузки записей')
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--entries-per-day', type=int, default=6)
+    parser.add_argument('--drop-indexes', action='store_true')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--trace-memory', action='store_true', help='пик памяти Python через tracemalloc')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage.configure(os.path.join(directory, 'bench.sql'))
+        init_db()
+        before = peak_rss_mb()
+        if args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        count = import_logs(iter_entries(args.employees, args.days, args.entries_per_day, args.seed),
+                            args.drop_indexes)
+        seconds = time.perf_counter() - started
+        storage.close_all()
+
+    print(f'rows={count} drop_indexes={args.drop_indexes}')
+    print(f'time: {seconds:.1f} s ({count / seconds:.0f} rows/s)')
+    print(f'peak memory: +{peak_rss_mb() - before:.0f} MB')
+    if args.trace_memory:
+        print(f'python peak: {tracemalloc.get_traced_memory()[1] / 2 ** 20:.0f} MB')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Разбор сообщений с записями: сверка ingest.parse_message с прежним разбором
+из add_record на случайных сообщениях и замер скорости обоих.
+
+Сверяются одиночные записи (итог или ошибка должны совпасть) и сообщения
+из нескольких записей через пустую строку (каждая как отдельное сообщение
+прежним разбором, блок короче трех строк после записи не читается). Отличия от прежнего разбора не сверяются: ДДММГГ прежде
+читалась как ДД + месяц из четырех цифр (теперь - strptime('%d%m%y')),
+а цифры других алфавитов (١٢٣٤) в дате и времени теперь не принимаются.
+Прежний разбор и генератор сообщений используются и в tests/test_ingest.py.
+
+    python benchmarks/bench_ingest.py --cases 20000 --repeat 5
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest
+from database import get_nearest_date
+
+EMPLOYEES = ['иван', 'Петр', 'анна', 'ОЛЕГ', 'мария-луиза', 'lev']
+PROJECTS = ['Альфа', 'бета', 'стоп', 'ушел', 'Проект 2', '  Гамма  ']
+COMMENTS = ['', 'созвон', 'выезд на объект', ' два  пробела', 'цифры ١٢٣٤', '1230 ещё время', '(скобки)']
+
+def legacy_parse(text, now):
+    """
+    прежний разбор из add_record без изменений, кроме текущего момента now:
+    (дата, ДДММ, time_stamp, сотрудники, проект, комментарий) или None при ошибке
+    """
+    lines = text.strip().split('\n')
+    if len(lines) < 3:
+        return None
+    date_time_str = lines[0].strip()
+    employees = lines[1].strip().lower().split()
+    project = lines[2].strip()
+
+    match = re.match(r'(\d{4,6})? ?(\d{4})(?: (.+))?', date_time_str)
+    if not match:
+        return None
+
+    date_part = match.group(1) if match.group(1) else now.strftime('%d%m')
+    time_part = match.group(2)
+    comment = match.group(3).strip() if match.group(3) else ''
+
+    try:
+        date_with_year = get_nearest_date(date_part, now)
+        full_date_time = datetime.strptime(f'{date_with_year.strftime("%d%m%Y")} {time_part}', "%d%m%Y %H%M")
+    except ValueError:
+        return None
+    time_stamp = full_date_time.strftime('%Y-%m-%d %H:%M:%S')
+    return date_with_year, date_part, time_stamp, employees, project, comment
+
+def has_full_date(text):
+    """
+    дата записи указана как ДДММГГ
+    """
+    match = re.match(r'(\d{4,6})? ?(\d{4})', text.strip().split('\n')[0].strip())
+    return bool(match and match.group(1) and len(match.group(1)) == 6)
+
+def expected_parse(text, now):
+    """
+    ожидаемый разбор одной записи: прежний, для ДДММГГ - дата по strptime
+    """
+    if not has_full_date(text):
+        return legacy_parse(text, now)
+    lines = text.strip().split('\n')
+    if len(lines) < 3:
+        return None
+    match = re.match(r'(\d{6}) ?(\d{4})(?: (.+))?', lines[0].strip())
+    try:
+        full_date_time = datetime.strptime(match.group(1) + match.group(2), '%d%m%y%H%M')
+    except ValueError:
+        return None
+    return (full_date_time.replace(hour=0, minute=0), match.group(1), full_date_time.strftime('%Y-%m-%d %H:%M:%S'),
+            lines[1].strip().lower().split(), lines[2].strip(), match.group(3).strip() if match.group(3) else '')
+
+def expected_message(blocks, now):
+    """
+    ожидаемый разбор записей через пустую строку: список или None при ошибке
+    """
+    expected = []
+    for block in blocks:
+        lines = block.strip().split('\n')
+        if not block.strip() or expected and len(lines) < 3:
+            # пустой блок уходит в разделитель, короткий после записи - заметка
+            continue
+        entry = expected_parse(block, now)
+        if entry is None:
+            return None
+        expected.append(entry)
+    return expected
+
+def random_date_part(rnd, now):
+    kind = rnd.random()
+    if kind < 0.25:
+        return ''
+    if kind < 0.75:
+        day = now + timedelta(days=rnd.randint(-370, 370))
+        return day.strftime('%d%m')
+    if kind < 0.85:
+        return f'{rnd.randint(0, 39):02d}{rnd.randint(0, 19):02d}'
+    if kind < 0.95:
+        day = now + timedelta(days=rnd.randint(-800, 800))
+        return day.strftime('%d%m%y')
+    return str(rnd.randint(10000, 99999))
+
+def random_time_line(rnd, now):
+    date_part = random_date_part(rnd, now)
+    hour = rnd.choice([rnd.randint(0, 23), rnd.randint(0, 29)])
+    minute = rnd.choice([rnd.randint(0, 59), rnd.randint(0, 99)])
+    time_part = f'{hour:02d}{minute:02d}'
+    if rnd.random() < 0.05:
+        time_part = time_part[:rnd.randint(0, 3)]
+    separator = rnd.choice([' ', ' ', '', '  ', ':'])
+    line = f'{date_part}{separator}{time_part}' if date_part else time_part
+    comment = rnd.choice(COMMENTS)
+    if comment:
+        line += rnd.choice([' ', ' ', '', ' ,']) + comment
+    return rnd.choice(['', ' ', '\t']) + line + rnd.choice(['', ' ', '\r'])
+
+def random_entry(rnd, now):
+    """
+    одна запись без пустых строк внутри; иногда меньше трех строк или лишние строки
+    """
+    lines = [random_time_line(rnd, now),
+             ' '.join(rnd.sample(EMPLOYEES, rnd.choice([1, 1, 1, 2, 3]))),
+             rnd.choice(PROJECTS)]
+    kind = rnd.random()
+    if kind < 0.03:
+        lines = lines[:rnd.randint(1, 2)]
+    elif kind < 0.08:
+        lines.append('лишняя строка')
+    return '\n'.join(lines)
+
+def as_tuple(entry):
+    return entry.date, entry.date_part, entry.time_stamp, entry.employees, entry.project, entry.comment
+
+def parse_or_none(text, now):
+    try:
+        return [as_tuple(entry) for entry in ingest.parse_message(text, now)]
+    except ValueError:
+        return None
+
+def random_now(rnd):
+    start = datetime(2023, 1, 1)
+    return start + timedelta(days=rnd.randint(0, 7 * 365), seconds=rnd.randint(1, 86399))
+
+def fuzz(cases, seed):
+    """
+    сверяет разбор на cases случайных сообщениях, возвращает число сверенных
+    """
+    rnd = random.Random(seed)
+    checked = 0
+    for _ in range(cases):
+        now = random_now(rnd)
+        if rnd.random() < 0.8:
+            text = random_entry(rnd, now)
+            expected = expected_parse(text, now)
+            expected = None if expected is None else [expected]
+        else:
+            blocks = [random_entry(rnd, now) for _ in range(rnd.randint(2, 5))]
+            text = rnd.choice(['\n\n', '\n \n', '\n\n\n']).join(blocks)
+            expected = expected_message(blocks, now)
+        actual = parse_or_none(text, now)
+        if actual != expected:
+            raise SystemExit(f'разбор не совпал:\n{text!r}\nnow={now}\nожидалось {expected}\nполучено {actual}')
+        checked += 1
+    return checked
+
+def measure(func, messages, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in messages:
+            func(text)
+        timings.append((time.perf_counter() - started) / len(messages) * 1e6)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='Сверка и замер разбора сообщений с записями')
+    parser.add_argument('--cases', type=int, default=20000, help='случайных сообщений для сверки')
+    parser.add_argument('--messages', type=int, default=20000, help='сообщений для замера')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    checked = fuzz(args.cases, args.seed)
+    print(f'fuzz: {checked} сообщений совпали')
+
+    rnd = random.Random(args.seed)
+    now = datetime.now()
+    messages = [f'{(now - timedelta(days=rnd.randint(0, 30))).strftime("%d%m")} '
+                f'{rnd.randint(6, 22):02d}{rnd.choice([0, 15, 30, 45]):02d} {rnd.choice(COMMENTS)}'
+                f'\n{rnd.choice(EMPLOYEES)}\n{rnd.choice(PROJECTS)}' for _ in range(args.messages)]
+
+    legacy_us = measure(lambda text: legacy_parse(text, datetime.now()), messages, args.repeat)
+    ingest_us = measure(ingest.parse_message, messages, args.repeat)
+    print(f'legacy: {legacy_us:.2f} us/сообщение')
+    print(f'ingest: {ingest_us:.2f} us/сообщение')
+    print(f'speedup: {legacy_us / ingest_us:.1f}x')
+    if ingest_us >= legacy_us:
+        raise SystemExit('новый разбор не быстрее прежнего')
+
+if __name__ == '__main__':
+    main()
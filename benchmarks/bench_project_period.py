@@ -0,0 +1,116 @@
+"""
+Сравнение прежнего O(n²) распределения минут по проектам (/projectsPeriod)
+с rollup.project_report по дневным итогам на синтетических данных.
+Записи загружаются во временную БД; дневные итоги считаются при записи,
+поэтому замеряется только построение отчета.
+
+    python benchmarks/bench_project_period.py --rows 100000 --employees 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from bootstrap import init_db
+from database import add_logs
+from rollup import project_report
+from schema import DAY_SECONDS, day_of, from_ts, to_ts
+
+PROJECTS = ['Альфа', 'альфа', 'Бета', 'Гамма', 'Дельта', 'стоп', 'ушел', '']
+
+def legacy_project_totals(logs):
+    """
+    прежний алгоритм из project_period без изменений
+    """
+    projects = {}
+    logs.sort(key=lambda x: x[1])
+
+    for i in range(len(logs) - 1):
+        log_id, time_stamp, employee, project, comment = logs[i]
+
+        if not project or project.lower() in ["стоп", "ушел"]:
+            continue
+
+        project_key = project[0].lower() + project[1:]
+
+        if project_key not in projects:
+            projects[project_key] = {'employees': {}, 'total_minutes': 0}
+        if employee not in projects[project_key]['employees']:
+            projects[project_key]['employees'][employee] = 0
+
+        next_time = None
+        for j in range(i + 1, len(logs)):
+            if logs[j][2] == employee:
+                next_time = logs[j][1]
+                break
+
+        if not next_time or next_time.date() != time_stamp.date():
+            continue
+
+        duration = int((next_time - time_stamp).total_seconds() // 60)
+        projects[project_key]['employees'][employee] += duration
+        projects[project_key]['total_minutes'] += duration
+
+    return projects
+
+def generate_rows(count, employees, departed, seed):
+    """
+    синтетические записи (id, ts, employee, project, comment), упорядоченные по времени;
+    departed сотрудников работали только в первый день периода - для прежнего
+    алгоритма это худший случай, их последняя запись просматривает всю выборку
+    """
+    rnd = random.Random(seed)
+    names = [f'сотрудник{i}' for i in range(employees)]
+    start_ts = to_ts(from_ts(0).replace(year=2024))
+    days = max(1, count // (employees * 6))
+    rows = []
+    for record_id in range(1, count + 1):
+        employee = rnd.choice(names)
+        day = 0 if names.index(employee) < departed else rnd.randrange(days)
+        ts = start_ts + day * DAY_SECONDS + rnd.randrange(6 * 3600, 22 * 3600, 60)
+        rows.append((record_id, ts, employee, rnd.choice(PROJECTS), ''))
+    rows.sort(key=lambda row: (row[1], row[0]))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--departed', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows, args.employees, args.departed, args.seed)
+    legacy_rows = [(row[0], from_ts(row[1]), row[2], row[3], row[4]) for row in rows]
+
+    started = time.perf_counter()
+    expected = legacy_project_totals(legacy_rows)
+    legacy_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage.configure(os.path.join(directory, 'bench.sql'))
+        init_db()
+        add_logs([(employee, project, from_ts(ts).strftime('%Y-%m-%d %H:%M:%S'), comment)
+                  for _, ts, employee, project, comment in rows])
+
+        started = time.perf_counter()
+        actual = project_report(day_of(rows[0][1]), day_of(rows[-1][1]))
+        rollup_seconds = time.perf_counter() - started
+        storage.close_all()
+
+    if list(actual.items()) != list(expected.items()) or any(
+            list(actual[key]['employees']) != list(expected[key]['employees']) for key in expected):
+        raise SystemExit('результаты не совпадают')
+
+    print(f'rows={args.rows} employees={args.employees} departed={args.departed}')
+    print(f'legacy: {legacy_seconds:.3f} s')
+    print(f'rollup: {rollup_seconds:.3f} s')
+    print(f'speedup: {legacy_seconds / rollup_seconds:.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Замеры времени всех путей построения отчетов и добавления записей
+на синтетической БД (см. workload.py). Обработчики вызываются с подменой
+TeleBot, которая запоминает исходящие сообщения вместо обращения к сети.
+Результаты пишутся в JSON; с --compare сравниваются с прошлым прогоном.
+
+    python benchmarks/bench_reports.py --employees 50 --days 730 --output bench.json
+    python benchmarks/bench_reports.py --db bench_nikos.sql --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import types
+
+import commands
+import report_cache
+import storage
+from app import app
+from bootstrap import init_db
+import reporting
+from database import get_daily_report
+from schema import day_of, to_ts
+from workload import employee_names, generate
+
+class RecordingBot:
+    """
+    подмена TeleBot: запоминает исходящие сообщения
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    def _record(self, method, text, **kwargs):
+        self.sent.append((method, text))
+
+    def reply_to(self, message, text, **kwargs):
+        self._record('reply_to', text)
+
+    def send_message(self, chat_id, text, **kwargs):
+        self._record('send_message', text)
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        self._record('edit_message_text', text)
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        self._record('answer_callback_query', text)
+
+def make_message(text, chat_id=1):
+    return types.Message.de_json({
+        'message_id': 1,
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private'},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'bench'},
+        'text': text,
+    })
+
+def measure(func, repeat, warm=False):
+    """
+    время вызовов func в мс; без warm кэш отчетов очищается перед каждым вызовом
+    """
+    timings = []
+    result = None
+    if warm:
+        func()
+    for _ in range(repeat):
+        if not warm:
+            report_cache.clear()
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, result
+
+def summary(timings, **extra):
+    return dict({
+        'runs': len(timings),
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }, **extra)
+
+def handler_case(handler, text):
+    """
+    вызов обработчика команды; возвращает число и общий размер исходящих сообщений
+    """
+    def run():
+        bot = RecordingBot()
+        handler(bot, make_message(text))
+        return len(bot.sent), sum(len(sent[1] or '') for sent in bot.sent)
+    return run
+
+def build_cases(reference, employee, period_days):
+    """
+    сценарии замеров: имя -> (функция, кэшируется ли результат)
+    reference - последний день с записями, период заканчивается им
+    """
+    start = max(reference - timedelta(days=period_days - 1), reference.replace(month=1, day=1))
+    ddmm = reference.strftime('%d%m')
+    period = f'{start.strftime("%d%m")}-{ddmm}'
+    date = reference.strftime('%Y-%m-%d')
+    logs = get_daily_report(employee, date)
+    day = day_of(to_ts(reference))
+    client = app.test_client()
+
+    def flask_report():
+        response = client.get(f'/report?date={date}')
+        assert response.status_code == 200, response.status_code
+        return 1, len(response.data)
+
+    return {
+        'format_day': (lambda: (1, len(commands.format_day(reporting.day_report(logs, employee, day)))), False),
+        'get_daily_report': (lambda: (1, len(get_daily_report(employee, date))), False),
+        'report': (handler_case(commands.send_report, f'/report {employee} {reference.strftime("%d%m%y")}'), True),
+        'report_all': (handler_case(commands.report_all, f'/reportAll {ddmm}'), True),
+        'send_period_all': (handler_case(commands.send_period_all, f'/periodAll {period}'), True),
+        'send_period_summary': (handler_case(commands.send_period_summary, f'/period {employee} {period}'), True),
+        'project_period': (handler_case(commands.project_period, f'/projectsPeriod {period}'), True),
+        'get_records_by_date': (handler_case(commands.get_records_by_date, f'/get {reference.strftime("%d%m%y")}'), False),
+        'flask_report': (flask_report, False),
+    }
+
+def bench_add_record(employee, repeat):
+    """
+    добавление записи сообщением; записи ставятся на сегодня, чтобы не
+    менять данные прошлых дней, по которым строятся остальные замеры
+    """
+    now = datetime.now()
+    timings = []
+    for i in range(repeat):
+        minute = i % 60
+        text = f'{now.strftime("%d%m")} {now.hour:02d}{minute:02d} замер\n{employee}\nАльфа'
+        run = handler_case(commands.add_record, text)
+        timings.extend(measure(run, 1, warm=False)[0])
+    return summary(timings)
+
+def run_benchmarks(repeat, period_days, reference):
+    employee = employee_names(1)[0]
+    results = {}
+    for name, (func, cacheable) in build_cases(reference, employee, period_days).items():
+        timings, (messages, size) = measure(func, repeat)
+        results[name] = summary(timings, messages=messages, output_chars=size)
+        if cacheable:
+            timings, _ = measure(func, repeat, warm=True)
+            results[name + ':cached'] = summary(timings)
+    results['add_record'] = bench_add_record(employee, repeat)
+    return results
+
+def compare(results, baseline, threshold, min_ms):
+    """
+    сценарии, медиана которых выросла больше чем на threshold (доля);
+    сценарии быстрее min_ms не сравниваются - там разброс больше самого времени
+    """
+    regressions = {}
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or max(previous['median_ms'], current['median_ms']) < min_ms:
+            continue
+        ratio = current['median_ms'] / previous['median_ms']
+        if ratio > 1 + threshold:
+            regressions[name] = round(ratio, 2)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Замеры отчетов на синтетической БД')
+    parser.add_argument('--db', default=None, help='готовая БД; без нее создается синтетическая')
+    parser.add_argument('--employees', type=int, default=50)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--entries-per-day', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--period-days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', default=None, help='JSON прошлого прогона')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    parser.add_argument('--min-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    db_path = args.db or f'bench_{args.employees}x{args.days}.sql'
+    started = time.perf_counter()
+    if args.db and os.path.exists(args.db):
+        storage.configure(db_path)
+        init_db()
+        rows = None
+    else:
+        rows = generate(db_path, args.employees, args.days, args.entries_per_day, args.seed)
+    generate_seconds = time.perf_counter() - started
+
+    reference = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    results = run_benchmarks(args.repeat, args.period_days, reference)
+
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'db': db_path,
+            'employees': None if rows is None else args.employees,
+            'days': None if rows is None else args.days,
+            'entries_per_day': None if rows is None else args.entries_per_day,
+            'rows': rows,
+            'generate_seconds': round(generate_seconds, 3),
+            'period_days': args.period_days,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for name, result in results.items():
+        print(f'{name:28} {result["median_ms"]:10.3f} ms')
+    print(f'Результаты: {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_ms)
+        for name, ratio in regressions.items():
+            print(f'Замедление {name}: x{ratio}')
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
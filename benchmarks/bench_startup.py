@@ -0,0 +1,133 @@
+"""
+Замер холодного запуска: новый процесс Python импортирует модули бота
+или веб-приложения и проверяет схему БД (bootstrap.init_db). Считается
+полное время процесса до готовности к работе, без подключения к Telegram.
+Медиана сравнивается с бюджетом, при превышении код выхода 1.
+
+    python benchmarks/bench_startup.py --repeat 10 --budget-ms 500
+    python benchmarks/bench_startup.py --importtime bot
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# что импортирует процесс каждого вида после проверки схемы
+TARGETS = {
+    'bot': 'import handlers',
+    'bot_async': 'import bot_async',
+    'web': 'import app',
+}
+
+CHILD = """
+import sys, time
+started = time.perf_counter()
+sys.path[:0] = {path!r}
+import storage
+storage.configure({db!r})
+import bootstrap
+bootstrap.init_db()
+{target}
+print(time.perf_counter() - started)
+"""
+
+def summary(timings, **extra):
+    return dict({
+        'runs': len(timings),
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }, **extra)
+
+def child_path(workdir):
+    """
+    пути модулей для дочернего процесса; без TOKEN.py в репозитории - заглушка токена
+    """
+    path = [REPO]
+    if not os.path.exists(os.path.join(REPO, 'TOKEN.py')):
+        with open(os.path.join(workdir, 'TOKEN.py'), 'w', encoding='utf-8') as f:
+            f.write("TOKEN = '123456:bench'\n")
+        path.append(workdir)
+    return path
+
+def run_child(target, path, db, flags=()):
+    """
+    запускает процесс, возвращает (полное время, время импорта и init_db) в мс и stderr
+    """
+    code = CHILD.format(path=path, db=db, target=TARGETS[target])
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, *flags, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(db))
+    wall = (time.perf_counter() - started) * 1000
+    if result.returncode:
+        raise RuntimeError(f'{target}: {result.stderr.strip()}')
+    return wall, float(result.stdout.split()[-1]) * 1000, result.stderr
+
+def measure(target, path, db, repeat):
+    walls, inner = [], []
+    for _ in range(repeat):
+        wall, ready, _ = run_child(target, path, db)
+        walls.append(wall)
+        inner.append(ready)
+    return summary(walls, ready_median_ms=round(statistics.median(inner), 3))
+
+def importtime(target, path, db, top):
+    """
+    модули с самым долгим собственным временем импорта по -X importtime
+    """
+    _, _, stderr = run_child(target, path, db, ('-X', 'importtime'))
+    modules = []
+    for line in stderr.splitlines():
+        parts = line.split('|')
+        own = parts[0].rsplit(':', 1)[-1].strip()
+        if len(parts) == 3 and own.isdigit():
+            modules.append((int(own) / 1000, parts[2].strip()))
+    return sorted(modules, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер холодного запуска бота и веб-приложения')
+    parser.add_argument('targets', nargs='*', help=f'{", ".join(TARGETS)} (по умолчанию все)')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=500.0,
+                        help='допустимая медиана полного времени запуска')
+    parser.add_argument('--importtime', action='store_true', help='показать самые долгие импорты')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output', default=None, help='записать результаты в JSON')
+    args = parser.parse_args()
+    targets = args.targets or list(TARGETS)
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f'неизвестные процессы: {", ".join(sorted(unknown))}')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = child_path(workdir)
+        db = os.path.join(workdir, 'startup.sql')
+
+        # первый запуск создает схему, остальные проверяют только версию
+        results = {'migrate': summary([run_child(targets[0], path, db)[0]])}
+        for target in targets:
+            results[target] = measure(target, path, db, args.repeat)
+            if args.importtime:
+                for ms, module in importtime(target, path, db, args.top):
+                    print(f'  {target:10} {module:40} {ms:10.1f} ms')
+
+    for name, result in results.items():
+        print(f'{name:10} {result["median_ms"]:10.1f} ms')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'budget_ms': args.budget_ms, 'results': results}, f, ensure_ascii=False, indent=2)
+
+    slow = [name for name in targets if results[name]['median_ms'] > args.budget_ms]
+    for name in slow:
+        print(f'Запуск {name} дольше бюджета {args.budget_ms:.0f} ms')
+    if slow:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
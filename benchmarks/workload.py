@@ -0,0 +1,80 @@
+"""
+Генератор синтетической БД с записями рабочего времени.
+
+    python benchmarks/workload.py bench.sql --employees 50 --days 730
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from bootstrap import init_db
+from database import add_logs
+
+PROJECTS = ['Альфа', 'Бета', 'Гамма', 'Дельта', 'Омега', 'Сигма', 'Каппа', 'Лямбда']
+COMMENTS = ['', '', '', 'созвон', 'доработка', 'выезд на объект']
+BATCH_SIZE = 10000
+
+def employee_names(count):
+    return [f'сотрудник{i:03d}' for i in range(count)]
+
+def iter_entries(employees, days, entries_per_day, seed, end_date=None):
+    """
+    записи (employee, project, time_stamp, comment) за days дней до end_date
+    (по умолчанию - до вчера): рабочий день из entries_per_day отметок
+    и завершающий "стоп"
+    """
+    rnd = random.Random(seed)
+    end_date = end_date or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    names = employee_names(employees)
+    for offset in range(days - 1, -1, -1):
+        day = end_date - timedelta(days=offset)
+        for name in names:
+            if rnd.random() < 0.1:
+                continue
+            minute = rnd.randrange(8 * 60, 10 * 60, 5)
+            for _ in range(entries_per_day):
+                yield (name, rnd.choice(PROJECTS),
+                       (day + timedelta(minutes=minute)).strftime('%Y-%m-%d %H:%M:%S'),
+                       rnd.choice(COMMENTS))
+                minute += rnd.randrange(30, 120, 5)
+            yield name, 'стоп', (day + timedelta(minutes=minute)).strftime('%Y-%m-%d %H:%M:%S'), ''
+
+def generate(db_path, employees=50, days=730, entries_per_day=6, seed=1):
+    """
+    создает БД db_path (существующая перезаписывается), возвращает число записей
+    """
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    storage.configure(db_path)
+    init_db()
+
+    count = 0
+    batch = []
+    for entry in iter_entries(employees, days, entries_per_day, seed):
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            count += len(add_logs(batch))
+            batch = []
+    count += len(add_logs(batch))
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетическая БД для бенчмарков')
+    parser.add_argument('db', nargs='?', default='bench_nikos.sql')
+    parser.add_argument('--employees', type=int, default=50)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--entries-per-day', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    count = generate(args.db, args.employees, args.days, args.entries_per_day, args.seed)
+    print(f'{args.db}: {count} записей')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Подготовка процесса к работе: схема БД и локаль.
+
+Схема БД одна для бота, веб-приложения и утилит и описана миграциями
+schema.MIGRATIONS; примененная версия хранится в самой БД (PRAGMA user_version).
+При запуске сверяется только эта версия, миграции выполняются лишь для
+устаревшей БД, так что перезапуск процесса не создает таблиц заново.
+Тяжелые модули загружаются при первом использовании;
+время запуска - benchmarks/bench_startup.py.
+"""
+import logging
+import time
+
+import storage
+from schema import SCHEMA_VERSION, migrate
+
+logger = logging.getLogger(__name__)
+
+LOCALE = 'ru_RU.UTF-8'
+
+def init_db():
+    """
+    приводит схему БД к текущей версии, возвращает версию
+    """
+    conn = storage.get_connection()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version == SCHEMA_VERSION:
+        return version
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f'схема БД {storage.DB_NAME} версии {version} новее кода ({SCHEMA_VERSION})')
+    if storage.READ_ONLY:
+        raise RuntimeError(f'схема БД {storage.DB_NAME} версии {version} устарела, '
+                           f'обновить ее может только процесс с записью')
+
+    started = time.perf_counter()
+    migrate(conn)
+    logger.info('Схема БД %s обновлена с версии %s до %s за %.2f с',
+                storage.DB_NAME, version, SCHEMA_VERSION, time.perf_counter() - started)
+    return SCHEMA_VERSION
+
+def setup_locale():
+    """
+    русская локаль для дат; если ее нет в системе, остается текущая
+    """
+    import locale
+
+    try:
+        locale.setlocale(locale.LC_TIME, LOCALE)
+    except locale.Error:
+        logger.warning('Локаль %s недоступна', LOCALE)
@@ -1,9 +1,25 @@
-from handlers import bot
-from database import init_db
+import bootstrap
+import config
+import metrics
+import scheduler
 
 if __name__ == "__main__":
-    init_db()
-    print("База данных инициализирована. Бот запущен.")
+    metrics.configure_logging(config.LOG_FILE, config.LOG_LEVEL, config.LOG_SAMPLE_EVERY)
+    bootstrap.setup_locale()
+    bootstrap.init_db()
 
-    bot.infinity_polling(timeout=10, long_polling_timeout=5)
+    from handlers import bot, outbox
+
+    scheduler.start(outbox)
+
+    if config.BOT_MODE == 'webhook':
+        from app import run_with_webhook
+
+        print("Бот запущен в режиме webhook.")
+        run_with_webhook()
+    else:
+        print("База данных инициализирована. Бот запущен.")
+
+        bot.remove_webhook()
+        bot.infinity_polling(timeout=10, long_polling_timeout=5)
 
@@ -0,0 +1,204 @@
+"""
+Асинхронный запуск бота на AsyncTeleBot.
+
+Команды те же, что в handlers.py: логика из commands.py выполняется в пуле
+потоков вместе с обращениями к SQLite, а ответы отправляются асинхронно,
+поэтому медленный отчет или сетевой запрос не задерживает других
+пользователей. Обновления одного чата обрабатываются по очереди.
+
+    python bot_async.py
+"""
+import asyncio
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+import bootstrap
+import commands
+import config
+import metrics
+import outbound
+import scheduler
+from dispatch import update_chat_id
+from TOKEN import TOKEN
+
+if config.TELEGRAM_API_URL:
+    asyncio_helper.API_URL = config.TELEGRAM_API_URL.rstrip('/') + '/bot{0}/{1}'
+
+bot = AsyncTeleBot(TOKEN)
+executor = ThreadPoolExecutor(config.ASYNC_WORKERS, thread_name_prefix='bot-db')
+_chat_locks = weakref.WeakValueDictionary()
+limiter = outbound.Limiter()
+
+class CallRecorder:
+    """
+    подставляется в обработчик вместо TeleBot и запоминает вызовы API по порядку
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return record
+
+async def run(handler, update, *args):
+    """
+    выполняет синхронный обработчик в пуле потоков и отправляет его ответы
+    """
+    chat_id = update_chat_id(update)
+    lock = _chat_locks.get(chat_id)
+    if lock is None:
+        lock = _chat_locks[chat_id] = asyncio.Lock()
+
+    async with lock:
+        recorder = CallRecorder()
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                executor, metrics.timed(metrics.HANDLER, handler.__name__)(handler), recorder, update, *args)
+        finally:
+            await deliver(chat_id, recorder.calls, handler.__name__)
+
+async def deliver(chat_id, calls, handler=None):
+    """
+    отправляет вызовы обработчика: длинный текст частями, короткие сообщения
+    подряд - одним, с ограничением частоты и повтором после 429 и сетевых ошибок;
+    время отправки засчитывается обработчику handler (metrics)
+    """
+    for name, args, kwargs, _ in outbound.plan(calls):
+        if name in outbound.MESSAGE_METHODS:
+            await asyncio.sleep(limiter.reserve(chat_id))
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                await getattr(bot, name)(*args, **kwargs)
+                metrics.charge(handler, (time.perf_counter() - started) * 1000,
+                               int(name in outbound.MESSAGE_METHODS))
+                break
+            except Exception as exc:
+                delay = outbound.retry_delay(exc, attempt)
+                if delay is None or attempt >= config.OUTBOUND_RETRIES:
+                    outbound.logger.warning('Сообщение в чат %s не отправлено (%s): %s', chat_id, name, exc)
+                    break
+                attempt += 1
+                await asyncio.sleep(delay)
+
+@bot.message_handler(commands=['start'])
+async def start_command(message):
+    await run(commands.start_command, message)
+
+@bot.message_handler(content_types=['text'], func=lambda message: not (message.text or '').startswith('/'))
+async def add_record(message):
+    await run(commands.add_record, message)
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith('delete_'))
+async def delete_record_callback(call):
+    await run(commands.delete_record_callback, call)
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith('edit_'))
+async def callback_edit(call):
+    await run(commands.callback_edit, call)
+
+@bot.message_handler(commands=['get'])
+async def get_records_by_date(message):
+    await run(commands.get_records_by_date, message)
+
+@bot.message_handler(commands=['report'])
+async def send_report(message):
+    await run(commands.send_report, message)
+
+@bot.message_handler(commands=['reportAll'])
+async def report_all(message):
+    await run(commands.report_all, message)
+
+@bot.message_handler(commands=['periodAll'])
+async def send_period_all(message):
+    await run(commands.send_period_all, message)
+
+@bot.message_handler(commands=['period'])
+async def send_period_summary(message):
+    await run(commands.send_period_summary, message)
+
+@bot.message_handler(commands=['projectsPeriod'])
+async def project_period(message):
+    await run(commands.project_period, message)
+
+@bot.message_handler(commands=['delete'])
+async def delete_record(message):
+    await run(commands.delete_record, message)
+
+@bot.message_handler(commands=['stats'])
+async def stats_command(message):
+    await run(commands.stats_command, message)
+
+@bot.message_handler(commands=['subscribe'])
+async def subscribe_command(message):
+    await run(commands.subscription_command, message, True)
+
+@bot.message_handler(commands=['unsubscribe'])
+async def unsubscribe_command(message):
+    await run(commands.subscription_command, message, False)
+
+@bot.message_handler(commands=['activate'])
+async def activate_employee(message):
+    await run(commands.set_employee_active, message, True)
+
+@bot.message_handler(commands=['deactivate'])
+async def deactivate_employee(message):
+    await run(commands.set_employee_active, message, False)
+
+@bot.message_handler(commands=['alias'])
+async def add_alias(message):
+    await run(commands.add_alias, message)
+
+@bot.message_handler(commands=['cancel'])
+async def cancel_edit(message):
+    await run(commands.cancel_edit, message)
+
+@bot.message_handler(commands=['now'])
+async def working_now(message):
+    await run(commands.working_now, message)
+
+@bot.message_handler(content_types=['document'])
+async def import_document(message):
+    loop = asyncio.get_running_loop()
+
+    async def download():
+        file_info = await bot.get_file(message.document.file_id)
+        return await bot.download_file(file_info.file_path)
+
+    # файл скачивается циклом событий по запросу обработчика из пула потоков
+    await run(commands.import_document, message,
+              lambda: asyncio.run_coroutine_threadsafe(download(), loop).result())
+
+@bot.message_handler(commands=['help'])
+async def help_command(message):
+    await run(commands.help_command, message)
+
+class ThreadSender:
+    """
+    send_message для потоков вне цикла событий (рассылка планировщика)
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+
+    def send_message(self, chat_id, text, **kwargs):
+        asyncio.run_coroutine_threadsafe(
+            deliver(chat_id, [('send_message', (chat_id, text), kwargs)]), self.loop).result()
+
+async def main():
+    bootstrap.setup_locale()
+    await asyncio.get_running_loop().run_in_executor(executor, bootstrap.init_db)
+    scheduler.start(ThreadSender(asyncio.get_running_loop()))
+    print("База данных инициализирована. Бот запущен (asyncio).")
+
+    await bot.infinity_polling(timeout=10)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,848 @@
+"""
+Логика команд бота без привязки к способу запуска.
+
+Каждый обработчик принимает первым аргументом объект с методами TeleBot
+(reply_to, send_message, answer_callback_query, edit_message_text):
+в синхронном боте это очередь отправки outbound.Outbox, в асинхронном -
+запись вызовов, которые затем выполняет AsyncTeleBot. Длинный текст
+отправляется одним вызовом: на части его делит outbound.
+"""
+import io
+import logging
+from datetime import datetime
+
+from telebot import types
+
+import config
+import directory
+import ingest
+import metrics
+import report_cache
+import reporting
+import scheduler
+import sessions
+from schema import day_of, day_start, hhmm, to_ts
+from database import (add_logs, get_daily_report, get_daily_reports, delete_record_by_id,
+                      infer_year, get_nearest_date, get_record_by_id, update_record)
+
+logger = logging.getLogger(__name__)
+
+def start_command(bot, message):
+    bot.reply_to(message, f'Привет! Я бот для управления записями в базе данных.')
+
+def add_record(bot, message):
+    """
+    Добавление записей из сообщения в БД (ingest) + кнопки;
+    в режиме изменения (sessions) - изменение записи
+    """
+    try:
+        entries = ingest.parse_message(message.text or '')
+    except ValueError as ve:
+        bot.reply_to(message, str(ve))
+        return
+
+    try:
+        record_id = sessions.editing(message.chat.id, _user_id(message))
+        if record_id is not None:
+            if len(entries) != 1:
+                bot.reply_to(message, 'При изменении записи отправьте одну запись '
+                                      '(/cancel - выйти из режима изменения).')
+                return
+            entry = entries[0]
+            _update_record(bot, message, record_id, entry.employees, entry.project, entry.time_stamp, entry.comment)
+            return
+
+        added = [(entry, employee) for entry in entries for employee in entry.employees]
+        record_ids = add_logs([(employee, entry.project, entry.time_stamp, entry.comment)
+                               for entry, employee in added])
+        if not record_ids:
+            return
+        if len(entries) > 1:
+            _reply_added_records(bot, message, added, record_ids)
+            return
+
+        entry = entries[0]
+        employees = entry.employees
+        daily_logs = get_daily_reports(employees, entry.date.strftime('%Y-%m-%d'))
+
+        keyboard = types.InlineKeyboardMarkup()
+        reports = []
+        for employee, record_id in zip(employees, record_ids):
+            reports.append(_added_record_report(daily_logs.get(directory.resolve(employee)),
+                                                employee, entry.date, entry.date_part))
+            suffix = f' {employee}' if len(record_ids) > 1 else ''
+            keyboard.row(*_record_buttons(record_id, suffix))
+
+        if len(record_ids) == 1:
+            text = (f'Запись добавлена: '
+                    f'ID: {record_ids[0]}'
+                    f'\nСотрудник: {employees[0]}'
+                    f'\nПроект: {entry.project}'
+                    f'\nДата и время: {entry.time_stamp}'
+                    f'\n\n{reports[0]}')
+        else:
+            added = '\n'.join(f'ID: {record_id} - {employee}'
+                              for employee, record_id in zip(employees, record_ids))
+            text = (f'Записи добавлены:\n{added}'
+                    f'\nПроект: {entry.project}'
+                    f'\nДата и время: {entry.time_stamp}'
+                    f'\n\n' + '\n\n'.join(reports))
+
+        bot.reply_to(message, text, reply_markup=keyboard)
+
+    except ValueError as ve:
+        bot.reply_to(message, f'Ошибка в формате даты или времени: {ve}')
+    except Exception as exc:
+        bot.reply_to(message, f'Ошибка: {exc}')
+
+def _reply_added_records(bot, message, added, record_ids):
+    """
+    ответ на сообщение с несколькими записями: список записей с кнопками
+    и отчет за день по каждому сотруднику и дню
+    """
+    keyboard = types.InlineKeyboardMarkup()
+    lines = []
+    days = {}
+    for (entry, employee), record_id in zip(added, record_ids):
+        lines.append(f'ID: {record_id} - {employee}, {entry.project}, {entry.time_stamp}')
+        keyboard.row(*_record_buttons(record_id, f' {record_id}'))
+        days.setdefault((entry.date, entry.date_part), {}).setdefault(directory.resolve(employee), employee)
+
+    reports = []
+    for (report_date, date_part), employees in days.items():
+        daily_logs = get_daily_reports(employees.values(), report_date.strftime('%Y-%m-%d'))
+        for key, employee in employees.items():
+            reports.append(_added_record_report(daily_logs.get(key), employee, report_date, date_part))
+
+    bot.reply_to(message, 'Записи добавлены:\n' + '\n'.join(lines) + '\n\n' + '\n\n'.join(reports),
+                 reply_markup=keyboard)
+
+def _record_buttons(record_id, suffix=''):
+    return (types.InlineKeyboardButton(f'🗑 Удалить{suffix}', callback_data=f'delete_{record_id}'),
+            types.InlineKeyboardButton(f'✏️ Изменить{suffix}', callback_data=f'edit_{record_id}'))
+
+def _update_record(bot, message, record_id, employees, project, time_stamp, comment):
+    """
+    следующее сообщение в режиме изменения: запись record_id меняется на месте
+    """
+    if len(employees) != 1:
+        bot.reply_to(message, 'При изменении записи укажите одного сотрудника '
+                              '(/cancel - выйти из режима изменения).')
+        return
+
+    try:
+        updated = update_record(record_id, employees[0], project, time_stamp, comment)
+    except ValueError as exc:
+        sessions.finish(message.chat.id, _user_id(message))
+        bot.reply_to(message, f'Запись с ID={record_id} не изменена: {exc}. Изменение отменено.')
+        return
+    sessions.finish(message.chat.id, _user_id(message))
+    if not updated:
+        bot.reply_to(message, f'Запись с ID={record_id} не найдена, изменение отменено.')
+        return
+
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(*_record_buttons(record_id))
+    bot.reply_to(message, f'Запись изменена: '
+                          f'ID: {record_id}'
+                          f'\nСотрудник: {employees[0]}'
+                          f'\nПроект: {project}'
+                          f'\nДата и время: {time_stamp}', reply_markup=keyboard)
+
+def _added_record_report(logs, employee, report_date, date_part):
+    """
+    отчет за день для ответа на добавление записи
+    """
+    try:
+        if not logs:
+            return f'Записей за {date_part} для сотрудника "{employee}" не найдено'
+        return format_day(reporting.day_report(logs, employee, day_of(to_ts(report_date))))
+    except Exception as exc:
+        return f'Ошибка при формировании отчета: {exc}'
+
+def format_day(report):
+    """
+    текст отчета сотрудника за день (reporting.DayReport)
+    """
+    parts = [f'Сотрудник "{report.employee}" за {day_start(report.day).strftime("%d.%m.%y")}:\n\n']
+    for interval in report.intervals:
+        end = 'НВ' if interval.end_ts is None else hhmm(interval.end_ts)
+        parts.append(f'{hhmm(interval.start_ts)}-{end} - {interval.project}')
+        if interval.comment:
+            parts.append(f'\n({interval.comment})')
+        parts.append('\n\n')
+    parts.append(f'\nВсего: {round(report.total_minutes / 60, 3)} часов ({report.total_minutes} минут)')
+    return ''.join(parts)
+
+def _format_days(item, line):
+    """
+    итог и строки по дням (reporting.EmployeeDays), line - шаблон строки дня
+    """
+    parts = [f'Итого: {round(item.total_minutes / 60, 3)} ч ({item.total_minutes} мин):\n\n']
+    parts.extend(line.format(date=day_start(day).strftime('%d.%m.%y'), hours=round(minutes / 60, 3),
+                             minutes=minutes) for day, minutes in item.days)
+    return ''.join(parts)
+
+def delete_record_callback(bot, call):
+    """
+    Обработчик кнопки для удаления записи по ID
+    """
+    record_id = int(call.data.split('_')[1])
+
+    try:
+        if delete_record_by_id(record_id):
+            bot.answer_callback_query(call.id, text=f'Запись с ID={record_id} успешно удалена.')
+            bot.edit_message_text(f'Запись с ID={record_id} была удалена.',
+                                  call.message.chat.id, call.message.message_id)
+        else:
+            bot.answer_callback_query(call.id, text=f'Запись с ID={record_id} не найдена.')
+
+    except Exception as exc:
+        bot.answer_callback_query(call.id, text=f'Произошла ошибка: {exc}')
+
+def callback_edit(bot, call):
+    """
+    Обработчик кнопки для редактирования записи по ID:
+    нажавший ее пользователь переходит в режим изменения, запись меняется его следующим сообщением
+    """
+    record_id = int(call.data.split('_')[1])
+
+    record = get_record_by_id(record_id)
+
+    if record:
+        employee, project, time_stamp, comment = record
+
+        date_part = time_stamp[8:10] + time_stamp[5:7]
+        time_part = time_stamp[11:16].replace(":", "")
+        original_message = f"{date_part} {time_part} {comment}\n{employee}\n{project}"
+
+        sessions.start_edit(call.message.chat.id, call.from_user.id, record_id)
+        bot.answer_callback_query(call.id)
+        bot.send_message(
+            call.message.chat.id,
+            f"✏️ Изменение записи ID={record_id}. Скопируйте сообщение, отредактируйте и отправьте "
+            f"снова - запись будет изменена (/cancel - отмена):\n\n```{original_message}```",
+            parse_mode="Markdown")
+
+    else:
+        bot.answer_callback_query(call.id, '❌ Ошибка: оригинальное сообщение не найдено.')
+
+def cancel_edit(bot, message):
+    """
+    /cancel: выход из режима изменения записи
+    """
+    if sessions.finish(message.chat.id, _user_id(message)):
+        bot.reply_to(message, 'Изменение записи отменено, запись осталась прежней.')
+    else:
+        bot.reply_to(message, 'Нечего отменять.')
+
+def working_now(bot, message):
+    """
+    /now [все]: кто сейчас работает, над каким проектом и сколько;
+    с "все" - также не закрытые с прошлых дней и выключенные сотрудники
+    """
+    try:
+        args = message.text.split()
+        include_stale = _pop_all_flag(args)
+        items = reporting.working_now(include_stale)
+        if not items:
+            bot.reply_to(message, 'Сейчас никто не работает.')
+            return
+
+        today = day_of(to_ts(datetime.now()))
+        parts = [f'Сейчас работают ({len(items)}):\n\n']
+        for item in items:
+            since = hhmm(item.start_ts)
+            if day_of(item.start_ts) != today:
+                since = f'{day_start(day_of(item.start_ts)).strftime("%d.%m.%y")} {since}'
+            parts.append(f'<b>🟢 {item.employee}</b> - {item.project} с {since} '
+                         f'({item.minutes // 60} ч {item.minutes % 60} мин)\n')
+            if item.comment:
+                parts.append(f'({item.comment})\n')
+        bot.reply_to(message, ''.join(parts), parse_mode='HTML')
+
+    except Exception as exc:
+        bot.reply_to(message, f'Ошибка: {exc}')
+
+def get_records_by_date(bot, message):
+    """
+    processes the /get command and returns a list of
+    records from the database for the specified date.
+    """
+
+    try:
+        args = message.text.split()
+        if len(args) < 2:
+            bot.reply_to(message, 'Используйте формат: /get <ДДММГГ>')
+            return
+
+        date_str = args[1].strip()
+        try:
+            query_date = datetime.strptime(date_str, '%d%m%y').strftime('%Y-%m-%d')
+        except ValueError:
+            bot.reply_to(message, 'Формат даты должен быть ДДММГГ')
+            return
+
+        records = get_daily_report(None, query_date)
+
+        if not records:
+            bot.reply_to(message, f'Записи за {query_date} не найдены')
+            return
+
+        report = f'Записи за {date_str[:2]}.{date_str[2:4]}.{date_str[4:6]}:\n\n' + ''.join(
+            f'ID: {record.id}\n'
+            f'Время: {record.time_stamp}\n'
+            f'Сотрудник: {record.employee}\n'
+            f'Проект: {record.project}\n'
+            f'Комментарий: {record.comment}\n\n'
+            for record in records)
+
+        bot.reply_to(message, report)
+
+    except Exception as exc:
+        bot.reply_to(message, f'Произошла ошибка: {exc}')
+
+def _build_employee_report(employee, full_date):
+    """
+    отчет /report по сотруднику за день; None, если записей нет.
+    Кэшировать можно, только если последняя запись закрыта ("стоп"/"ушел").
+    """
+    report = reporting.employee_day(employee, day_of(to_ts(full_date)))
+    if report is None:
+        return None, True
+
+    return format_day(report), report.closed
+
+def send_report(bot, message):
+    """
+    обработчик команды репорт, отправляет отчет по сотруднику за указанную дату
+    если дата не указана - используется текущая
+    формат команды:
+    /report ДДММ(ГГ) сотрудник
+    /report сотрудник
+    """
+    try:
+        args = message.text.split()
+
+        if len(args) < 2:
+            bot.reply_to(message, 'Укажите сотрудника: /report <сотрудник> <дата в формате ДДММ(ГГ)>'
+                                  'либо /report сотрудник')
+            return
+
+        if args[-1].isdigit():
+            date_input = args[-1]
+            if len(date_input) == 6:
+                full_date = datetime.strptime(date_input, '%d%m%y')
+            elif len(date_input) == 4:
+                current_year = datetime.now().strftime('%y')
+                full_date = datetime.strptime(date_input + current_year, '%d%m%y')
+            else:
+                bot.reply_to(message, 'Неверный формат даты. Используйте ДДММГГ или ДДММ')
+                return
+
+            employee = ' '.join(args[1:-1]).strip().lower()
+        else:
+            full_date = datetime.now()
+            employee = ' '.join(args[1:]).strip().lower()
+
+        if not employee:
+            bot.reply_to(message, 'Укажите имя сотрудника')
+            return
+
+        report_date_str = full_date.strftime('%Y-%m-%d')
+
+        day = day_of(to_ts(full_date))
+        report = report_cache.get_or_build('report', directory.resolve(employee), day, day,
+                                           lambda: _build_employee_report(employee, full_date))
+        if report is None:
+            bot.reply_to(message, f'Записей за {report_date_str} для сотрудника "{employee}" не найдено')
+            return
+
+        bot.reply_to(message, report)
+
+    except ValueError as ve:
+        bot.reply_to(message, f'Ошибка в формате даты: {ve}')
+    except Exception as exc:
+        bot.reply_to(message, f'Ошибка при формировании отчета: {exc}')
+        logger.exception('Ошибка при формировании отчета')
+
+def _pop_all_flag(args):
+    """
+    убирает из аргументов команды "все", возвращает, был ли он
+    """
+    if len(args) > 1 and args[-1].lower() == 'все':
+        args.pop()
+        return True
+    return False
+
+def _list_command(command, include_inactive):
+    """
+    команда для ключа кэша: отчеты со всеми сотрудниками кэшируются отдельно
+    """
+    return f'{command}:все' if include_inactive else command
+
+def _build_report_all(report_date, include_inactive=False):
+    """
+    отчет /reportAll за день; None, если сотрудников нет
+    """
+    reports = reporting.all_employees_day(day_of(to_ts(report_date)), include_inactive)
+    if reports is None:
+        return None, False
+
+    parts = [f'Отчет за {report_date.strftime("%d.%m.%y")}:\n\n']
+    for report in reports:
+        if report.worked:
+            parts.append(f'<b>🔴 {format_day(report)}</b>\n'
+                         f'➖➖➖➖➖➖➖➖➖➖\n')
+        else:
+            parts.append(f'<b>🔴 Сотрудник "{report.employee}":</b> Не работал\n'
+                         f'➖➖➖➖➖➖➖➖➖➖\n')
+
+    # пока у кого-то день не закрыт, последний интервал растет со временем
+    return ''.join(parts), all(report.closed for report in reports if report.worked)
+
+def report_all(bot, message):
+    """
+    Обрабатывает команду /reportAll для генерации отчета за день по всем сотрудникам.
+    Если сотрудник не работал в указанный день, это будет отображено в отчете.
+    С аргументом "все" в отчет попадают и выключенные/давно не работавшие сотрудники.
+    """
+    try:
+        args = message.text.split()
+        include_inactive = _pop_all_flag(args)
+
+        if len(args) < 2:
+            date_input = datetime.now().strftime('%d%m')
+        else:
+            date_input = args[1].strip()
+
+        try:
+            report_date = get_nearest_date(date_input)
+        except ValueError:
+            bot.reply_to(message, 'Формат даты должен быть ДДММ')
+            return
+
+        day = day_of(to_ts(report_date))
+        report = report_cache.get_or_build(_list_command('reportAll', include_inactive), None, day, day,
+                                           lambda: _build_report_all(report_date, include_inactive))
+        if report is None:
+            bot.reply_to(message, 'Список сотрудников пуст (скрытые и давно не работавшие - с аргументом "все")')
+            return
+
+        bot.reply_to(message, report, parse_mode='HTML')
+
+    except Exception as exc:
+        bot.reply_to(message, f'Ошибка при формировании общего отчета: {exc}')
+
+def _build_period_all(start_date, end_date, include_inactive=False):
+    """
+    отчет /periodAll за период; None, если сотрудников нет
+    """
+    items = reporting.period_all(day_of(to_ts(start_date)), day_of(to_ts(end_date)), include_inactive)
+    if items is None:
+        return None, False
+
+    parts = [f'Отчеты по сотрудникам за период с {start_date.strftime("%d.%m.%y")} '
+             f'по {end_date.strftime("%d.%m.%y")}:\n\n']
+    for item in items:
+        if not item.worked:
+            parts.append(f'<b>Сотрудник "{item.employee}"</b>: Не работал\n\n')
+            continue
+        parts.append(f'<b>Сотрудник "{item.employee}":</b>\n')
+        parts.append(_format_days(item, '<i>{date}: {hours} ч ({minutes} мин)</i>\n'))
+        parts.append('\n')
+
+    return ''.join(parts), True
+
+def send_period_all(bot, message):
+    """
+    Формирует отчет по всем сотрудникам из базы за указанный период.
+    С аргументом "все" в отчет попадают и выключенные/давно не работавшие сотрудники.
+    """
+    try:
+        args = message.text.split()
+        include_inactive = _pop_all_flag(args)
+        if len(args) < 2:
+            bot.reply_to(message, f'Используйте: /periodAll <период в форме ДДММ-ДДММ> [все]')
+            return
+
+        period = args[1].strip()
+
+        if '-' not in period or len(period) != 9:
+            bot.reply_to(message, 'Неверный формат периода. '
+                                  'Используйте: ДДММ-ДДММ (например, 0101-0203)')
+            return
+
+        start_period, end_period = period.split('-')
+
+        if len(start_period) != 4 or len(end_period) != 4:
+            bot.reply_to(message, 'Неверный формат периода. '
+                                  'Используйте: ДДММ-ДДММ (например, 0101-0203)')
+            return
+
+
+        try:
+            start_date = get_nearest_date(start_period)
+            end_date = get_nearest_date(end_period)
+
+            if end_date < start_date:
+                bot.reply_to(message, 'Дата окончания периода должна быть позже даты начала.')
+                return
+        except ValueError as e:
+            bot.reply_to(message, f'Ошибка в дате. {str(e)}')
+            return
+
+        start_day = day_of(to_ts(start_date))
+        end_day = day_of(to_ts(end_date))
+        report = report_cache.get_or_build(_list_command('periodAll', include_inactive), None, start_day, end_day,
+                                           lambda: _build_period_all(start_date, end_date, include_inactive))
+        if report is None:
+            bot.reply_to(message, 'Список сотрудников пуст (скрытые и давно не работавшие - с аргументом "все")')
+            return
+
+        bot.reply_to(message, report, parse_mode='HTML')
+
+    except Exception as exc:
+        bot.reply_to(message, f'Ошибка при формировании отчета за период: {exc}')
+
+def prebuild_report_all(report_date, pin_seconds):
+    """
+    /reportAll за день заранее (для планировщика), закрепляется в кэше
+    """
+    day = day_of(to_ts(report_date))
+    return report_cache.prebuild('reportAll', None, day, day,
+                                 lambda: _build_report_all(report_date), pin_seconds)
+
+def prebuild_period_all(start_date, end_date, pin_seconds):
+    """
+    /periodAll за период заранее (для планировщика), закрепляется в кэше
+    """
+    return report_cache.prebuild('periodAll', None, day_of(to_ts(start_date)), day_of(to_ts(end_date)),
+                                 lambda: _build_period_all(start_date, end_date), pin_seconds)
+
+def send_report_text(bot, chat_id, report):
+    """
+    отправляет отчет по всем сотрудникам в чат так же, как ответ на команду
+    """
+    bot.send_message(chat_id, report, parse_mode='HTML')
+
+def _build_period_summary(employee, single, start_date, end_date):
+    """
+    сообщения /period: по одному сотруднику за период (single)
+    или по всем сотрудникам за день; None, если записей нет
+    """
+    items = reporting.period_hours(day_of(to_ts(start_date)), day_of(to_ts(end_date)), employee if single else None)
+    if not items:
+        return None, True
+
+    line = '{date}: Всего: {hours} ч ({minutes} мин)\n'
+    if single:
+        return [f'Часы работы "{employee}" за период '
+                f'с {start_date.strftime("%d.%m.%y")} '
+                f'по {end_date.strftime("%d.%m.%y")}:\n\n' + _format_days(items[0], line)], True
+
+    return [f'Часы работы "{item.employee.lower()}" за {start_date.strftime("%d.%m.%y")}:\n' + _format_days(item, line)
+            for item in items], True
+
+def send_period_summary(bot, message):
+    """
+    Генерирует отчет по сотруднику за указанный период или по всем сотрудникам за один день.
+    """
+    try:
+        args = message.text.split()
+        if len(args) < 2:
+            bot.reply_to(message, 'Используйте: /period <сотрудник> <период в формате ДДММ или ДДММ-ДДММ>')
+            return
+
+        employee = args[1].strip().lower()
+        period = args[2].strip()
+
+        current_year = datetime.now().year
+
+        try:
+            if '-' in period:
+                start_period, end_period = period.split('-')
+                start_day = int(start_period[:2])
+                start_month = int(start_period[2:])
+                end_day = int(end_period[:2])
+                end_month = int(end_period[2:])
+
+                start_date = datetime(current_year, start_month, start_day)
+                end_date = datetime(current_year, end_month, end_day, 23, 59, 59)  # Учитываем целый день
+            else:
+                day = int(period[:2])
+                month = int(period[2:])
+                start_date = datetime(current_year, month, day)
+                end_date = datetime(current_year, month, day, 23, 59, 59)
+
+        except ValueError:
+            bot.reply_to(message, 'Период должен быть в формате ДДММ или ДДММ-ДДММ (например, 1708 или 1708-2608)')
+            return
+
+        single = '-' in period or employee != "все"
+        reports = report_cache.get_or_build(
+            'period', directory.resolve(employee) if single else None,
+            day_of(to_ts(start_date)), day_of(to_ts(end_date)),
+            lambda: _build_period_summary(employee, single, start_date, end_date))
+
+        if reports is None:
+            bot.reply_to(message, f'Записей за {start_date.strftime("%d.%m.%y")} не найдено.')
+            return
+
+        for rep in reports:
+            bot.reply_to(message, rep)
+
+    except Exception as exc:
+        bot.reply_to(message, f'Ошибка при формировании отчета за период: {exc}')
+
+def _build_project_period(title, start_day, end_day):
+    """
+    отчет /projectsPeriod за дни; None, если записей нет
+    """
+    items = reporting.projects(start_day, end_day)
+    if items is None:
+        return None, True
+
+    parts = [title]
+    for item in items:
+        parts.append(f'\n🔴 Проект "{item.project}" \n'
+                     f'(всего: {item.total_minutes} мин / {round(item.total_minutes / 60, 1)} ч):\n\n')
+        parts.extend(f'- {employee}: {minutes} мин ({round(minutes / 60, 1)} ч)\n' for employee, minutes in item.employees)
+
+    return ''.join(parts), True
+
+def project_period(bot, message):
+    """
+    Формирует список проектов и сотрудников за указанный период ДДММ-ДДММ или ДДММ.
+    """
+    try:
+        args = message.text.split()
+        if len(args) < 2:
+            bot.reply_to(message, "Укажите период в формате ДДММ-ДДММ или ДДММ.")
+            return
+
+        period = args[1]
+        current_date = datetime.now()
+        dates = period.split('-')
+
+        if len(dates) == 2:
+            start_date = infer_year(dates[0], current_date).strftime('%Y-%m-%d')
+            end_date = infer_year(dates[1], current_date).strftime('%Y-%m-%d')
+        else:
+            start_date = end_date = infer_year(dates[0], current_date).strftime('%Y-%m-%d')
+
+        title = f'Проекты с {start_date} по {end_date}:\n' if start_date != end_date else f'Проекты за {start_date}:\n'
+
+        start_day = day_of(to_ts(datetime.strptime(start_date, '%Y-%m-%d')))
+        end_day = day_of(to_ts(datetime.strptime(end_date, '%Y-%m-%d')))
+
+        report = report_cache.get_or_build('projectsPeriod', None, start_day, end_day,
+                                           lambda: _build_project_period(title, start_day, end_day))
+        if report is None:
+            bot.reply_to(message, "За указанный период нет данных.")
+            return
+
+        bot.reply_to(message, report.strip())
+
+    except Exception as e:
+        bot.reply_to(message, f"Ошибка при формировании отчета: {e}")
+
+def delete_record(bot, message):
+    """
+    deletes an entry from the DB by the specified ID
+    """
+    args = message.text.split()
+    if len(args) < 2:
+        bot.reply_to(message, 'Используйте: /delete <ID записи>')
+        return
+
+    try:
+        record_id = int(args[1])
+        if delete_record_by_id(record_id):
+            bot.reply_to(message, f'Запись с ID={record_id} успешно удалена.')
+        else:
+            bot.reply_to(message, f'Запись с ID = {record_id} не найдена')
+
+    except ValueError:
+        bot.reply_to(message, f'ID должен быть числом.')
+    except Exception as exc:
+        bot.reply_to(message, f'Произошла ошибка: {exc}')
+
+def subscription_command(bot, message, subscribe):
+    """
+    /subscribe и /unsubscribe [день|неделя]: рассылка отчетов планировщика в чат
+    """
+    args = message.text.split()
+    kinds = [args[1].lower()] if len(args) > 1 else list(scheduler.KINDS)
+    if any(kind not in scheduler.KINDS for kind in kinds):
+        bot.reply_to(message, f'Используйте: {args[0].split("@")[0]} [{"|".join(scheduler.KINDS)}]')
+        return
+
+    chat_id = message.chat.id
+    if not subscribe:
+        if scheduler.unsubscribe(chat_id, kinds):
+            bot.reply_to(message, 'Подписка отменена.')
+        else:
+            bot.reply_to(message, 'Подписки не было.')
+        return
+
+    if not config.SCHEDULE_TIME:
+        bot.reply_to(message, 'Планировщик отчетов выключен.')
+        return
+    scheduler.subscribe(chat_id, kinds)
+    lines = [f'{scheduler.KINDS[kind]} - {scheduler.next_run(kind, datetime.now()).strftime("%d.%m %H:%M")}'
+             for kind in kinds]
+    bot.reply_to(message, 'Подписка оформлена, ближайшая отправка:\n' + '\n'.join(lines))
+
+def _user_id(message):
+    """
+    ИД отправителя; 0 для сообщений без отправителя (каналы)
+    """
+    return message.from_user.id if message.from_user is not None else 0
+
+def _is_admin(message):
+    return message.from_user is not None and message.from_user.id in config.ADMIN_IDS
+
+def stats_command(bot, message):
+    """
+    метрики процесса, только для администраторов из config.ADMIN_IDS
+    """
+    if not _is_admin(message):
+        bot.reply_to(message, 'Команда доступна только администраторам.')
+        return
+
+    text = metrics.render_text(report_cache.stats())
+    bot.reply_to(message, text)
+
+def set_employee_active(bot, message, active):
+    """
+    /activate и /deactivate <сотрудник>: показывать ли сотрудника в отчетах по всем,
+    только для администраторов
+    """
+    if not _is_admin(message):
+        bot.reply_to(message, 'Команда доступна только администраторам.')
+        return
+
+    command, _, employee = message.text.partition(' ')
+    employee = employee.strip()
+    if not employee:
+        bot.reply_to(message, f'Используйте: {command.split("@")[0]} <сотрудник>')
+        return
+
+    if not directory.set_active(employee, active):
+        bot.reply_to(message, f'Сотрудник "{employee}" не найден')
+    elif active:
+        bot.reply_to(message, f'Сотрудник "{employee}" снова в отчетах по всем сотрудникам.')
+    else:
+        bot.reply_to(message, f'Сотрудник "{employee}" скрыт из отчетов по всем сотрудникам '
+                              f'(показать: /reportAll <ДДММ> все).')
+
+def add_alias(bot, message):
+    """
+    /alias <псевдоним> <сотрудник>: другое написание имени сотрудника,
+    записи под псевдонимом переносятся к сотруднику; только для администраторов
+    """
+    if not _is_admin(message):
+        bot.reply_to(message, 'Команда доступна только администраторам.')
+        return
+
+    args = message.text.split()
+    if len(args) < 3:
+        bot.reply_to(message, 'Используйте: /alias <псевдоним> <сотрудник>')
+        return
+
+    alias, employee = args[1], ' '.join(args[2:])
+    try:
+        days = directory.add_alias(alias, employee)
+    except ValueError as exc:
+        bot.reply_to(message, f'Ошибка: {exc}')
+        return
+    text = f'"{alias.lower()}" - теперь другое имя сотрудника "{employee}".'
+    if days:
+        text += f' Перенесены записи за дней: {days}.'
+    bot.reply_to(message, text)
+
+def import_document(bot, message, download):
+    """
+    загрузка записей из присланного CSV/XLSX, только для администраторов;
+    download() возвращает содержимое файла
+    """
+    if not _is_admin(message):
+        bot.reply_to(message, 'Загрузка файлов доступна только администраторам.')
+        return
+
+    import importer
+
+    name = (message.document.file_name or '').lower()
+    kind = name.rsplit('.', 1)[-1] if '.' in name else ''
+    if kind not in ('csv', 'xlsx'):
+        bot.reply_to(message, 'Пришлите файл CSV или XLSX с колонками: сотрудник, проект, дата, время, комментарий.')
+        return
+
+    try:
+        result = importer.import_file(io.BytesIO(download()), kind)
+        text = importer.describe(result)
+    except Exception as exc:
+        text = f'Ошибка загрузки: {exc}'
+    bot.reply_to(message, text)
+
+def help_command(bot, message):
+    """
+    commands with a description
+    """
+
+    commands = """
+    
+    /start - Приветственное сообщение.
+    
+    /help - Список доступных команд.
+    
+    /report <сотрудник> <ДДММ(ГГ)> - Отчет по сотруднику за указанный день. 
+    Если дата не указана, используется текущий день.
+    
+    /reportAll <ДДММ> [все] - генерация отчетов за день по всем сотрудникам.
+    Если дата не указана, подставляется сегодняшняя дата. Выключенные и давно
+    не работавшие сотрудники показываются только с "все".
+    
+    /get <ДДММГГ> - Получение всех записей за конкретный день с ID.
+    
+    /now [все] - Кто сейчас работает и над каким проектом. С "все" - также
+    не закрытые с прошлых дней и выключенные сотрудники.
+    
+    /period <сотрудник> <ДДММ-ДДММ | ДДММ> - Общее количество часов работы 
+    сотрудника за указанный период.
+    
+    /periodAll <ДДММ-ДДММ> [все] - 
+        1. Если указан период (ДДММ-ДДММ), выводит отчеты по всем сотрудникам за указанный период.
+        
+    /projectsPeriod ДДММ-ДДММ | ДДММ - отчет о времени, потраченном сотрудниками на проекты в указанном периоде
+    
+    /delete <ID> - Удаление записи по указанному ID.
+    
+    Кнопка "Изменить" под записью - следующее сообщение с записью изменит ее,
+    /cancel - выйти из режима изменения.
+    
+    /subscribe [день|неделя] - Присылать в этот чат каждое утро /reportAll за вчера
+    и раз в неделю /periodAll за прошлую неделю. /unsubscribe [день|неделя] - отписаться.
+    
+    /stats - Метрики бота (только для администраторов).
+    
+    /activate <сотрудник>, /deactivate <сотрудник> - показывать/скрыть сотрудника
+    в отчетах по всем (только для администраторов).
+    
+    /alias <псевдоним> <сотрудник> - другое написание имени сотрудника (только для администраторов).
+    
+    Файл CSV/XLSX - загрузка записей (только для администраторов), колонки:
+    сотрудник, проект, дата, время, комментарий.
+    
+    /add <сотрудник> <проект> <дата и время> [комментарий] - Добавление новой записи в базу данных.
+    
+    Чтобы добавить запись, отправьте сообщение в формате:
+    
+    1 строка: Дата (опц), время (обяз), комментарий (опц). Формат: ДДММГГ ЧЧММ текст.  
+    2 строка: Имя сотрудника.  
+    3 строка: Название проекта.
+    
+    В одном сообщении можно отправить несколько записей, разделив их пустой строкой.
+    """
+    bot.reply_to(message, commands)
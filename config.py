@@ -0,0 +1,65 @@
+"""
+Настройки бота из переменных окружения.
+"""
+import os
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+# pool - обработка обновлений в пуле потоков с сохранением порядка по чату,
+# default - стандартный пул TeleBot
+DISPATCH_MODE = os.environ.get('BOT_DISPATCH', 'pool')
+FAST_WORKERS = _int('BOT_FAST_WORKERS', 8)
+HEAVY_WORKERS = _int('BOT_HEAVY_WORKERS', 2)
+
+# потоки для обработчиков и SQLite в асинхронном боте (bot_async.py)
+ASYNC_WORKERS = _int('BOT_ASYNC_WORKERS', 16)
+
+# тяжелые отчеты обрабатываются отдельной очередью и не задерживают запись времени
+HEAVY_COMMANDS = ('reportAll', 'periodAll', 'period', 'projectsPeriod', 'get')
+
+# polling - long polling (bot.py), webhook - обновления принимает Flask-приложение (app.py)
+BOT_MODE = os.environ.get('BOT_MODE', 'polling')
+# внешний адрес приложения, на который Telegram будет слать обновления
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/telegram/webhook')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET', '')
+WEBHOOK_QUEUE_SIZE = _int('WEBHOOK_QUEUE_SIZE', 1000)
+WEB_HOST = os.environ.get('WEB_HOST', '127.0.0.1')
+WEB_PORT = _int('WEB_PORT', 5000)
+# процессы веб-отчетов (serve.py), каждый со своими соединениями только на чтение
+WEB_WORKERS = _int('WEB_WORKERS', 4)
+
+# адрес Bot API, например локальной подмены fake_telegram.py
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', '')
+
+# Telegram ID администраторов через запятую, им доступна команда /stats
+ADMIN_IDS = {int(item) for item in os.environ.get('BOT_ADMIN_IDS', '').replace(',', ' ').split()}
+
+# журнал: файл, уровень и доля строк холостого опроса getUpdates (одна из N)
+LOG_FILE = os.environ.get('BOT_LOG_FILE', 'bot_log.txt')
+LOG_LEVEL = os.environ.get('BOT_LOG_LEVEL', 'INFO')
+LOG_SAMPLE_EVERY = _int('BOT_LOG_SAMPLE_EVERY', 100)
+
+# архив закрытых месяцев (archive.py): каталог рядом с БД и возраст переносимых месяцев
+ARCHIVE_DIR = os.environ.get('BOT_ARCHIVE_DIR', 'archive')
+ARCHIVE_AFTER_MONTHS = _int('BOT_ARCHIVE_AFTER_MONTHS', 12)
+
+# в отчетах по всем сотрудникам не показываются сотрудники без записей за столько дней до начала периода
+EMPLOYEE_INACTIVE_DAYS = _int('BOT_EMPLOYEE_INACTIVE_DAYS', 90)
+
+# планировщик (scheduler.py): время ежедневной подготовки отчетов "ЧЧ:ММ" (пусто - выключен)
+# и день недели для недельного отчета (0 - понедельник)
+SCHEDULE_TIME = os.environ.get('BOT_SCHEDULE_TIME', '07:30')
+SCHEDULE_WEEKDAY = _int('BOT_SCHEDULE_WEEKDAY', 0)
+
+# очередь отправки (outbound.py): потоки, общий лимит сообщений в секунду,
+# лимит и запас сообщений на чат, число повторов при 429 и сетевых ошибках
+OUTBOUND_WORKERS = _int('BOT_OUTBOUND_WORKERS', 4)
+OUTBOUND_GLOBAL_PER_SECOND = _int('BOT_OUTBOUND_GLOBAL_PER_SECOND', 25)
+OUTBOUND_CHAT_PER_MINUTE = _int('BOT_OUTBOUND_CHAT_PER_MINUTE', 60)
+OUTBOUND_CHAT_BURST = _int('BOT_OUTBOUND_CHAT_BURST', 5)
+OUTBOUND_RETRIES = _int('BOT_OUTBOUND_RETRIES', 3)
+
+# режим изменения записи (sessions.py) после кнопки "Изменить" действует столько минут
+EDIT_SESSION_MINUTES = _int('BOT_EDIT_SESSION_MINUTES', 60)
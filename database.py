@@ -1,35 +1,144 @@
-import sqlite3
+from collections import namedtuple
 from datetime import datetime
-import re
-
-DB_NAME = 'bd_nikos.sql'
-
-def init_db():
+from operator import itemgetter
+
+import archive
+import directory
+from schema import (DAY_SECONDS, bump_data_version, create_data_version_triggers, create_user_indexes, day_of,
+                    drop_data_version_triggers, drop_user_indexes, from_ts, parse_time_stamp, to_ts)
+import metrics
+import report_cache
+import status
+from rollup import rebuild, recompute_day
+from storage import get_connection, query_one, transaction
+
+class LogRow(namedtuple('LogRow', 'id ts employee project comment')):
     """
-    инициализирует БД
+    запись из БД; время - целые секунды (schema.to_ts), datetime строится только по запросу
     """
-    with sqlite3.connect(DB_NAME) as conn:
-        cur = conn.cursor()
-        cur.execute('CREATE TABLE IF NOT EXISTS user('
-                    'id INTEGER PRIMARY KEY AUTOINCREMENT,'
-                    'employee TEXT,'
-                    'project TEXT,'
-                    'time_stamp TEXT,'
-                    'comment TEXT);')
-        conn.commit()
+    __slots__ = ()
+
+    @property
+    def time_stamp(self):
+        return from_ts(self.ts)
 
 def add_log(employee, project, time_stamp, comment):
     """
     Функция для добавления записи в БД
     """
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO user(employee, project, time_stamp, comment) '
-            'VALUES  (?, ?, ?, ?)', (employee, project, time_stamp, comment)
+    return add_logs([(employee, project, time_stamp, comment)])[0]
+
+@metrics.timed(metrics.DB)
+def add_logs(entries):
+    """
+    Добавляет записи (employee, project, time_stamp, comment) одной транзакцией,
+    возвращает их ИД в том же порядке
+    """
+    rows = []
+    for employee, project, time_stamp, comment in entries:
+        ts = parse_time_stamp(time_stamp)
+        rows.append((employee, project, time_stamp, comment, ts, directory.resolve(employee),
+                     day_of(ts) if ts is not None else None))
+    if not rows:
+        return []
+    archive.check_writable({row[6] for row in rows})
+
+    with transaction() as conn:
+        conn.executemany(
+            'INSERT INTO user(employee, project, time_stamp, comment, ts, employee_key, day) '
+            'VALUES  (?, ?, ?, ?, ?, ?, ?)', rows
         )
-        conn.commit()
-        return cursor.lastrowid
+        # писатель один, AUTOINCREMENT выдает ИД подряд
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        record_ids = list(range(last_id - len(rows) + 1, last_id + 1))
+        touched = {(row[5], row[6]) for row in rows}
+        for key, day in touched:
+            recompute_day(conn, key, day)
+        update_directory, lists_changed = directory.record_entries(
+            conn, [(row[5], row[0], record_id, row[4]) for row, record_id in zip(rows, record_ids)])
+        status.record_entries(conn, [(row[5], row[0], record_id, row[4], row[1], row[3])
+                                     for row, record_id in zip(rows, record_ids)])
+    update_directory()
+
+    for key, day in touched:
+        if day is not None:
+            report_cache.invalidate(key, day, employees_changed=lists_changed)
+    return record_ids
+
+IMPORT_BATCH_SIZE = 50000
+# больше стольких затронутых дней итоги пересобираются целиком
+IMPORT_REBUILD_DAYS = 20000
+
+@metrics.timed(metrics.DB)
+def import_logs(entries, drop_indexes=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Массовая загрузка записей (employee, project, time_stamp, comment) из итератора
+    пачками по batch_size строк, каждая своей транзакцией: в памяти только одна пачка.
+    Пачка перед вставкой проверяется на архивные месяцы (ValueError; предыдущие пачки
+    остаются загруженными). Построчные триггеры версии данных на время вставки
+    снимаются, версия дней пачки меняется один раз. drop_indexes - индексы снимаются
+    на время загрузки (для больших объемов, чтения в это время медленнее).
+    Дневные итоги, справочник и текущее состояние пересчитываются один раз в конце -
+    и после ошибки, по уже записанным пачкам. Возвращает число записей.
+    """
+    conn = get_connection()
+    if drop_indexes:
+        with transaction():
+            drop_user_indexes(conn)
+
+    count = 0
+    touched = set()
+    try:
+        for batch in _import_batches(entries, batch_size):
+            archive.check_writable({row[6] for row in batch})
+            count += _insert_batch(batch)
+            touched.update((row[5], row[6]) for row in batch)
+    finally:
+        with transaction():
+            if drop_indexes:
+                create_user_indexes(conn)
+            if len(touched) > IMPORT_REBUILD_DAYS:
+                rebuild(conn)
+            else:
+                for key, day in touched:
+                    recompute_day(conn, key, day)
+            if touched:
+                directory.rebuild(conn)
+                status.rebuild(conn)
+                # итоги пересчитаны позже самих записей: версия дней меняется еще раз, уже после них
+                bump_data_version(conn, touched)
+        report_cache.clear()
+    return count
+
+def _import_batches(entries, batch_size):
+    """
+    строки таблицы user из записей, списками по batch_size
+    """
+    keys = {}
+    batch = []
+    for employee, project, time_stamp, comment in entries:
+        ts = parse_time_stamp(time_stamp)
+        key = keys.get(employee)
+        if key is None:
+            key = keys[employee] = directory.resolve(employee)
+        batch.append((employee, project, time_stamp, comment, ts, key, day_of(ts) if ts is not None else None))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _insert_batch(rows):
+    """
+    вставляет пачку без построчных триггеров версии данных, версия дней пачки меняется один раз
+    """
+    with transaction() as conn:
+        drop_data_version_triggers(conn)
+        conn.executemany('INSERT INTO user(employee, project, time_stamp, comment, ts, employee_key, day) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        create_data_version_triggers(conn)
+        bump_data_version(conn, {(row[5], row[6]) for row in rows})
+    return len(rows)
 
 def infer_year(date_input, current_date):
     """
@@ -43,121 +152,127 @@ def infer_year(date_input, current_date):
             month_day = month_day.replace(year=current_date.year - 1)
         return month_day
 
-def format_report(logs, employee, report_date):
-    """
-    шаблон отчета по сотруднику за конкретный день
-    """
-    report = f'Сотрудник "{employee}" за {report_date.strftime("%d.%m.%y")}:\n\n'
-    total_minutes = 0
-
-    for i in range(len(logs)):
-        start_time = datetime.strptime(str(logs[i][1]), '%Y-%m-%d %H:%M:%S')
-
-        if i < len(logs) - 1:
-            end_time = datetime.strptime(str(logs[i + 1][1]), '%Y-%m-%d %H:%M:%S')
-            end_time_str = end_time.strftime('%H:%M')
-            duration = int((end_time - start_time).total_seconds() // 60)
-        else:
-            end_time = datetime.now()
-            end_time_str = 'НВ'
-            duration = int((end_time - start_time).total_seconds() // 60)
-
-        if logs[i][3].lower() in ['стоп', 'ушел']:
-            continue
-
-        total_minutes += duration
-        report += f'{start_time.strftime("%H:%M")}-{end_time_str} - {logs[i][3]}'
-        if logs[i][4]:
-            report += f'\n({logs[i][4]})'
-        report += '\n\n'
-
-    total_hours = round(total_minutes / 60, 3)
-    report += f'\nВсего: {total_hours} часов ({total_minutes} минут)'
-    return report
-
+@metrics.timed(metrics.DB)
 def get_daily_report(employee, date):
     """
     Формирует отчет из всех записей за текущий день
     """
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        start_date = datetime.strptime(f'{date} 00:00:00', '%Y-%m-%d %H:%M:%S')
-        end_date = datetime.strptime(f'{date} 23:59:00', '%Y-%m-%d %H:%M:%S')
-
-        query = """
-                    SELECT id, time_stamp, employee, project, comment 
-                    FROM user 
-                    WHERE time_stamp BETWEEN ? AND ?
-                """
-        params = [start_date, end_date]
-        if employee:
-            query += " AND LOWER(employee) = ?"
-            params.append(employee.lower())
-
-        query += " ORDER BY time_stamp ASC"
-        cursor.execute(query, params)
-
-        rows = cursor.fetchall()
-
-        result = []
-        for row in rows:
-            try:
-                if not row[2]:
-                    raise ValueError(f"Имя сотрудника отсутствует для записи с ID: {row[0]}")
+    start_ts = to_ts(datetime.strptime(date, '%Y-%m-%d'))
 
-                clean_time_stamp = re.sub(r'\s\([^)]+\)', '', row[1])
+    return [LogRow._make(row) for row in _select_logs(employee, start_ts, start_ts + DAY_SECONDS - 60)
+            if row[2]]
 
-                time_stamp = datetime.strptime(clean_time_stamp, '%Y-%m-%d %H:%M:%S')
-            except ValueError as ve:
-                continue
-            result.append((row[0], time_stamp, row[2], row[3], row[4]))
-        return result
-
-def get_unique_employees():
+def _select_logs(employee, start_ts, end_ts):
     """
-    получает список сотрудников
+    выборка записей за интервал [start_ts, end_ts] по индексу
     """
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT DISTINCT employee FROM user')
-        rows = cursor.fetchall()
-        return [row[0] for row in rows]
-
+    sql = """
+            SELECT id, ts, employee, project, comment 
+            FROM user 
+            WHERE ts BETWEEN ? AND ?
+            """
+    params = [start_ts, end_ts]
+
+    if employee:
+        sql += " AND employee_key = ?"
+        params.append(directory.resolve(employee))
+
+    sql += " ORDER BY ts ASC, id ASC"
+    return archive.query(sql, params, day_of(start_ts), day_of(end_ts), key=itemgetter(1, 0))
+
+@metrics.timed(metrics.DB)
+def get_daily_reports(employees, date):
+    """
+    Записи нескольких сотрудников за день одним запросом:
+    {employee_key: список записей как в get_daily_report}
+    """
+    keys = sorted({directory.resolve(employee) for employee in employees})
+    start_ts = to_ts(datetime.strptime(date, '%Y-%m-%d'))
+    placeholders = ', '.join('?' * len(keys))
+    rows = archive.query(f"""
+                SELECT id, ts, employee, project, comment, employee_key
+                FROM user
+                WHERE employee_key IN ({placeholders}) AND ts BETWEEN ? AND ?
+                ORDER BY ts ASC, id ASC
+                """, [*keys, start_ts, start_ts + DAY_SECONDS - 60],
+                day_of(start_ts), day_of(start_ts), key=itemgetter(1, 0))
+
+    result = {key: [] for key in keys}
+    for row in rows:
+        if row[2]:
+            result[row[5]].append(LogRow._make(row[:5]))
+    return result
+
+@metrics.timed(metrics.DB)
 def delete_record_by_id(record_id):
     """
     удаляет запись из БД по ИД
     """
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM user WHERE id = ?', (record_id,))
-        conn.commit()
-        return cursor.rowcount > 0
-
-def send_report_internal(employee, date_part):
+    with transaction() as conn:
+        record = conn.execute('SELECT employee_key, day FROM user WHERE id = ?',
+                              (record_id,)).fetchone()
+        if record is None:
+            return False
+        key, day = record
+        conn.execute('DELETE FROM user WHERE id = ?', (record_id,))
+        recompute_day(conn, key, day)
+        update_directory, lists_changed = directory.refresh_employee(conn, key)
+        status.refresh(conn, [key])
+    update_directory()
+    if day is not None:
+        report_cache.invalidate(key, day, employees_changed=lists_changed)
+    return True
+
+@metrics.timed(metrics.DB)
+def update_record(record_id, employee, project, time_stamp, comment):
     """
-    Внутренняя функция для формирования отчета
+    изменяет запись на месте одним UPDATE, итоги пересчитываются
+    только за прежний и новый день сотрудника; False, если записи нет
     """
-    try:
-        current_date = datetime.now()
-        report_date = infer_year(date_part, current_date)
-
-        report_date_str = report_date.strftime('%Y-%m-%d')
-        logs = get_daily_report(employee, report_date_str)
-
-        if not logs:
-            return f'Записей за {date_part} для сотрудника "{employee}" не найдено'
-
-        return format_report(logs, employee, report_date)
-
-    except Exception as exc:
-        return f'Ошибка при формировании отчета: {exc}'
+    ts = parse_time_stamp(time_stamp)
+    key = directory.resolve(employee)
+    day = day_of(ts) if ts is not None else None
+
+    with transaction() as conn:
+        record = conn.execute('SELECT employee_key, day FROM user WHERE id = ?',
+                              (record_id,)).fetchone()
+        if record is None:
+            return False
+        old_key, old_day = record
+        archive.check_writable([old_day, day])
+        conn.execute('UPDATE user SET employee = ?, project = ?, time_stamp = ?, comment = ?, '
+                     'ts = ?, employee_key = ?, day = ? WHERE id = ?',
+                     (employee, project, time_stamp, comment, ts, key, day, record_id))
+        touched = {(old_key, old_day), (key, day)}
+        for touched_key, touched_day in touched:
+            recompute_day(conn, touched_key, touched_day)
+        updates = [directory.refresh_employee(conn, touched_key) for touched_key in {old_key, key}]
+        status.refresh(conn, [old_key, key])
+    lists_changed = False
+    for update_directory, changed in updates:
+        update_directory()
+        lists_changed = lists_changed or changed
+
+    for touched_key, touched_day in touched:
+        if touched_day is not None:
+            report_cache.invalidate(touched_key, touched_day, employees_changed=lists_changed)
+    return True
+
+@metrics.timed(metrics.DB)
+def get_record_by_id(record_id):
+    """
+    возвращает запись (employee, project, time_stamp, comment) по ИД
+    """
+    return query_one('SELECT employee, project, time_stamp, comment FROM user WHERE id = ?',
+                     (record_id,))
 
-def get_nearest_date(date_input):
+def get_nearest_date(date_input, current_date=None):
     """
     Возвращает ближайшую дату на основе текущей даты и введенного ДДММ.
     Если дата в текущем году уже прошла, возвращаем дату за следующий год.
     """
-    current_date = datetime.now()
+    if current_date is None:
+        current_date = datetime.now()
     day, month = int(date_input[:2]), int(date_input[2:])
 
     try:
@@ -177,33 +292,3 @@ def get_nearest_date(date_input):
         nearest_date = date_last_year
 
     return nearest_date.replace(hour=0, minute=0, second=0, microsecond=0)
-
-def get_logs(employee, start_date, end_date):
-    """
-    Общая функция для получения логов из базы данных за указанный период и фильтрации по сотруднику
-    """
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        query = """
-                SELECT id, time_stamp, employee, project, comment 
-                FROM user 
-                WHERE time_stamp BETWEEN ? AND ?
-                """
-        params = [start_date, end_date]
-
-        if employee:
-            query += " AND LOWER(employee) = ?"
-            params.append(employee.lower())
-
-        query += " ORDER BY time_stamp ASC"
-        cursor.execute(query, params)
-
-        rows = cursor.fetchall()
-        result = []
-        for row in rows:
-            try:
-                time_stamp = datetime.strptime(row[1], '%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                continue
-            result.append((row[0], time_stamp, row[2], row[3], row[4]))
-        return result
\ No newline at end of file
@@ -0,0 +1,269 @@
+"""
+Справочник сотрудников.
+
+Таблица employees хранит по нормализованному ключу отображаемое имя (из первой
+записи), первую и последнюю отметку и признак active, employee_aliases - другие
+написания имени. Справочник обновляется в той же транзакции, что и записи,
+а процесс держит его копию в памяти и перечитывает, только когда меняется
+счетчик версии в таблице meta (например, после загрузки из другого процесса).
+Отдельный счетчик employee_lists растет, только когда могли измениться списки
+сотрудников в отчетах по всем: по нему кэш отчетов замечает такие изменения
+из других процессов.
+
+В отчетах по всем сотрудникам по умолчанию нет выключенных сотрудников и тех,
+у кого нет записей за config.EMPLOYEE_INACTIVE_DAYS дней до начала периода.
+"""
+import threading
+from collections import namedtuple
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+import archive
+import config
+import storage
+from schema import DAY_SECONDS, day_of, employee_key, to_ts
+
+Employee = namedtuple('Employee', 'key name first_id first_ts last_ts active')
+
+# все дни для запросов через archive.query
+ALL_DAYS = (-10 ** 9, 10 ** 9)
+
+_lock = threading.Lock()
+_state = {'db': None, 'version': None, 'employees': {}, 'aliases': {}}
+
+def create_tables(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS employees('
+                 'key TEXT PRIMARY KEY,'
+                 'name TEXT NOT NULL,'
+                 'first_id INTEGER NOT NULL,'
+                 'first_ts INTEGER NOT NULL,'
+                 'last_ts INTEGER NOT NULL,'
+                 'active INTEGER NOT NULL DEFAULT 1) WITHOUT ROWID')
+    conn.execute('CREATE TABLE IF NOT EXISTS employee_aliases('
+                 'alias TEXT PRIMARY KEY,'
+                 'key TEXT NOT NULL) WITHOUT ROWID')
+    conn.execute('CREATE TABLE IF NOT EXISTS meta(name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    conn.execute("INSERT OR IGNORE INTO meta(name, value) VALUES ('employees', 0)")
+    conn.execute("INSERT OR IGNORE INTO meta(name, value) VALUES ('employee_lists', 0)")
+
+def _touch(conn, lists_changed=False):
+    """
+    увеличивает версию справочника (и версию списков, если они могли измениться), возвращает новую
+    """
+    conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'employees'")
+    if lists_changed:
+        conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'employee_lists'")
+    return conn.execute("SELECT value FROM meta WHERE name = 'employees'").fetchone()[0]
+
+def _summaries(conn, keys=None):
+    """
+    сотрудники по записям и дневным итогам (основная БД и архив): {ключ: Employee без active};
+    имя и first_id - по первой добавленной записи, как у SELECT DISTINCT по таблице
+    """
+    condition = "employee_key != ''"
+    params = []
+    if keys is not None:
+        condition = f'employee_key IN ({", ".join("?" * len(keys))})'
+        params.extend(keys)
+
+    first = {}
+    for key, first_id, name in archive.query(f'SELECT employee_key, MIN(id), employee FROM user '
+                                             f'WHERE {condition} GROUP BY employee_key', params, *ALL_DAYS):
+        if key not in first or first_id < first[key][0]:
+            first[key] = (first_id, name)
+    result = {}
+    for key, first_ts, last_ts in archive.query(f'SELECT employee_key, MIN(first_ts), MAX(last_ts) '
+                                                f'FROM daily_bounds WHERE {condition} GROUP BY employee_key',
+                                                params, *ALL_DAYS):
+        if key not in first:
+            continue
+        item = result.get(key)
+        if item is not None:
+            first_ts, last_ts = min(first_ts, item.first_ts), max(last_ts, item.last_ts)
+        result[key] = Employee(key, first[key][1], first[key][0], first_ts, last_ts, 1)
+    return result
+
+def rebuild(conn):
+    """
+    пересобирает справочник по дневным итогам, признак active сохраняется
+    """
+    active = dict(conn.execute('SELECT key, active FROM employees'))
+    summaries = _summaries(conn)
+    conn.execute('DELETE FROM employees')
+    conn.executemany('INSERT INTO employees(key, name, first_id, first_ts, last_ts, active) '
+                     'VALUES (?, ?, ?, ?, ?, ?)',
+                     [item._replace(active=active.get(key, 1)) for key, item in summaries.items()])
+    _touch(conn, lists_changed=True)
+    return len(summaries)
+
+def _load():
+    """
+    актуальная копия справочника в памяти
+    """
+    conn = storage.get_connection()
+    version = conn.execute("SELECT value FROM meta WHERE name = 'employees'").fetchone()[0]
+    with _lock:
+        if _state['db'] == storage.DB_NAME and _state['version'] == version:
+            return _state
+    employees = {row[0]: Employee._make(row) for row in conn.execute(
+        'SELECT key, name, first_id, first_ts, last_ts, active FROM employees ORDER BY first_id')}
+    aliases = dict(conn.execute('SELECT alias, key FROM employee_aliases'))
+    with _lock:
+        _state.update(db=storage.DB_NAME, version=version, employees=employees, aliases=aliases)
+        return _state
+
+def _apply(version, changed=(), removed=()):
+    """
+    переносит изменения своей транзакции в копию в памяти
+    """
+    with _lock:
+        if _state['db'] != storage.DB_NAME or _state['version'] is None or version != _state['version'] + 1:
+            _state['version'] = None
+            return
+        employees = dict(_state['employees'])
+        for item in changed:
+            employees[item.key] = item
+        for key in removed:
+            employees.pop(key, None)
+        _state.update(version=version, employees=dict(sorted(employees.items(), key=lambda item: item[1].first_id)))
+
+def resolve(name):
+    """
+    ключ сотрудника по имени или псевдониму
+    """
+    key = employee_key(name)
+    return _load()['aliases'].get(key, key)
+
+def get(name):
+    """
+    сотрудник по имени или псевдониму, None если не найден
+    """
+    return _load()['employees'].get(resolve(name))
+
+def employees():
+    """
+    все сотрудники в порядке первой записи
+    """
+    return list(_load()['employees'].values())
+
+def listing(start_day, include_inactive=False):
+    """
+    сотрудники для отчета по всем за период с дня start_day в порядке первой записи:
+    без include_inactive - включенные, с записями не раньше EMPLOYEE_INACTIVE_DAYS дней до начала
+    """
+    items = employees()
+    if include_inactive:
+        return items
+    since = (start_day - config.EMPLOYEE_INACTIVE_DAYS) * DAY_SECONDS
+    return [item for item in items if item.active and item.last_ts >= since]
+
+def record_entries(conn, rows):
+    """
+    Учитывает новые записи (key, employee, id, ts) внутри транзакции записи.
+    Возвращает функцию, которую вызывают после COMMIT, и признак того,
+    что могли измениться списки сотрудников в отчетах.
+    """
+    rows = sorted((row for row in rows if row[0] and row[3] is not None), key=itemgetter(0, 2))
+    if not rows:
+        return (lambda: None), False
+    keys = sorted({row[0] for row in rows})
+    current = {row[0]: Employee._make(row) for row in conn.execute(
+        f'SELECT key, name, first_id, first_ts, last_ts, active FROM employees '
+        f'WHERE key IN ({", ".join("?" * len(keys))})', keys)}
+
+    changed = []
+    lists_changed = False
+    gap = config.EMPLOYEE_INACTIVE_DAYS * DAY_SECONDS
+    today = day_of(to_ts(datetime.now()))
+    for key, entries in groupby(rows, key=itemgetter(0)):
+        entries = list(entries)
+        first_ts = min(entry[3] for entry in entries)
+        last_ts = max(entry[3] for entry in entries)
+        item = current.get(key)
+        if item is None:
+            item = Employee(key, entries[0][1], entries[0][2], first_ts, last_ts, 1)
+            lists_changed = True
+        else:
+            # вернувшийся после перерыва или запись задним числом
+            # меняют состав списков в уже построенных отчетах за прошлые дни
+            if first_ts - item.last_ts > gap or last_ts > item.last_ts and day_of(last_ts) < today:
+                lists_changed = True
+            item = item._replace(first_ts=min(item.first_ts, first_ts), last_ts=max(item.last_ts, last_ts))
+        changed.append(item)
+
+    conn.executemany('INSERT OR REPLACE INTO employees(key, name, first_id, first_ts, last_ts, active) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', changed)
+    version = _touch(conn, lists_changed)
+    return (lambda: _apply(version, changed)), lists_changed
+
+def refresh_employee(conn, key):
+    """
+    пересчитывает сотрудника по дневным итогам (после удаления записей) внутри
+    транзакции; возвращает функцию для вызова после COMMIT и признак изменения списков
+    """
+    if not key:
+        return (lambda: None), False
+    summary = _summaries(conn, [key]).get(key)
+    if summary is None:
+        conn.execute('DELETE FROM employees WHERE key = ?', (key,))
+        version = _touch(conn, lists_changed=True)
+        return (lambda: _apply(version, removed=[key])), True
+
+    row = conn.execute('SELECT name, first_id, last_ts, active FROM employees WHERE key = ?', (key,)).fetchone()
+    item = summary._replace(active=row[3] if row else 1)
+    conn.execute('INSERT OR REPLACE INTO employees(key, name, first_id, first_ts, last_ts, active) '
+                 'VALUES (?, ?, ?, ?, ?, ?)', item)
+    lists_changed = row is None or (item.name, item.first_id, item.last_ts) != row[:3]
+    version = _touch(conn, lists_changed)
+    return (lambda: _apply(version, [item])), lists_changed
+
+def set_active(name, active):
+    """
+    включает/выключает сотрудника в отчетах по всем; False, если сотрудник не найден
+    """
+    import report_cache
+
+    key = resolve(name)
+    with storage.transaction() as conn:
+        if not conn.execute('UPDATE employees SET active = ? WHERE key = ?', (int(active), key)).rowcount:
+            return False
+        _touch(conn, lists_changed=True)
+    report_cache.clear()
+    return True
+
+def add_alias(alias, name):
+    """
+    Делает alias другим написанием сотрудника name. Если у alias уже есть записи,
+    они переносятся к сотруднику name вместе с дневными итогами.
+    ValueError, если сотрудника нет или записи alias в архиве.
+    """
+    import report_cache
+    import status
+    from rollup import recompute_day
+
+    alias_key = employee_key(alias)
+    target = resolve(name)
+    if not alias_key or alias_key == target:
+        raise ValueError('псевдоним совпадает с именем сотрудника')
+
+    with storage.transaction() as conn:
+        if not conn.execute('SELECT 1 FROM employees WHERE key = ?', (target,)).fetchone():
+            raise ValueError(f'сотрудник "{name}" не найден')
+
+        days = [row[0] for row in archive.query('SELECT day FROM daily_bounds WHERE employee_key = ?',
+                                                (alias_key,), *ALL_DAYS)]
+        archive.check_writable(days)
+        conn.execute('UPDATE user SET employee_key = ? WHERE employee_key = ?', (target, alias_key))
+        for day in days:
+            recompute_day(conn, alias_key, day)
+            recompute_day(conn, target, day)
+
+        conn.execute('DELETE FROM employees WHERE key = ?', (alias_key,))
+        conn.execute('UPDATE employee_aliases SET key = ? WHERE key = ?', (target, alias_key))
+        conn.execute('INSERT OR REPLACE INTO employee_aliases(alias, key) VALUES (?, ?)', (alias_key, target))
+        refresh_employee(conn, target)
+        _touch(conn, lists_changed=True)
+        status.refresh(conn, [alias_key, target])
+    report_cache.clear()
+    return len(days)
@@ -0,0 +1,129 @@
+"""
+Пул обработчиков обновлений для TeleBot.
+
+Обновления одного чата выполняются строго по очереди (правки и удаления
+пользователя не перемешиваются), разные чаты - параллельно. Тяжелые отчеты
+идут в отдельную полосу со своими потоками, чтобы добавление записей
+не ждало длинный /periodAll.
+"""
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+FAST_LANE = 'fast'
+HEAVY_LANE = 'heavy'
+
+def update_chat_id(update):
+    """
+    чат, к которому относится сообщение или нажатие кнопки
+    """
+    message = getattr(update, 'message', None) if not hasattr(update, 'chat') else update
+    chat = getattr(message, 'chat', None)
+    if chat is not None:
+        return chat.id
+    user = getattr(update, 'from_user', None)
+    return user.id if user is not None else None
+
+def update_command(update):
+    """
+    команда сообщения без "/" и "@имя_бота", иначе None
+    """
+    text = getattr(update, 'text', None)
+    if not text or not text.startswith('/'):
+        return None
+    return text.split()[0][1:].split('@')[0]
+
+class OrderedWorkerPool:
+    """
+    Замена telebot.util.ThreadPool с тем же интерфейсом (put, raise_exceptions,
+    clear_exceptions, close, exception_event).
+    """
+
+    def __init__(self, telebot, fast_workers, heavy_workers, heavy_commands):
+        self.telebot = telebot
+        self.heavy_commands = set(heavy_commands)
+        self.executors = {
+            FAST_LANE: ThreadPoolExecutor(fast_workers, thread_name_prefix='bot-fast'),
+            HEAVY_LANE: ThreadPoolExecutor(heavy_workers, thread_name_prefix='bot-heavy'),
+        }
+        self.exception_event = threading.Event()
+        self.exception_info = None
+        self._lock = threading.Lock()
+        self._queues = {}
+
+    def lane(self, update):
+        if getattr(update, 'content_type', None) == 'document' or update_command(update) in self.heavy_commands:
+            return HEAVY_LANE
+        return FAST_LANE
+
+    def put(self, func, *args, **kwargs):
+        update = args[0] if args else None
+        key = (self.lane(update), update_chat_id(update))
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                queue.append((func, args, kwargs))
+                return
+            self._queues[key] = deque([(func, args, kwargs)])
+        self.executors[key[0]].submit(self._run_next, key)
+
+    def _run_next(self, key):
+        """
+        выполняет одну задачу чата и ставит следующую в конец полосы,
+        чтобы активный чат не занимал поток целиком
+        """
+        with self._lock:
+            func, args, kwargs = self._queues[key][0]
+        try:
+            func(*args, **kwargs)
+        except Exception as exc:
+            logger.exception('Ошибка в обработчике')
+            self._on_exception(exc)
+        with self._lock:
+            queue = self._queues[key]
+            queue.popleft()
+            if not queue:
+                del self._queues[key]
+                return
+        self.executors[key[0]].submit(self._run_next, key)
+
+    def _on_exception(self, exc):
+        handler = self.telebot.exception_handler
+        if handler is not None and handler.handle(exc):
+            return
+        self.exception_info = exc
+        self.exception_event.set()
+
+    def pending(self):
+        """
+        число задач в очередях по полосам
+        """
+        with self._lock:
+            result = {FAST_LANE: 0, HEAVY_LANE: 0}
+            for (lane, _), queue in self._queues.items():
+                result[lane] += len(queue)
+            return result
+
+    def raise_exceptions(self):
+        if self.exception_event.is_set():
+            raise self.exception_info
+
+    def clear_exceptions(self):
+        self.exception_event.clear()
+
+    def close(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+
+def install(bot, fast_workers, heavy_workers, heavy_commands):
+    """
+    заменяет стандартный пул TeleBot на OrderedWorkerPool
+    """
+    if bot.threaded and bot.worker_pool:
+        bot.worker_pool.close()
+    bot.threaded = True
+    bot.worker_pool = OrderedWorkerPool(bot, fast_workers, heavy_workers, heavy_commands)
+    return bot.worker_pool
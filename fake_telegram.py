@@ -0,0 +1,184 @@
+"""
+Локальная подмена Bot API Telegram для проверки webhook-режима без сети.
+
+Сервер принимает запросы бота (/bot<token>/<method>), отвечает правдоподобными
+результатами и запоминает их. После setWebhook он может сам отправлять
+обновления на webhook бота. С --chat-limit N отвечает 429 (retry_after 1),
+если в чат шлют больше N сообщений в секунду.
+
+    python fake_telegram.py serve [--port 8081]
+    BOT_MODE=webhook TELEGRAM_API_URL=http://127.0.0.1:8081 \\
+        WEBHOOK_URL=http://127.0.0.1:5000 python app.py
+    python fake_telegram.py send "0101 0900 комментарий
+    иван
+    Проект"
+    python fake_telegram.py calls
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8081
+
+_lock = threading.Lock()
+_calls = []
+_webhook = {'url': None, 'secret': None}
+_message_ids = itertools.count(1000)
+_update_ids = itertools.count(1)
+# сообщений в секунду на чат до ответа 429, None - без ограничения
+_flood = {'limit': None, 'sent': {}}
+
+def _user(user_id=1):
+    return {'id': user_id, 'is_bot': False, 'first_name': 'Тест'}
+
+def _chat(chat_id):
+    return {'id': int(chat_id), 'type': 'private'}
+
+def make_message(text, chat_id=1, message_id=None):
+    return {
+        'message_id': message_id or next(_message_ids),
+        'date': int(time.time()),
+        'chat': _chat(chat_id),
+        'from': _user(int(chat_id)),
+        'text': text,
+    }
+
+def _result(method, params):
+    """
+    ответ Bot API на вызов метода
+    """
+    if method == 'getMe':
+        return {'id': 1, 'is_bot': True, 'first_name': 'fake', 'username': 'fake_bot'}
+    if method == 'setWebhook':
+        _webhook['url'] = params.get('url')
+        _webhook['secret'] = params.get('secret_token')
+        return True
+    if method == 'deleteWebhook':
+        _webhook['url'] = None
+        return True
+    if method == 'getWebhookInfo':
+        return {'url': _webhook['url'] or '', 'has_custom_certificate': False, 'pending_update_count': 0}
+    if method in ('sendMessage', 'editMessageText'):
+        message = make_message(params.get('text', ''), params.get('chat_id', 1),
+                               params.get('message_id'))
+        message['from'] = {'id': 1, 'is_bot': True, 'first_name': 'fake'}
+        return message
+    if method == 'getUpdates':
+        time.sleep(min(float(params.get('timeout', 0) or 0), 1))
+        return []
+    return True
+
+class Handler(BaseHTTPRequestHandler):
+
+    def _params(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else ''
+        query = urllib.parse.urlsplit(self.path).query
+        params = dict(urllib.parse.parse_qsl(query))
+        if body:
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                params.update(json.loads(body))
+            else:
+                params.update(urllib.parse.parse_qsl(body))
+        return params
+
+    def _reply(self, payload, status=200):
+        data = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        path = urllib.parse.urlsplit(self.path).path
+        params = self._params()
+        if path == '/_calls':
+            with _lock:
+                return self._reply(list(_calls))
+        if path == '/_send':
+            return self._reply(send_update(params.get('text', ''), params.get('chat_id', 1)))
+
+        method = path.rsplit('/', 1)[-1]
+        if method == 'sendMessage' and _flooded(params.get('chat_id')):
+            return self._reply({'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                                'parameters': {'retry_after': 1}}, 429)
+        with _lock:
+            _calls.append({'method': method, 'params': params})
+        self._reply({'ok': True, 'result': _result(method, params)})
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+def _flooded(chat_id):
+    """
+    превышен ли лимит сообщений в секунду для чата
+    """
+    if _flood['limit'] is None:
+        return False
+    now = time.monotonic()
+    with _lock:
+        recent = [moment for moment in _flood['sent'].get(chat_id, []) if now - moment < 1]
+        if len(recent) >= _flood['limit']:
+            return True
+        _flood['sent'][chat_id] = recent + [now]
+    return False
+
+def send_update(text, chat_id=1):
+    """
+    отправляет на webhook бота обновление с текстовым сообщением
+    """
+    if not _webhook['url']:
+        return {'ok': False, 'description': 'webhook не установлен'}
+    update = {'update_id': next(_update_ids), 'message': make_message(text, chat_id)}
+    request = urllib.request.Request(_webhook['url'], data=json.dumps(update).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    if _webhook['secret']:
+        request.add_header('X-Telegram-Bot-Api-Secret-Token', _webhook['secret'])
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return {'ok': True, 'status': response.status}
+
+def serve(port=DEFAULT_PORT, host='127.0.0.1', chat_limit=None):
+    """
+    запускает сервер в фоновом потоке и возвращает его
+    """
+    _flood['limit'] = chat_limit
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name='fake-telegram').start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Подмена Bot API Telegram')
+    parser.add_argument('command', choices=['serve', 'send', 'calls'])
+    parser.add_argument('text', nargs='?', default='')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--chat', type=int, default=1)
+    parser.add_argument('--chat-limit', type=int, default=None,
+                        help='отвечать 429, если в чат шлют больше стольких сообщений в секунду')
+    args = parser.parse_args()
+
+    base = f'http://127.0.0.1:{args.port}'
+    if args.command == 'serve':
+        _flood['limit'] = args.chat_limit
+        server = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+        print(f'Bot API: {base}')
+        server.serve_forever()
+    elif args.command == 'send':
+        query = urllib.parse.urlencode({'text': args.text, 'chat_id': args.chat})
+        with urllib.request.urlopen(f'{base}/_send?{query}') as response:
+            print(response.read().decode())
+    else:
+        with urllib.request.urlopen(f'{base}/_calls') as response:
+            for call in json.loads(response.read()):
+                print(call['method'], json.dumps(call['params'], ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
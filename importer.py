@@ -0,0 +1,215 @@
+"""
+Массовая загрузка записей из CSV или XLSX.
+
+Первая строка - заголовок. Колонки (по-русски или по-английски):
+сотрудник/employee, проект/project, дата/date, время/time, комментарий/comment;
+вместо даты и времени можно одну колонку time_stamp ("ГГГГ-ММ-ДД ЧЧ:ММ[:СС]").
+Дата - ГГГГ-ММ-ДД, ДДММГГ или ДДММ (год как в /projectsPeriod: ближайший
+прошедший), время - ЧЧММ или ЧЧ:ММ[:СС]. Строки с ошибками пропускаются.
+Файл читается построчно и загружается пачками (database.import_logs):
+в памяти только текущая пачка записей.
+
+    python importer.py timesheet.csv [--db bd_nikos.sql] [--drop-indexes] [--dry-run]
+
+Для XLSX нужен openpyxl (pip install openpyxl).
+"""
+import argparse
+import csv
+import io
+import time
+from collections import namedtuple
+from datetime import date, datetime
+from functools import lru_cache
+
+from database import import_logs, infer_year
+from schema import parse_time_stamp
+
+COLUMNS = {
+    'employee': ('employee', 'сотрудник'),
+    'project': ('project', 'проект'),
+    'date': ('date', 'дата'),
+    'time': ('time', 'время'),
+    'time_stamp': ('time_stamp', 'timestamp', 'дата и время'),
+    'comment': ('comment', 'комментарий'),
+}
+MAX_ERRORS = 20
+
+ImportResult = namedtuple('ImportResult', 'imported skipped errors seconds')
+
+def _column_map(header):
+    """
+    номера колонок по заголовку; ValueError, если обязательных нет
+    """
+    names = [str(name or '').strip().lower() for name in header]
+    result = {}
+    for column, aliases in COLUMNS.items():
+        for i, name in enumerate(names):
+            if name in aliases:
+                result[column] = i
+                break
+    missing = [column for column in ('employee', 'project') if column not in result]
+    if 'time_stamp' not in result and not ('date' in result and 'time' in result):
+        missing.append('date/time или time_stamp')
+    if missing:
+        raise ValueError(f'нет колонок: {", ".join(missing)}')
+    return result
+
+def iter_csv(stream):
+    """
+    строки CSV из текстового потока, разделитель определяется по началу файла
+    """
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    return csv.reader(stream, dialect)
+
+def iter_xlsx(source):
+    """
+    строки первого листа XLSX без загрузки книги в память
+    """
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError('для XLSX нужен openpyxl (pip install openpyxl)')
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+@lru_cache(maxsize=4096)
+def _parse_date(value, today):
+    """
+    дата "ГГГГ-ММ-ДД" из ГГГГ-ММ-ДД, ДДММГГ или ДДММ
+    """
+    value = value.strip()
+    try:
+        if '-' in value:
+            return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+        if len(value) in (4, 6) and value.isdigit():
+            return infer_year(value, today).strftime('%Y-%m-%d')
+    except ValueError:
+        pass
+    raise ValueError(f'неверная дата: {value}')
+
+@lru_cache(maxsize=2048)
+def _parse_time(value):
+    """
+    время "ЧЧ:ММ:СС" из ЧЧММ или ЧЧ:ММ[:СС]
+    """
+    value = value.strip()
+    for fmt in ('%H%M', '%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).strftime('%H:%M:%S')
+        except ValueError:
+            pass
+    raise ValueError(f'неверное время: {value}')
+
+def _time_stamp(row, columns, today):
+    """
+    time_stamp записи в формате БД
+    """
+    if 'time_stamp' in columns:
+        value = row[columns['time_stamp']]
+        if isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        value = str(value or '').strip()
+        if '(' not in value and parse_time_stamp(value) is not None:
+            return value
+        try:
+            return datetime.strptime(value, '%Y-%m-%d %H:%M').strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            raise ValueError(f'неверные дата и время: {value}')
+
+    day, moment = row[columns['date']], row[columns['time']]
+    if isinstance(day, (datetime, date)):
+        day = day.strftime('%Y-%m-%d')
+    else:
+        day = _parse_date(str(day or ''), today)
+    if hasattr(moment, 'hour'):
+        moment = moment.strftime('%H:%M:%S')
+    else:
+        moment = _parse_time(str(moment or ''))
+    return f'{day} {moment}'
+
+def parse_rows(rows, errors, today=None):
+    """
+    Записи (employee, project, time_stamp, comment) из строк таблицы.
+    Ошибки (номер строки, текст) добавляются в errors, строка пропускается.
+    """
+    rows = iter(rows)
+    columns = _column_map(next(rows, ()))
+    today = today or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    comment_column = columns.get('comment')
+    for line, row in enumerate(rows, 2):
+        if not row or not any(row):
+            continue
+        try:
+            employee = str(row[columns['employee']] or '').strip().lower()
+            project = str(row[columns['project']] or '').strip()
+            if not employee or not project:
+                raise ValueError('не указан сотрудник или проект')
+            comment = row[comment_column] if comment_column is not None and comment_column < len(row) else None
+            yield employee, project, _time_stamp(row, columns, today), str(comment or '').strip()
+        except (ValueError, IndexError) as exc:
+            errors.append((line, str(exc)))
+
+def import_file(source, kind=None, drop_indexes=False, dry_run=False):
+    """
+    Загружает CSV/XLSX. source - путь или двоичный файловый объект,
+    kind - 'csv' или 'xlsx' (по умолчанию по расширению пути).
+    """
+    kind = kind or str(source).rsplit('.', 1)[-1].lower()
+    if kind not in ('csv', 'xlsx'):
+        raise ValueError('поддерживаются только файлы CSV и XLSX')
+
+    started = time.perf_counter()
+    errors = []
+    if kind == 'xlsx':
+        entries = parse_rows(iter_xlsx(source), errors)
+        count = sum(1 for _ in entries) if dry_run else import_logs(entries, drop_indexes)
+    else:
+        binary = open(source, 'rb') if isinstance(source, str) else source
+        try:
+            stream = io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+            entries = parse_rows(iter_csv(stream), errors)
+            count = sum(1 for _ in entries) if dry_run else import_logs(entries, drop_indexes)
+        finally:
+            if binary is not source:
+                binary.close()
+    return ImportResult(count, len(errors), errors[:MAX_ERRORS], time.perf_counter() - started)
+
+def describe(result, dry_run=False):
+    """
+    текст итога загрузки
+    """
+    action = 'Проверено' if dry_run else 'Загружено'
+    text = f'{action} записей: {result.imported}, пропущено строк: {result.skipped} ({result.seconds:.1f} с)'
+    if result.errors:
+        text += '\n' + '\n'.join(f'строка {line}: {error}' for line, error in result.errors)
+        if result.skipped > len(result.errors):
+            text += '\n…'
+    return text
+
+def main():
+    parser = argparse.ArgumentParser(description='Загрузка записей из CSV/XLSX')
+    parser.add_argument('file')
+    parser.add_argument('--db', default=None)
+    parser.add_argument('--drop-indexes', action='store_true',
+                        help='снять индексы на время загрузки (миллионы строк)')
+    parser.add_argument('--dry-run', action='store_true', help='только проверить файл')
+    args = parser.parse_args()
+
+    import storage
+    from bootstrap import init_db
+    if args.db:
+        storage.configure(args.db)
+    init_db()
+    result = import_file(args.file, drop_indexes=args.drop_indexes, dry_run=args.dry_run)
+    print(describe(result, args.dry_run))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Разбор сообщений с записями рабочего времени.
+
+Запись - три строки: "ДДММ(ГГ) ЧЧММ комментарий" (или "ЧЧММ комментарий"
+за сегодня), сотрудники через пробел, проект; следующие строки записи не
+читаются. В одном сообщении может быть несколько записей, разделенных пустой
+строкой; блок короче трех строк после записи - заметка к ней и тоже не
+читается. Шаблоны компилируются один раз, ближайшая дата для ДДММ берется
+из таблицы на текущий день (nearest_dates), time_stamp собирается из готовых
+строк без strptime/strftime. Сверка со старым разбором - tests/test_ingest.py,
+замер - benchmarks/bench_ingest.py.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime, time
+from functools import lru_cache
+
+from database import get_nearest_date
+
+# date - полночь дня записи (datetime), date_part - ДДММ как во вводе
+Entry = namedtuple('Entry', 'date date_part time_stamp employees project comment')
+
+TIME_LINE_RE = re.compile(r'(\d{4,6})? ?(\d{4})(?: (.+))?', re.ASCII)
+ENTRY_SEPARATOR_RE = re.compile(r'\n\s*\n')
+
+FORMAT_ERROR = ('Сообщение должно состоять минимум из 3х строк: '
+                'дата/время(формат ДДММ ЧЧММ комментарий или ЧЧММ комментарий), '
+                'сотрудник, проект')
+TIME_LINE_ERROR = ('Неверный формат строки времени. '
+                   'Используйте "ДДММ ЧЧММ комментарий" или "ЧЧММ комментарий"')
+DATE_ERROR = 'Ошибка в формате даты или времени: '
+
+@lru_cache(maxsize=2)
+def nearest_dates(today, at_midnight=False):
+    """
+    ДДММ -> (дата, "ГГГГ-ММ-ДД") для всех дат года по правилу get_nearest_date
+    в любой момент дня today; at_midnight - для момента ровно 00:00:00
+    """
+    # get_nearest_date сравнивает abs((дата - момент).days), а .days округляет вниз. Дата этого
+    # года, прошедшая или сегодняшняя, ближе всегда. Для даты через b дней после today при L днях
+    # между нею и датой прошлого года этот год выбирается при 2b <= L + 2 в любой момент после
+    # полуночи и при 2b <= L ровно в полночь - выбор зависит только от дня и от at_midnight.
+    current_date = datetime.combine(today, time(0) if at_midnight else time(12))
+    table = {}
+    for month in range(1, 13):
+        for day in range(1, 32):
+            date_part = f'{day:02d}{month:02d}'
+            try:
+                nearest = get_nearest_date(date_part, current_date)
+            except ValueError:
+                continue
+            table[date_part] = nearest, nearest.strftime('%Y-%m-%d')
+    return table
+
+@lru_cache(maxsize=1024)
+def _full_date(date_part):
+    """
+    ДДММГГ -> (дата, "ГГГГ-ММ-ДД"); None для неверной даты
+    """
+    try:
+        full_date = datetime.strptime(date_part, '%d%m%y')
+    except ValueError:
+        return None
+    return full_date, full_date.strftime('%Y-%m-%d')
+
+def _nearest(date_part, now):
+    """
+    (дата, "ГГГГ-ММ-ДД") для ДДММ(ГГ) относительно момента now; None для неверной даты
+    """
+    if len(date_part) == 6:
+        return _full_date(date_part)
+    if len(date_part) == 5:
+        # как в get_nearest_date: месяц - все цифры после дня
+        date_part = f'{date_part[:2]}{int(date_part[2:]):02d}'
+    return nearest_dates(now.date(), now.time() == time(0)).get(date_part)
+
+def parse_entry(lines, now):
+    """
+    запись из строк, ДДММ - ближайшая к моменту now; ValueError с текстом ответа пользователю
+    """
+    if len(lines) < 3:
+        raise ValueError(FORMAT_ERROR)
+    match = TIME_LINE_RE.match(lines[0].strip())
+    if not match:
+        raise ValueError(TIME_LINE_ERROR)
+    date_part, time_part, comment = match.groups()
+
+    if date_part is None:
+        date_part = f'{now.day:02d}{now.month:02d}'
+    nearest = _nearest(date_part, now)
+    if nearest is None:
+        raise ValueError(f'{DATE_ERROR}Неверная дата: {date_part}')
+    if time_part[:2] > '23' or time_part[2:] > '59':
+        raise ValueError(f'{DATE_ERROR}Неверное время: {time_part}')
+
+    return Entry(nearest[0], date_part, f'{nearest[1]} {time_part[:2]}:{time_part[2:]}:00',
+                 lines[1].strip().lower().split(), lines[2].strip(),
+                 comment.strip() if comment else '')
+
+def parse_message(text, now=None):
+    """
+    записи сообщения по порядку; ValueError с текстом ответа пользователю,
+    если хотя бы одна запись не разобрана (тогда не добавляется ни одна)
+    """
+    now = now or datetime.now()
+    blocks = ENTRY_SEPARATOR_RE.split(text.strip())
+    entries = []
+    for number, block in enumerate(blocks, 1):
+        lines = block.split('\n')
+        if entries and len(lines) < 3:
+            # заметка после записи: как строки записи после третьей, не читается
+            continue
+        try:
+            entries.append(parse_entry(lines, now))
+        except ValueError as exc:
+            if len(blocks) == 1:
+                raise
+            raise ValueError(f'Запись {number}: {exc}') from None
+    return entries
@@ -0,0 +1,335 @@
+"""
+Метрики процесса: гистограммы задержек обработчиков, запросов к БД и вызовов
+Bot API, время БД и Telegram внутри каждого обработчика, число прочитанных
+строк и отправленных сообщений. Счетчики живут в памяти процесса: в режиме
+polling бот и Flask-приложение - разные процессы со своими метриками.
+
+Здесь же настройка журнала: токен в адресах Bot API заменяется, а строки
+холостых getUpdates пишутся выборочно.
+"""
+import functools
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+HANDLER = 'handler'
+DB = 'db'
+API = 'api'
+POLL = 'poll'
+
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+MESSAGE_METHODS = ('sendMessage', 'editMessageText', 'sendDocument')
+
+_lock = threading.Lock()
+_local = threading.local()
+_histograms = {}
+_errors = {}
+_rows = {}
+_splits = {}
+_started = time.time()
+
+class Histogram:
+    """
+    гистограмма с фиксированными границами BUCKETS_MS
+    """
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(BUCKETS_MS) and value > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        верхняя граница корзины, в которую попадает квантиль q
+        """
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else float('inf')
+        return 0
+
+def observe(kind, name, elapsed_ms, error=False):
+    with _lock:
+        histogram = _histograms.get((kind, name))
+        if histogram is None:
+            histogram = _histograms[(kind, name)] = Histogram()
+        histogram.observe(elapsed_ms)
+        if error:
+            _errors[(kind, name)] = _errors.get((kind, name), 0) + 1
+
+def _context():
+    return getattr(_local, 'context', None)
+
+def current_handler():
+    """
+    имя обработчика, который выполняется в текущем потоке, или None
+    """
+    return getattr(_local, 'handler', None)
+
+@contextmanager
+def charged_to(handler):
+    """
+    вызовы Bot API внутри блока учитываются в разбивке обработчика handler:
+    отправка из очереди идет в другом потоке уже после обработчика
+    """
+    _local.charge_to = handler
+    try:
+        yield
+    finally:
+        _local.charge_to = None
+
+def charge(handler, api_ms, messages=0):
+    """
+    добавляет к разбивке обработчика время Bot API и отправленные сообщения
+    """
+    if handler is not None:
+        _add_split(handler, {API: api_ms, 'messages': messages})
+
+def count_rows(count):
+    """
+    учитывает строки, прочитанные из БД текущим запросом
+    """
+    name = getattr(_local, 'db_name', None) or 'query'
+    with _lock:
+        _rows[name] = _rows.get(name, 0) + count
+    context = _context()
+    if context is not None:
+        context['rows'] += count
+
+def timed(kind, name=None):
+    """
+    Декоратор замера времени. Вложенные вызовы того же вида (функция БД внутри
+    функции БД) учитываются внешним вызовом. Обработчик собирает время БД
+    и Bot API, строки и сообщения, накопленные за время своей работы.
+    """
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            active = getattr(_local, 'active', None)
+            if active is None:
+                active = _local.active = set()
+            if kind in active:
+                return func(*args, **kwargs)
+
+            active.add(kind)
+            context = None
+            if kind == HANDLER:
+                context = _local.context = {DB: 0.0, API: 0.0, 'rows': 0, 'messages': 0}
+                _local.handler = label
+            elif kind == DB:
+                _local.db_name = label
+            error = False
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                active.discard(kind)
+                observe(kind, label, elapsed, error)
+                if context is not None:
+                    _local.context = None
+                    _local.handler = None
+                    _add_split(label, context)
+                else:
+                    if kind == DB:
+                        _local.db_name = None
+                    outer = _context()
+                    if outer is not None and kind in outer:
+                        outer[kind] += elapsed
+        return wrapper
+    return decorator
+
+def _add_split(name, context):
+    with _lock:
+        split = _splits.setdefault(name, {DB: 0.0, API: 0.0, 'rows': 0, 'messages': 0})
+        for key, value in context.items():
+            split[key] += value
+
+def instrument_telegram(apihelper):
+    """
+    оборачивает apihelper._make_request: время каждого метода Bot API,
+    getUpdates учитывается отдельно - это ожидание, а не работа
+    """
+    original = apihelper._make_request
+    if getattr(original, 'instrumented', False):
+        return
+
+    @functools.wraps(original)
+    def make_request(token, method_name, *args, **kwargs):
+        kind = POLL if method_name == 'getUpdates' else API
+        error = False
+        started = time.perf_counter()
+        try:
+            return original(token, method_name, *args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            observe(kind, method_name, elapsed, error)
+            context = _context()
+            if context is not None and kind == API:
+                context[API] += elapsed
+                if method_name in MESSAGE_METHODS:
+                    context['messages'] += 1
+            elif kind == API:
+                charge(getattr(_local, 'charge_to', None), elapsed, int(method_name in MESSAGE_METHODS))
+
+    make_request.instrumented = True
+    apihelper._make_request = make_request
+
+def snapshot():
+    """
+    копия всех счетчиков
+    """
+    with _lock:
+        histograms = {key: (list(h.counts), h.count, h.sum, h.quantile(0.5), h.quantile(0.95))
+                      for key, h in _histograms.items()}
+        return {
+            'uptime': time.time() - _started,
+            'histograms': histograms,
+            'errors': dict(_errors),
+            'rows': dict(_rows),
+            'splits': {name: dict(split) for name, split in _splits.items()},
+        }
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _errors.clear()
+        _rows.clear()
+        _splits.clear()
+
+def _format_ms(value):
+    return '∞' if value == float('inf') else f'{value:g}'
+
+def render_text(cache_stats=None):
+    """
+    сводка для команды /stats
+    """
+    data = snapshot()
+    lines = [f'Работает {int(data["uptime"] // 3600)} ч {int(data["uptime"] % 3600 // 60)} мин']
+    titles = ((HANDLER, 'Обработчики'), (DB, 'БД'), (API, 'Bot API'), (POLL, 'Ожидание обновлений'))
+    for kind, title in titles:
+        items = sorted((name, value) for (k, name), value in data['histograms'].items() if k == kind)
+        if not items:
+            continue
+        lines.append(f'\n{title} (вызовов, p50/p95 мс, среднее мс):')
+        for name, (_, count, total, p50, p95) in items:
+            line = f'{name}: {count}, {_format_ms(p50)}/{_format_ms(p95)}, {total / count:.1f}'
+            errors = data['errors'].get((kind, name))
+            if errors:
+                line += f', ошибок {errors}'
+            split = data['splits'].get(name) if kind == HANDLER else None
+            if split:
+                line += (f'\n    БД {split[DB]:.0f} мс, API {split[API]:.0f} мс, '
+                         f'строк {split["rows"]}, сообщений {split["messages"]}')
+            lines.append(line)
+    if data['rows']:
+        lines.append('\nПрочитано строк:')
+        lines.extend(f'{name}: {count}' for name, count in sorted(data['rows'].items()))
+    if cache_stats:
+        lines.append('\nКэш отчетов: ' + ', '.join(f'{key} {value}' for key, value in cache_stats.items()))
+    return '\n'.join(lines)
+
+def render_prometheus(cache_stats=None):
+    """
+    метрики в текстовом формате Prometheus для /metrics
+    """
+    data = snapshot()
+    lines = ['# TYPE bot_latency_ms histogram']
+    for (kind, name), (counts, count, total, _, _) in sorted(data['histograms'].items()):
+        labels = f'kind="{kind}",name="{name}"'
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS_MS + ('+Inf',), counts):
+            cumulative += bucket
+            lines.append(f'bot_latency_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'bot_latency_ms_sum{{{labels}}} {total:.3f}')
+        lines.append(f'bot_latency_ms_count{{{labels}}} {count}')
+
+    lines.append('# TYPE bot_errors_total counter')
+    for (kind, name), count in sorted(data['errors'].items()):
+        lines.append(f'bot_errors_total{{kind="{kind}",name="{name}"}} {count}')
+    lines.append('# TYPE bot_rows_total counter')
+    for name, count in sorted(data['rows'].items()):
+        lines.append(f'bot_rows_total{{name="{name}"}} {count}')
+    for key, metric in ((DB, 'bot_handler_db_ms_total'), (API, 'bot_handler_api_ms_total'),
+                        ('rows', 'bot_handler_rows_total'), ('messages', 'bot_handler_messages_total')):
+        lines.append(f'# TYPE {metric} counter')
+        for name, split in sorted(data['splits'].items()):
+            lines.append(f'{metric}{{name="{name}"}} {split[key]:g}')
+    if cache_stats:
+        lines.append('# TYPE bot_report_cache gauge')
+        for key, value in sorted(cache_stats.items()):
+            lines.append(f'bot_report_cache{{stat="{key}"}} {value}')
+    lines.append('# TYPE bot_uptime_seconds gauge')
+    lines.append(f'bot_uptime_seconds {data["uptime"]:.0f}')
+    return '\n'.join(lines) + '\n'
+
+_TOKEN_RE = re.compile(r'\d{5,}:[\w-]{30,}')
+_POLL_RE = re.compile(r'getUpdates|Starting new HTTPS? connection|Resetting dropped connection')
+
+class RedactFilter(logging.Filter):
+    """
+    заменяет токен бота в сообщениях журнала
+    """
+
+    def filter(self, record):
+        message = record.getMessage()
+        if _TOKEN_RE.search(message):
+            record.msg = _TOKEN_RE.sub('<token>', message)
+            record.args = ()
+        return True
+
+class SampleFilter(logging.Filter):
+    """
+    пропускает одну из every строк холостого опроса getUpdates
+    """
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = max(1, every)
+        self.seen = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or not _POLL_RE.search(record.getMessage()):
+            return True
+        with self._lock:
+            self.seen += 1
+            return self.seen % self.every == 1 or self.every == 1
+
+def configure_logging(path, level='INFO', sample_every=100):
+    """
+    журнал в файл path: токен скрыт, строки опроса - выборочно,
+    urllib3 пишет DEBUG только при level=DEBUG
+    """
+    handler = logging.FileHandler(path, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    handler.addFilter(RedactFilter())
+    handler.addFilter(SampleFilter(sample_every))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+    if logging.getLevelName(level) != logging.DEBUG:
+        logging.getLogger('urllib3').setLevel(logging.WARNING)
+    return handler
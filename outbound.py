@@ -0,0 +1,377 @@
+"""
+Очередь исходящих сообщений.
+
+Обработчики не ждут Bot API: ответы кладутся в очередь своего чата и сразу
+возвращают управление, а отправляют их несколько потоков отправки.
+Сообщения одного чата уходят строго по порядку, частота ограничена
+корзинами токенов на чат и на весь бот, ответ 429 откладывает чат на
+retry_after секунд, сетевые ошибки повторяются с паузой.
+
+Длинный текст делится по строкам (HTML-теги закрываются в конце части и
+открываются снова в следующей), а короткие сообщения, скопившиеся в очереди
+чата подряд, склеиваются в одно.
+"""
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+from collections import deque, namedtuple
+
+from telebot.apihelper import ApiTelegramException
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+# запас на закрывающие и повторно открытые теги при делении HTML
+TAG_MARGIN = 100
+TEXT_METHODS = ('reply_to', 'send_message')
+# методы, которые Telegram считает отправкой сообщения в чат
+MESSAGE_METHODS = TEXT_METHODS + ('edit_message_text',)
+MAX_CHAT_BUCKETS = 10000
+
+_TAG_RE = re.compile(r'<(/?)([a-zA-Z][\w-]*)[^>]*>')
+
+# handler - обработчик, которому metrics засчитывает отправку
+Outgoing = namedtuple('Outgoing', 'name args kwargs handler', defaults=(None,))
+
+class TokenBucket:
+    """
+    Корзина токенов с резервированием: reserve() забирает токен
+    и возвращает, сколько секунд ждать до него (токенов может стать меньше нуля).
+    """
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now):
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class Limiter:
+    """
+    ограничение частоты отправки: общее на бот и на каждый чат
+    """
+
+    def __init__(self, global_rate=None, chat_rate=None, chat_burst=None):
+        self.global_rate = global_rate or config.OUTBOUND_GLOBAL_PER_SECOND
+        self.chat_rate = chat_rate or config.OUTBOUND_CHAT_PER_MINUTE / 60
+        self.chat_burst = chat_burst or config.OUTBOUND_CHAT_BURST
+        self.global_bucket = TokenBucket(self.global_rate, self.global_rate)
+        self.chats = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, chat_id):
+        """
+        резервирует отправку сообщения в чат, возвращает задержку в секундах
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.chats.get(chat_id)
+            if bucket is None:
+                if len(self.chats) >= MAX_CHAT_BUCKETS:
+                    self.chats = {key: item for key, item in self.chats.items() if not item.full(now)}
+                bucket = self.chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            return max(bucket.reserve(now), self.global_bucket.reserve(now))
+
+def retry_delay(exc, attempt):
+    """
+    пауза перед повтором отправки в секундах или None, если повторять не нужно:
+    для 429 - retry_after из ответа, для сетевых ошибок и 5xx - растущая с попытками
+    """
+    if isinstance(exc, ApiTelegramException):
+        if exc.error_code == 429:
+            parameters = exc.result_json.get('parameters') or {}
+            return float(parameters.get('retry_after', 1))
+        if exc.error_code < 500:
+            return None
+    elif not isinstance(exc, OSError):
+        return None
+    return float(2 ** attempt)
+
+def _pieces(text, size):
+    """
+    строки текста; строки длиннее size режутся по пробелу, не внутри тега или сущности
+    """
+    for line in text.splitlines(keepends=True):
+        while len(line) > size:
+            cut = line.rfind(' ', size // 2, size) + 1 or size
+            tag, entity = line.rfind('<', 0, cut), line.rfind('&', 0, cut)
+            if tag > line.rfind('>', 0, cut):
+                cut = tag
+            if entity > line.rfind(';', 0, cut):
+                cut = min(cut, entity)
+            cut = cut or size
+            yield line[:cut]
+            line = line[cut:]
+        if line:
+            yield line
+
+def _open_tags(tags, piece):
+    """
+    открытые теги [(открывающий тег, имя)] после куска HTML
+    """
+    for match in _TAG_RE.finditer(piece):
+        if not match.group(1):
+            tags = tags + [(match.group(0), match.group(2).lower())]
+        elif tags and tags[-1][1] == match.group(2).lower():
+            tags = tags[:-1]
+    return tags
+
+def _closing(tags):
+    return ''.join(f'</{name}>' for _, name in reversed(tags))
+
+def split_text(text, html=False, limit=MAX_MESSAGE_LENGTH):
+    """
+    делит текст на части не длиннее limit по границам строк;
+    для HTML незакрытые теги закрываются в конце части и открываются в следующей
+    """
+    if len(text) <= limit:
+        return [text]
+
+    parts = []
+    current = ''
+    tags = []
+    for piece in _pieces(text, limit - TAG_MARGIN):
+        after = _open_tags(tags, piece) if html else tags
+        if current and len(current) + len(piece) + len(_closing(after)) > limit:
+            parts.append(current + _closing(tags))
+            current = ''.join(tag for tag, _ in tags)
+        current += piece
+        tags = after
+    if _TAG_RE.sub('', current).strip():
+        parts.append(current)
+    return parts
+
+def expand(name, args, kwargs):
+    """
+    вызов API -> вызовы с текстом не длиннее лимита; клавиатура - у последней части
+    """
+    if name not in TEXT_METHODS:
+        return [Outgoing(name, args, kwargs)]
+    target, text = args[0], args[1]
+    parts = split_text(text, str(kwargs.get('parse_mode', '')).upper() == 'HTML')
+    if len(parts) == 1:
+        return [Outgoing(name, args, kwargs)]
+    plain = {key: value for key, value in kwargs.items() if key != 'reply_markup'}
+    return [Outgoing(name, (target, part), plain if i < len(parts) - 1 else kwargs)
+            for i, part in enumerate(parts)]
+
+def _target(item):
+    return getattr(item.args[0], 'message_id', item.args[0])
+
+def coalesce(pending):
+    """
+    забирает из очереди чата следующий вызов, склеивая с ним идущие подряд
+    короткие сообщения с теми же параметрами
+    """
+    item = pending.popleft()
+    if item.name not in TEXT_METHODS or 'reply_markup' in item.kwargs:
+        return item
+
+    texts = [item.args[1]]
+    length = len(item.args[1])
+    while pending:
+        following = pending[0]
+        plain = {key: value for key, value in following.kwargs.items() if key != 'reply_markup'}
+        if (following.name != item.name or _target(following) != _target(item) or plain != item.kwargs
+                or length + 1 + len(following.args[1]) > MAX_MESSAGE_LENGTH):
+            break
+        pending.popleft()
+        texts.append(following.args[1])
+        length += 1 + len(following.args[1])
+        if 'reply_markup' in following.kwargs:
+            item = following
+            break
+    if len(texts) == 1:
+        return item
+    return Outgoing(item.name, (item.args[0], '\n'.join(texts)), item.kwargs, item.handler)
+
+def plan(calls):
+    """
+    вызовы (имя, args, kwargs) одного обработчика -> вызовы для отправки
+    """
+    pending = deque(part for name, args, kwargs in calls for part in expand(name, args, kwargs))
+    result = []
+    while pending:
+        result.append(coalesce(pending))
+    return result
+
+class _Chat:
+    __slots__ = ('pending', 'current', 'attempts', 'scheduled')
+
+    def __init__(self):
+        self.pending = deque()
+        self.current = None
+        self.attempts = 0
+        self.scheduled = False
+
+class Sender:
+    """
+    Потоки отправки. Чат с сообщениями стоит в очереди по времени, когда его
+    можно обслужить; чат обрабатывает один поток, поэтому порядок сохраняется.
+    """
+
+    def __init__(self, bot, workers=None, limiter=None):
+        self.bot = bot
+        self.workers = workers or config.OUTBOUND_WORKERS
+        self.limiter = limiter or Limiter()
+        self.retries = config.OUTBOUND_RETRIES
+        self._condition = threading.Condition()
+        self._chats = {}
+        self._ready = []
+        self._sequence = itertools.count()
+        self._threads = []
+        self._active = 0
+        self._stats = {'queued': 0, 'sent': 0, 'coalesced': 0, 'retries': 0, 'dropped': 0}
+
+    def put(self, chat_id, name, args, kwargs):
+        """
+        ставит вызов API в очередь чата и сразу возвращает управление
+        """
+        handler = metrics.current_handler()
+        items = [item._replace(handler=handler) for item in expand(name, args, kwargs)]
+        with self._condition:
+            if not self._threads:
+                self._start()
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                chat = self._chats[chat_id] = _Chat()
+            chat.pending.extend(items)
+            self._stats['queued'] += len(items)
+            if not chat.scheduled and chat.current is None:
+                self._schedule(chat_id, chat, 0)
+
+    def _start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'outbound-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _schedule(self, chat_id, chat, delay):
+        chat.scheduled = True
+        heapq.heappush(self._ready, (time.monotonic() + delay, next(self._sequence), chat_id))
+        self._condition.notify()
+
+    def _next(self):
+        """
+        ждет чат, который пора обслужить; возвращает (chat_id, чат, вызов)
+        """
+        with self._condition:
+            while True:
+                if self._ready:
+                    wait = self._ready[0][0] - time.monotonic()
+                    if wait <= 0:
+                        _, _, chat_id = heapq.heappop(self._ready)
+                        chat = self._chats[chat_id]
+                        chat.scheduled = False
+                        if chat.current is None:
+                            queued = len(chat.pending)
+                            chat.current = coalesce(chat.pending)
+                            self._stats['coalesced'] += queued - len(chat.pending) - 1
+                            delay = (self.limiter.reserve(chat_id)
+                                     if chat.current.name in MESSAGE_METHODS else 0)
+                            if delay > 0:
+                                self._schedule(chat_id, chat, delay)
+                                continue
+                        self._active += 1
+                        return chat_id, chat, chat.current
+                else:
+                    wait = None
+                self._condition.wait(wait)
+
+    def _work(self):
+        while True:
+            chat_id, chat, item = self._next()
+            delay = None
+            outcome = 'sent'
+            try:
+                with metrics.charged_to(item.handler):
+                    getattr(self.bot, item.name)(*item.args, **item.kwargs)
+            except Exception as exc:
+                delay = retry_delay(exc, chat.attempts)
+                if delay is None or chat.attempts >= self.retries:
+                    logger.warning('Сообщение в чат %s не отправлено (%s): %s', chat_id, item.name, exc)
+                    delay = None
+                    outcome = 'dropped'
+                else:
+                    logger.info('Повтор отправки в чат %s через %s с: %s', chat_id, delay, exc)
+
+            with self._condition:
+                self._active -= 1
+                if delay is not None:
+                    chat.attempts += 1
+                    self._stats['retries'] += 1
+                    self._schedule(chat_id, chat, delay)
+                    continue
+                self._stats[outcome] += 1
+                chat.current = None
+                chat.attempts = 0
+                if chat.pending:
+                    self._schedule(chat_id, chat, 0)
+                elif not chat.scheduled:
+                    del self._chats[chat_id]
+                self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        ждет, пока очередь опустеет; False, если не дождались за timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._chats or self._active:
+                wait = None if deadline is None else deadline - time.monotonic()
+                if wait is not None and wait <= 0:
+                    return False
+                self._condition.wait(wait)
+        return True
+
+    def stats(self):
+        with self._condition:
+            return dict(self._stats, pending=sum(len(chat.pending) + (chat.current is not None)
+                                                 for chat in self._chats.values()))
+
+class Outbox:
+    """
+    Подставляется в commands вместо TeleBot: методы отправки ставят сообщения
+    в очередь Sender, остальные вызываются у бота напрямую.
+    """
+
+    def __init__(self, sender):
+        self.sender = sender
+
+    def reply_to(self, message, text, **kwargs):
+        self.sender.put(message.chat.id, 'reply_to', (message, text), kwargs)
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.sender.put(chat_id, 'send_message', (chat_id, text), kwargs)
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        self.sender.put(chat_id, 'edit_message_text', (text,),
+                        dict(kwargs, chat_id=chat_id, message_id=message_id))
+
+    def answer_callback_query(self, callback_query_id, *args, **kwargs):
+        # ответ на нажатие кнопки не сообщение: у каждого ответа своя очередь без ограничения
+        # частоты, медленный или отложенный по 429 ответ не задерживает ответы другим
+        self.sender.put(('callback', callback_query_id), 'answer_callback_query',
+                        (callback_query_id, *args), kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.sender.bot, name)
@@ -0,0 +1,169 @@
+"""
+Кэш готовых отчетов в памяти процесса.
+
+Ключ - (команда, employee_key или None для всех сотрудников, первый день, последний день).
+Записи вытесняются по LRU и по TTL, а при изменении записей сотрудника за день
+удаляются только отчеты, диапазон которых этот день включает. Отчеты, в диапазон
+которых входит сегодняшний день, не кэшируются: открытый интервал "НВ" зависит
+от текущего времени.
+
+Изменения из других процессов (загрузка, архив, пересборка итогов, serve
+и webhook) учитываются по версиям данных в БД: запись помнит версию данных
+на начало построения и считается промахом, только если после нее менялся
+один из дней ее диапазона у ее сотрудника (у любого - для отчетов по всем,
+schema.day_versions), а для отчетов со списком сотрудников - еще и этот список.
+
+Отчеты, построенные заранее планировщиком (scheduler.py), закрепляются:
+LRU их не вытесняет, а живут они до следующего запуска планировщика
+или до изменения записей.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import storage
+from schema import ALL_EMPLOYEES, day_of, to_ts
+
+MAX_ENTRIES = 256
+TTL_SECONDS = 15 * 60
+
+# отчеты по всем сотрудникам, в которых перечисляется весь список сотрудников
+# (с вариантами команды через двоеточие, например "reportAll:все")
+EMPLOYEE_LIST_COMMANDS = ('reportAll', 'periodAll')
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_version = 0
+_stats = {'hits': 0, 'misses': 0, 'bypasses': 0, 'evictions': 0, 'invalidations': 0, 'prebuilt': 0}
+
+def today():
+    """
+    номер сегодняшнего дня
+    """
+    return day_of(to_ts(datetime.now()))
+
+def get_or_build(command, employee_key, start_day, end_day, build):
+    """
+    Возвращает отчет из кэша или строит его через build().
+    build возвращает (значение, можно_ли_кэшировать).
+    """
+    if end_day >= today():
+        with _lock:
+            _stats['bypasses'] += 1
+        return build()[0]
+
+    key = (command, employee_key, start_day, end_day)
+    with _lock:
+        entry = _entries.get(key)
+    if entry is not None and entry[1] <= time.monotonic():
+        entry = None
+    # версии в БД проверяются без блокировки; запись, удаленная тем временем invalidate, - промах
+    changed = entry is not None and _changed_since(key, entry[3])
+    with _lock:
+        if entry is not None and _entries.get(key) is entry:
+            if not changed:
+                _entries.move_to_end(key)
+                _stats['hits'] += 1
+                return entry[0]
+            del _entries[key]
+            _stats['invalidations'] += 1
+        _stats['misses'] += 1
+        version = _version
+
+    stamp = _data_stamp()
+    value, cacheable = build()
+    if cacheable:
+        put(key, value, version, stamp=stamp)
+    return value
+
+def _data_stamp():
+    """
+    версии данных БД: (данные, последняя пересборка итогов, списки сотрудников)
+    """
+    values = dict(storage.get_connection().execute(
+        "SELECT name, value FROM meta WHERE name IN ('data', 'data_reset', 'employee_lists')"))
+    return values.get('data', 0), values.get('data_reset', 0), values.get('employee_lists', 0)
+
+def _changed_since(key, stamp):
+    """
+    менялись ли после stamp данные, из которых построен отчет key
+    """
+    command, employee_key, start_day, end_day = key
+    current = _data_stamp()
+    if current[1] > stamp[0]:
+        return True
+    if command.split(':')[0] in EMPLOYEE_LIST_COMMANDS and current[2] != stamp[2]:
+        return True
+    changed = storage.get_connection().execute(
+        'SELECT MAX(version) FROM day_versions WHERE employee_key = ? AND day BETWEEN ? AND ?',
+        (employee_key or ALL_EMPLOYEES, start_day, end_day)).fetchone()[0]
+    return changed is not None and changed > stamp[0]
+
+def put(key, value, version=None, pin_seconds=None, stamp=None):
+    """
+    кладет отчет в кэш, если с начала его построения записи не менялись;
+    pin_seconds - закрепить на столько секунд вместо TTL;
+    stamp - версии данных БД на начало построения (по умолчанию текущие)
+    """
+    if stamp is None:
+        stamp = _data_stamp()
+    with _lock:
+        if version is not None and version != _version:
+            return False
+        pinned = pin_seconds is not None
+        _entries[key] = (value, time.monotonic() + (pin_seconds if pinned else TTL_SECONDS), pinned, stamp)
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            oldest = next((item for item, entry in _entries.items() if not entry[2]), None)
+            if oldest is None:
+                break
+            del _entries[oldest]
+            _stats['evictions'] += 1
+        return True
+
+def prebuild(command, employee_key, start_day, end_day, build, pin_seconds):
+    """
+    Строит отчет заранее под тем же ключом, что и get_or_build, и закрепляет
+    его в кэше на pin_seconds. Возвращает значение.
+    """
+    stamp = _data_stamp()
+    with _lock:
+        version = _version
+    value, cacheable = build()
+    if cacheable and end_day < today() and put((command, employee_key, start_day, end_day), value,
+                                               version, pin_seconds, stamp):
+        with _lock:
+            _stats['prebuilt'] += 1
+    return value
+
+def invalidate(employee_key, day, employees_changed=False):
+    """
+    удаляет отчеты, затронутые изменением записей сотрудника за день;
+    employees_changed - изменился список сотрудников
+    """
+    global _version
+    with _lock:
+        _version += 1
+        stale = [key for key in _entries
+                 if (key[1] is None or key[1] == employee_key) and key[2] <= day <= key[3]
+                 or employees_changed and key[0].split(':')[0] in EMPLOYEE_LIST_COMMANDS]
+        for key in stale:
+            del _entries[key]
+        _stats['invalidations'] += len(stale)
+
+def clear():
+    """
+    очищает кэш
+    """
+    global _version
+    with _lock:
+        _version += 1
+        _entries.clear()
+
+def stats():
+    """
+    счетчики попаданий/промахов и текущий размер
+    """
+    with _lock:
+        return dict(_stats, size=len(_entries), pinned=sum(1 for entry in _entries.values() if entry[2]))
@@ -0,0 +1,143 @@
+"""
+Отчеты в виде данных.
+
+Функции возвращают именованные кортежи, из которых ответы бота (commands.py),
+HTML-страницы и JSON API (app.py) только форматируют текст: интервалы и итоги
+считаются здесь один раз. Время - целые секунды (schema.to_ts), день - номер
+дня (schema.day_of), минуты целые.
+"""
+from collections import namedtuple
+from datetime import datetime
+from operator import itemgetter
+
+from aggregation import STOP_PROJECTS, iter_employee_rows
+import archive
+import directory
+import status
+from database import LogRow, get_daily_report
+from rollup import has_entries, period_totals, project_report
+from schema import DAY_SECONDS, day_of, day_start, to_ts
+
+# end_ts None - интервал последней записи еще открыт, минуты считаются до текущего времени
+Interval = namedtuple('Interval', 'record_id start_ts end_ts project comment minutes')
+# worked - были ли записи; closed - последняя запись дня "стоп"/"ушел", отчет больше не меняется
+DayReport = namedtuple('DayReport', 'key employee day worked closed total_minutes intervals')
+DayMinutes = namedtuple('DayMinutes', 'day minutes')
+EmployeeDays = namedtuple('EmployeeDays', 'key employee worked total_minutes days')
+EmployeeMinutes = namedtuple('EmployeeMinutes', 'employee minutes')
+ProjectTotals = namedtuple('ProjectTotals', 'project total_minutes employees')
+# открытый интервал последней записи сотрудника
+Working = namedtuple('Working', 'key employee record_id start_ts project comment minutes')
+
+def day_report(logs, employee, day, key=None, now_ts=None):
+    """
+    отчет сотрудника за день по записям LogRow в порядке времени: интервал
+    записи длится до следующей записи, записи "стоп"/"ушел" интервалов не дают
+    """
+    if now_ts is None:
+        now_ts = to_ts(datetime.now())
+    intervals = []
+    total_minutes = 0
+    last = len(logs) - 1
+    for i, log in enumerate(logs):
+        if log.project.lower() in STOP_PROJECTS:
+            continue
+        end_ts = logs[i + 1].ts if i < last else None
+        minutes = ((now_ts if end_ts is None else end_ts) - log.ts) // 60
+        total_minutes += minutes
+        intervals.append(Interval(log.id, log.ts, end_ts, log.project, log.comment, minutes))
+
+    closed = bool(logs) and logs[-1].project.lower() in STOP_PROJECTS
+    return DayReport(key, employee, day, bool(logs), closed, total_minutes, intervals)
+
+def employee_day(employee, day):
+    """
+    отчет сотрудника за день; None, если записей нет
+    """
+    logs = get_daily_report(employee, day_start(day).strftime('%Y-%m-%d'))
+    if not logs:
+        return None
+    return day_report(logs, employee, day, directory.resolve(employee))
+
+def all_employees_day(day, include_inactive=False):
+    """
+    отчеты за день по сотрудникам справочника (directory.listing) в порядке
+    первой записи; None, если список пуст
+    """
+    employees = directory.listing(day, include_inactive)
+    if not employees:
+        return None
+
+    start_ts = day * DAY_SECONDS
+    employee_logs = {key: [LogRow._make(row[:5]) for row in rows if row[2]]
+                     for key, rows in iter_employee_rows(start_ts, start_ts + DAY_SECONDS - 60)}
+    now_ts = to_ts(datetime.now())
+    return [day_report(employee_logs.get(item.key, []), item.name, day, item.key, now_ts) for item in employees]
+
+def _employee_days(key, employee, summary):
+    if not summary:
+        return EmployeeDays(key, employee, False, 0, [])
+    return EmployeeDays(key, employee, True, summary['total_minutes'],
+                        [DayMinutes(day, minutes) for day, minutes in sorted(summary['days'].items())])
+
+def period_all(start_day, end_day, include_inactive=False):
+    """
+    минуты по дням за период по сотрудникам справочника; последняя запись дня
+    закрывается первой записью следующего рабочего дня. None, если список пуст
+    """
+    employees = directory.listing(start_day, include_inactive)
+    if not employees:
+        return None
+    totals = period_totals(start_day, end_day)
+    return [_employee_days(item.key, item.name, totals.get(item.key)) for item in employees]
+
+def period_hours(start_day, end_day, employee=None):
+    """
+    минуты по дням только по интервалам внутри дня: сотрудника employee или всех
+    с записями в порядке первой записи; пустой список, если записей нет
+    """
+    totals = period_totals(start_day, end_day, directory.resolve(employee) if employee else None, same_day=True)
+    return [_employee_days(key, summary['employee'], summary)
+            for key, summary in sorted(totals.items(), key=lambda item: item[1]['first'])]
+
+def projects(start_day, end_day):
+    """
+    минуты по проектам и сотрудникам, проекты по убыванию времени; None, если записей нет
+    """
+    if not has_entries(start_day, end_day):
+        return None
+    result = [ProjectTotals(project, data['total_minutes'],
+                            [EmployeeMinutes(employee, minutes) for employee, minutes in data['employees'].items()])
+              for project, data in project_report(start_day, end_day).items()]
+    return sorted(result, key=itemgetter(1), reverse=True)
+
+def records(start_day, end_day=None):
+    """
+    все записи за дни [start_day, end_day] в порядке времени
+    """
+    end_day = start_day if end_day is None else end_day
+    rows = archive.query('SELECT id, ts, employee, project, comment FROM user '
+                         'WHERE ts >= ? AND ts < ? ORDER BY ts, id',
+                         (start_day * DAY_SECONDS, (end_day + 1) * DAY_SECONDS), start_day, end_day,
+                         key=itemgetter(1, 0))
+    return [LogRow._make(row) for row in rows]
+
+def working_now(include_stale=False):
+    """
+    кто сейчас работает, по таблице status без просмотра записей: открытые
+    интервалы начатые сегодня у включенных сотрудников, в порядке начала;
+    include_stale - также не закрытые с прошлых дней и выключенные
+    """
+    now_ts = to_ts(datetime.now())
+    today = day_of(now_ts)
+    employees = {item.key: item for item in directory.employees()}
+    result = []
+    for item in status.current():
+        if (item.project or '').lower() in STOP_PROJECTS:
+            continue
+        employee = employees.get(item.key)
+        if not include_stale and (employee is not None and not employee.active or day_of(item.ts) != today):
+            continue
+        result.append(Working(item.key, employee.name if employee else item.employee, item.record_id, item.ts,
+                              item.project, item.comment, max(now_ts - item.ts, 0) // 60))
+    return result
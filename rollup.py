@@ -0,0 +1,216 @@
+"""
+Дневные итоги по сотрудникам: daily_totals (минуты по проектам за день)
+и daily_bounds (первая/последняя запись дня). Пересчитываются при каждой
+записи только для затронутого дня сотрудника, отчеты за период читают
+их вместо исходных записей.
+
+    python rollup.py rebuild [--db bd_nikos.sql]
+"""
+import argparse
+from itertools import groupby
+from operator import itemgetter
+
+from aggregation import STOP_PROJECTS
+import archive
+from schema import DAY_SECONDS, reset_data_version
+from storage import transaction
+
+def create_tables(conn):
+    """
+    создает таблицы дневных итогов
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS daily_totals('
+                 'employee_key TEXT NOT NULL,'
+                 'day INTEGER NOT NULL,'
+                 'project TEXT NOT NULL,'
+                 'employee TEXT,'
+                 'minutes INTEGER NOT NULL,'
+                 'entries INTEGER NOT NULL,'
+                 'closed INTEGER NOT NULL,'
+                 'first_ts INTEGER NOT NULL,'
+                 'first_id INTEGER NOT NULL,'
+                 'PRIMARY KEY (employee_key, day, project)) WITHOUT ROWID')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_daily_totals_day ON daily_totals(day)')
+    conn.execute('CREATE TABLE IF NOT EXISTS daily_bounds('
+                 'employee_key TEXT NOT NULL,'
+                 'day INTEGER NOT NULL,'
+                 'employee TEXT,'
+                 'first_ts INTEGER NOT NULL,'
+                 'first_id INTEGER NOT NULL,'
+                 'last_ts INTEGER NOT NULL,'
+                 'last_project TEXT,'
+                 'PRIMARY KEY (employee_key, day)) WITHOUT ROWID')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_daily_bounds_day ON daily_bounds(day)')
+
+def project_key(project):
+    """
+    ключ проекта как в /projectsPeriod: первая буква в нижнем регистре
+    """
+    return project[:1].lower() + project[1:]
+
+def is_stop(project):
+    return (project or '').lower() in STOP_PROJECTS
+
+def _write_day(conn, employee_key, day, rows):
+    """
+    записывает итоги одного дня сотрудника по его записям (ts, id)
+    """
+    conn.execute('DELETE FROM daily_totals WHERE employee_key = ? AND day = ?', (employee_key, day))
+    conn.execute('DELETE FROM daily_bounds WHERE employee_key = ? AND day = ?', (employee_key, day))
+    if not rows:
+        return
+
+    totals = {}
+    for i, (record_id, ts, employee, project, _) in enumerate(rows):
+        if is_stop(project):
+            continue
+        key = project_key(project or '')
+        if key not in totals:
+            totals[key] = [employee, 0, 0, 0, ts, record_id]
+        item = totals[key]
+        item[2] += 1
+        if i + 1 < len(rows):
+            item[1] += (rows[i + 1][1] - ts) // 60
+            item[3] += 1
+
+    conn.executemany('INSERT INTO daily_totals(employee_key, day, project, employee, minutes, '
+                     'entries, closed, first_ts, first_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     [(employee_key, day, key, *item) for key, item in totals.items()])
+    conn.execute('INSERT INTO daily_bounds(employee_key, day, employee, first_ts, first_id, '
+                 'last_ts, last_project) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                 (employee_key, day, rows[0][2], rows[0][1], rows[0][0], rows[-1][1], rows[-1][3]))
+
+def recompute_day(conn, employee_key, day):
+    """
+    пересчитывает итоги одного дня сотрудника, вызывается внутри транзакции записи
+    """
+    if employee_key is None or day is None:
+        return
+    rows = conn.execute('SELECT id, ts, employee, project, comment FROM user '
+                        'WHERE employee_key = ? AND ts BETWEEN ? AND ? ORDER BY ts, id',
+                        (employee_key, day * DAY_SECONDS, (day + 1) * DAY_SECONDS - 1)).fetchall()
+    _write_day(conn, employee_key, day, rows)
+
+def rebuild(conn):
+    """
+    полностью пересобирает дневные итоги по таблице user
+    """
+    conn.execute('DELETE FROM daily_totals')
+    conn.execute('DELETE FROM daily_bounds')
+    cursor = conn.execute('SELECT id, ts, employee, project, comment, employee_key, day FROM user '
+                          'WHERE ts IS NOT NULL AND employee_key IS NOT NULL '
+                          'ORDER BY employee_key, day, ts, id')
+    days = 0
+    for (key, day), rows in groupby(cursor, key=itemgetter(5, 6)):
+        _write_day(conn, key, day, [row[:5] for row in rows])
+        days += 1
+    return days
+
+def period_totals(start_day, end_day, employee_key=None, same_day=False):
+    """
+    Итоги по сотрудникам за дни [start_day, end_day]: {employee_key: {'employee',
+    'first': (ts, id), 'total_minutes', 'days': {день: минуты}}}.
+    same_day=False - последняя запись дня закрывается первой записью следующего
+    рабочего дня в периоде (как в /periodAll), иначе учитываются только
+    интервалы внутри дня (как в /period).
+    """
+    params = [start_day, end_day]
+    condition = 'day BETWEEN ? AND ?'
+    if employee_key:
+        condition += ' AND employee_key = ?'
+        params.append(employee_key)
+
+    day_totals = {(row[0], row[1]): row[2:] for row in archive.query(
+        f'SELECT employee_key, day, SUM(minutes), SUM(closed) FROM daily_totals '
+        f'WHERE {condition} GROUP BY employee_key, day', params, start_day, end_day)}
+    bounds = archive.query(f'SELECT employee_key, day, employee, first_ts, first_id, last_ts, last_project '
+                           f'FROM daily_bounds WHERE {condition} ORDER BY employee_key, day', params,
+                           start_day, end_day, key=itemgetter(0, 1))
+
+    result = {}
+    for key, employee_days in groupby(bounds, key=itemgetter(0)):
+        employee_days = list(employee_days)
+        total_minutes = 0
+        days = {}
+        for i, (_, day, _, _, _, last_ts, last_project) in enumerate(employee_days):
+            totals = day_totals.get((key, day))
+            if totals is None or (same_day and not totals[1]):
+                continue
+            minutes = totals[0]
+            if not same_day and i + 1 < len(employee_days) and not is_stop(last_project):
+                minutes += (employee_days[i + 1][3] - last_ts) // 60
+            total_minutes += minutes
+            days[day] = minutes
+
+        first = employee_days[0]
+        result[key] = {
+            'employee': first[2],
+            'first': (first[3], first[4]),
+            'total_minutes': total_minutes,
+            'days': days,
+        }
+    return result
+
+def has_entries(start_day, end_day):
+    """
+    есть ли записи за дни [start_day, end_day]
+    """
+    return bool(archive.query('SELECT 1 FROM daily_bounds WHERE day BETWEEN ? AND ? LIMIT 1',
+                              (start_day, end_day), start_day, end_day))
+
+def project_report(start_day, end_day):
+    """
+    Минуты по проектам и сотрудникам за дни [start_day, end_day]:
+    {проект: {'employees': {сотрудник: минуты}, 'total_minutes': минуты}}
+    в порядке первой записи проекта и сотрудника.
+    """
+    rows = archive.query('SELECT employee_key, day, project, employee, minutes, entries, first_ts, first_id '
+                         'FROM daily_totals WHERE day BETWEEN ? AND ? AND project != \'\'',
+                         (start_day, end_day), start_day, end_day)
+
+    # последняя запись всей выборки проект не открывает
+    last = archive.query('SELECT employee_key, day, project, ts, id FROM user WHERE ts BETWEEN ? AND ? '
+                         'ORDER BY ts DESC, id DESC LIMIT 1',
+                         (start_day * DAY_SECONDS, (end_day + 1) * DAY_SECONDS - 1), start_day, end_day)
+    last = [max(last, key=itemgetter(3, 4))] if last else []
+    if last and not is_stop(last[0][2]):
+        last_key = (last[0][0], last[0][1], project_key(last[0][2] or ''))
+        rows = [row for row in rows if row[:3] != last_key or row[5] > 1]
+
+    grouped = {}
+    for key, _, project, employee, minutes, _, first_ts, first_id in rows:
+        data = grouped.setdefault(project, {'first': (first_ts, first_id), 'employees': {}})
+        data['first'] = min(data['first'], (first_ts, first_id))
+        item = data['employees'].setdefault(key, [(first_ts, first_id), employee, 0])
+        if (first_ts, first_id) < item[0]:
+            item[0], item[1] = (first_ts, first_id), employee
+        item[2] += minutes
+
+    projects = {}
+    for project, data in sorted(grouped.items(), key=lambda item: item[1]['first']):
+        employees = sorted(data['employees'].values())
+        projects[project] = {
+            'employees': {employee: minutes for _, employee, minutes in employees},
+            'total_minutes': sum(minutes for _, _, minutes in employees),
+        }
+    return projects
+
+def main():
+    parser = argparse.ArgumentParser(description='Дневные итоги')
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--db', default=None)
+    args = parser.parse_args()
+
+    import storage
+    from bootstrap import init_db
+    if args.db:
+        storage.configure(args.db)
+    init_db()
+    with transaction() as conn:
+        days = rebuild(conn)
+        # итоги пересчитаны без изменения записей: кэши отчетов других процессов устарели за все дни
+        reset_data_version(conn)
+    print(f'Пересчитано дней: {days}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Планировщик заранее готовых отчетов.
+
+Каждое утро в config.SCHEDULE_TIME строится /reportAll за вчера, а в день
+недели config.SCHEDULE_WEEKDAY еще и /periodAll за прошлую неделю (пн-вс).
+Отчеты закрепляются в кэше (report_cache) под теми же ключами, что и у
+команд, поэтому одинаковые утренние запросы отдаются из кэша, пока записи
+за эти дни не изменятся. Чатам, подписанным командой /subscribe, готовый
+отчет отправляется сразу.
+
+Работает фоновым потоком в процессе бота (bot.py, bot_async.py).
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import config
+import metrics
+import storage
+
+logger = logging.getLogger(__name__)
+
+DAILY = 'день'
+WEEKLY = 'неделя'
+KINDS = {
+    DAILY: '/reportAll за вчера',
+    WEEKLY: '/periodAll за прошлую неделю',
+}
+
+# закрепленный отчет живет до следующего запуска с запасом
+PIN_MARGIN_SECONDS = 3600
+
+_stop = threading.Event()
+_thread = None
+
+def create_tables(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS subscriptions('
+                 'chat_id INTEGER NOT NULL,'
+                 'kind TEXT NOT NULL,'
+                 'PRIMARY KEY (chat_id, kind)) WITHOUT ROWID')
+
+def subscribe(chat_id, kinds):
+    with storage.transaction() as conn:
+        conn.executemany('INSERT OR IGNORE INTO subscriptions(chat_id, kind) VALUES (?, ?)',
+                         [(chat_id, kind) for kind in kinds])
+
+def unsubscribe(chat_id, kinds):
+    """
+    возвращает число отмененных подписок
+    """
+    with storage.transaction() as conn:
+        return sum(conn.execute('DELETE FROM subscriptions WHERE chat_id = ? AND kind = ?',
+                                (chat_id, kind)).rowcount for kind in kinds)
+
+def subscribers(kind):
+    return [row[0] for row in storage.query('SELECT chat_id FROM subscriptions WHERE kind = ?', (kind,))]
+
+def parse_time(value):
+    """
+    "ЧЧ:ММ" -> (часы, минуты)
+    """
+    moment = datetime.strptime(value.strip(), '%H:%M')
+    return moment.hour, moment.minute
+
+def next_run(kind, now):
+    """
+    время следующего запуска задачи после now
+    """
+    hour, minute = parse_time(config.SCHEDULE_TIME)
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run <= now:
+        run += timedelta(days=1)
+    if kind == WEEKLY:
+        run += timedelta(days=(config.SCHEDULE_WEEKDAY - run.weekday()) % 7)
+    return run
+
+def last_run(kind, now):
+    """
+    время последнего запуска задачи не позже now
+    """
+    return next_run(kind, now) - timedelta(days=7 if kind == WEEKLY else 1)
+
+def report_period(kind, run):
+    """
+    дни отчета (начало, конец) для запуска в момент run
+    """
+    end = run.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    return (end - timedelta(days=6) if kind == WEEKLY else end), end
+
+@metrics.timed(metrics.HANDLER, 'scheduled_report')
+def run_job(kind, run, bot=None):
+    """
+    строит отчет задачи kind для запуска run, закрепляет его в кэше
+    и отправляет подписчикам (если передан bot)
+    """
+    import commands
+
+    start, end = report_period(kind, run)
+    pin_seconds = (next_run(kind, run) - datetime.now()).total_seconds() + PIN_MARGIN_SECONDS
+    if kind == WEEKLY:
+        report = commands.prebuild_period_all(start, end, pin_seconds)
+    else:
+        report = commands.prebuild_report_all(end, pin_seconds)
+
+    if bot is None or report is None:
+        return report
+    for chat_id in subscribers(kind):
+        try:
+            commands.send_report_text(bot, chat_id, report)
+        except Exception:
+            logger.exception('Не удалось отправить отчет "%s" в чат %s', kind, chat_id)
+    return report
+
+def _loop(bot):
+    """
+    после запуска строит отчеты последних запусков (без рассылки), затем ждет расписания
+    """
+    now = datetime.now()
+    for kind in KINDS:
+        try:
+            run_job(kind, last_run(kind, now))
+        except Exception:
+            logger.exception('Ошибка планировщика: отчет "%s"', kind)
+
+    while not _stop.is_set():
+        now = datetime.now()
+        runs = {kind: next_run(kind, now) for kind in KINDS}
+        run = min(runs.values())
+        if _stop.wait((run - now).total_seconds()):
+            return
+        for kind, at in runs.items():
+            if at == run:
+                try:
+                    run_job(kind, run, bot)
+                except Exception:
+                    logger.exception('Ошибка планировщика: отчет "%s"', kind)
+
+def start(bot):
+    """
+    запускает планировщик в фоновом потоке; bot - объект с send_message
+    для рассылки подписчикам. Пустой config.SCHEDULE_TIME - планировщик выключен.
+    """
+    global _thread
+    if not config.SCHEDULE_TIME or _thread is not None:
+        return None
+    parse_time(config.SCHEDULE_TIME)
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, args=(bot,), name='scheduler', daemon=True)
+    _thread.start()
+    return _thread
+
+def stop():
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join()
+        _thread = None
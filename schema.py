@@ -0,0 +1,302 @@
+import re
+from datetime import datetime, timedelta
+
+# время хранится как "локальное время в секундах от 1970-01-01",
+# без часовых поясов, чтобы сутки всегда были ровно 86400 секунд
+EPOCH = datetime(1970, 1, 1)
+DAY_SECONDS = 86400
+
+MIGRATION_BATCH_SIZE = 5000
+
+_SUFFIX_RE = re.compile(r'\s\([^)]+\)')
+
+def to_ts(dt):
+    """
+    datetime -> целые секунды
+    """
+    return (dt - EPOCH) // timedelta(seconds=1)
+
+def hhmm(ts):
+    """
+    время суток "ЧЧ:ММ" из целых секунд без datetime
+    """
+    seconds = ts % DAY_SECONDS
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}'
+
+def from_ts(ts):
+    """
+    целые секунды -> datetime
+    """
+    return EPOCH + timedelta(seconds=ts)
+
+def day_of(ts):
+    """
+    номер дня для секунд
+    """
+    return ts // DAY_SECONDS
+
+def day_start(day):
+    """
+    номер дня -> datetime начала дня
+    """
+    return from_ts(day * DAY_SECONDS)
+
+def parse_time_stamp(time_stamp):
+    """
+    разбирает текстовый time_stamp (в т.ч. с суффиксом " (…)") в секунды,
+    для неразборчивых значений возвращает None
+    """
+    if time_stamp is None:
+        return None
+    try:
+        clean_time_stamp = str(time_stamp)
+        if '(' in clean_time_stamp:
+            clean_time_stamp = _SUFFIX_RE.sub('', clean_time_stamp)
+        # канонический вид "ГГГГ-ММ-ДД ЧЧ:ММ:СС" разбирается без strptime
+        if len(clean_time_stamp) == 19 and clean_time_stamp[10] == ' ' and clean_time_stamp[4] == '-':
+            return to_ts(datetime.fromisoformat(clean_time_stamp))
+        return to_ts(datetime.strptime(clean_time_stamp, '%Y-%m-%d %H:%M:%S'))
+    except ValueError:
+        return None
+
+def employee_key(employee):
+    """
+    нормализованный ключ сотрудника для поиска
+    """
+    if employee is None:
+        return None
+    return ' '.join(employee.split()).lower()
+
+# индексы таблицы user: при массовой загрузке их удаляют и создают заново
+USER_INDEXES = (
+    ('idx_user_emp_ts', 'user(employee_key, ts)'),
+    ('idx_user_ts', 'user(ts)'),
+)
+
+def create_user_indexes(conn):
+    for name, columns in USER_INDEXES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {columns}')
+
+def drop_user_indexes(conn):
+    for name, _ in USER_INDEXES:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+
+# версия данных (meta 'data') растет с каждым изменением таблицы user, в том числе
+# из других процессов; по ней веб-отчеты строят ETag (app.py). Таблица day_versions
+# хранит для сотрудника и дня (и для дня по всем сотрудникам, employee_key = '')
+# версию данных последнего изменения: по ней кэш отчетов (report_cache.py)
+# проверяет только дни и сотрудников своего отчета
+DATA_VERSION_EVENTS = ('INSERT', 'UPDATE', 'DELETE')
+ALL_EMPLOYEES = ''
+
+_DAY_VERSION_UPSERT = ('INSERT INTO day_versions(employee_key, day, version) {values} '
+                       'ON CONFLICT(employee_key, day) DO UPDATE SET version = excluded.version')
+
+def create_data_version_triggers(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS day_versions('
+                 'employee_key TEXT NOT NULL,'
+                 'day INTEGER NOT NULL,'
+                 'version INTEGER NOT NULL,'
+                 'PRIMARY KEY(employee_key, day)) WITHOUT ROWID')
+    for event in DATA_VERSION_EVENTS:
+        body = "UPDATE meta SET value = value + 1 WHERE name = 'data'; "
+        for row in ('OLD', 'NEW'):
+            if (event, row) in (('INSERT', 'OLD'), ('DELETE', 'NEW')):
+                continue
+            body += _DAY_VERSION_UPSERT.format(values=(
+                f"SELECT key, {row}.day, (SELECT value FROM meta WHERE name = 'data') "
+                f"FROM (SELECT COALESCE({row}.employee_key, '') AS key UNION SELECT '{ALL_EMPLOYEES}') "
+                f'WHERE {row}.day IS NOT NULL')) + '; '
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS user_data_version_{event.lower()} AFTER {event} ON user '
+                     f'BEGIN {body}END')
+
+def drop_data_version_triggers(conn):
+    for event in DATA_VERSION_EVENTS:
+        conn.execute(f'DROP TRIGGER IF EXISTS user_data_version_{event.lower()}')
+
+def bump_data_version(conn, days=()):
+    """
+    увеличивает версию данных за пары (employee_key, день) days - как триггеры
+    на те же изменения (массовая загрузка без триггеров, пересчет итогов)
+    """
+    conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'data'")
+    pairs = {(key or ALL_EMPLOYEES, day) for key, day in days if day is not None}
+    pairs.update({(ALL_EMPLOYEES, day) for _, day in pairs})
+    if pairs:
+        version = conn.execute("SELECT value FROM meta WHERE name = 'data'").fetchone()[0]
+        conn.executemany(_DAY_VERSION_UPSERT.format(values='VALUES (?, ?, ?)'),
+                         [(key, day, version) for key, day in pairs])
+
+def reset_data_version(conn):
+    """
+    отмечает изменение данных за все дни (пересборка итогов)
+    """
+    conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'data'")
+    conn.execute("INSERT OR REPLACE INTO meta(name, value) "
+                 "SELECT 'data_reset', value FROM meta WHERE name = 'data'")
+
+def data_version(conn):
+    """
+    версии данных и справочника сотрудников: "данные-справочник"
+    """
+    values = dict(conn.execute("SELECT name, value FROM meta WHERE name IN ('data', 'employees')"))
+    return f'{values.get("data", 0)}-{values.get("employees", 0)}'
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def _create_user_table(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS user('
+                 'id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                 'employee TEXT,'
+                 'project TEXT,'
+                 'time_stamp TEXT,'
+                 'comment TEXT);')
+
+def _add_typed_columns(conn):
+    """
+    добавляет ts/employee_key/day и переписывает старые строки пачками,
+    между пачками бот может писать в таблицу
+    """
+    columns = _columns(conn, 'user')
+    conn.execute('BEGIN IMMEDIATE')
+    for name in ('ts INTEGER', 'employee_key TEXT', 'day INTEGER'):
+        if name.split()[0] not in columns:
+            conn.execute(f'ALTER TABLE user ADD COLUMN {name}')
+    conn.execute('COMMIT')
+
+    last_id = 0
+    while True:
+        rows = conn.execute('SELECT id, employee, time_stamp FROM user '
+                            'WHERE id > ? ORDER BY id LIMIT ?',
+                            (last_id, MIGRATION_BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        batch = []
+        for record_id, employee, time_stamp in rows:
+            ts = parse_time_stamp(time_stamp)
+            batch.append((ts, employee_key(employee),
+                          day_of(ts) if ts is not None else None, record_id))
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany('UPDATE user SET ts = ?, employee_key = ?, day = ? WHERE id = ?', batch)
+        conn.execute('COMMIT')
+        last_id = rows[-1][0]
+
+    create_user_indexes(conn)
+
+def _create_rollups(conn):
+    """
+    таблицы дневных итогов с заполнением по существующим записям
+    """
+    import rollup
+
+    conn.execute('BEGIN IMMEDIATE')
+    rollup.create_tables(conn)
+    rollup.rebuild(conn)
+    conn.execute('COMMIT')
+
+def _create_archive_registry(conn):
+    """
+    реестр месяцев, перенесенных в архив
+    """
+    import archive
+
+    archive.create_registry(conn)
+
+def _create_directory(conn):
+    """
+    справочник сотрудников с заполнением по дневным итогам
+    """
+    import directory
+
+    conn.execute('BEGIN IMMEDIATE')
+    directory.create_tables(conn)
+    directory.rebuild(conn)
+    conn.execute('COMMIT')
+
+def _create_subscriptions(conn):
+    """
+    подписки чатов на отчеты планировщика
+    """
+    import scheduler
+
+    scheduler.create_tables(conn)
+
+def _create_edit_sessions(conn):
+    """
+    режим изменения записи по чатам
+    """
+    import sessions
+
+    sessions.create_tables(conn)
+
+def _key_edit_sessions_by_user(conn):
+    """
+    режим изменения записи по чату и пользователю; прежние режимы (по чату) сбрасываются
+    """
+    import sessions
+
+    conn.execute('BEGIN IMMEDIATE')
+    conn.execute('DROP TABLE IF EXISTS edit_sessions')
+    sessions.create_tables(conn)
+    conn.execute('COMMIT')
+
+def _create_day_versions(conn):
+    """
+    версии данных по сотрудникам и дням для кэша отчетов и версия списков сотрудников
+    """
+    import directory
+
+    conn.execute('BEGIN IMMEDIATE')
+    directory.create_tables(conn)
+    drop_data_version_triggers(conn)
+    create_data_version_triggers(conn)
+    conn.execute('COMMIT')
+
+def _create_data_version(conn):
+    """
+    счетчик версии данных для HTTP-кэширования отчетов
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    conn.execute('CREATE TABLE IF NOT EXISTS meta(name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    conn.execute("INSERT OR IGNORE INTO meta(name, value) VALUES ('data', 0)")
+    create_data_version_triggers(conn)
+    conn.execute('COMMIT')
+
+def _create_current_status(conn):
+    """
+    последняя запись каждого сотрудника для /now с заполнением по существующим записям
+    """
+    import status
+
+    conn.execute('BEGIN IMMEDIATE')
+    status.create_tables(conn)
+    status.rebuild(conn)
+    conn.execute('COMMIT')
+
+# версия схемы = индекс в списке + 1, хранится в PRAGMA user_version
+MIGRATIONS = [
+    _create_user_table,
+    _add_typed_columns,
+    _create_rollups,
+    _create_archive_registry,
+    _create_directory,
+    _create_subscriptions,
+    _create_edit_sessions,
+    _create_data_version,
+    _create_current_status,
+    _key_edit_sessions_by_user,
+    _create_day_versions,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(conn):
+    """
+    применяет недостающие миграции
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number in range(version, SCHEMA_VERSION):
+        MIGRATIONS[number](conn)
+        conn.execute(f'PRAGMA user_version = {number + 1}')
+    return SCHEMA_VERSION
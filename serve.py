@@ -0,0 +1,117 @@
+"""
+Веб-отчеты в рабочем режиме: несколько процессов на одном порту.
+
+Главный процесс приводит схему БД к текущей версии, открывает порт и
+запускает config.WEB_WORKERS процессов (fork, только POSIX). Каждый принимает соединения
+с общего сокета в своем многопоточном сервере Werkzeug и читает БД только
+через соединения mode=ro с PRAGMA query_only, поэтому не мешает боту писать.
+Поток запроса по завершении возвращает соединение в пул (app.release_connection),
+так что соединений в процессе не больше, чем одновременных запросов плюс
+storage.MAX_IDLE.
+Упавший процесс перезапускается, SIGTERM/SIGINT останавливают все.
+Ответы отчетов несут ETag по версии данных (app.conditional).
+
+    python serve.py [--workers 4] [--host 127.0.0.1] [--port 5000] [--db bd_nikos.sql]
+
+Прием обновлений Telegram (BOT_MODE=webhook) пишет в БД и остается
+в одном процессе: python app.py.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+
+import config
+import storage
+
+logger = logging.getLogger(__name__)
+
+# перезапуск упавшего процесса не чаще раза в столько секунд
+RESTART_DELAY = 1
+
+def _worker(app, listener):
+    """
+    тело процесса: свои соединения только на чтение, сервер на общем сокете
+    """
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    storage.configure(storage.DB_NAME, read_only=True)
+    host, port = listener.getsockname()[:2]
+    make_server(host, port, app, threaded=True, fd=listener.fileno()).serve_forever()
+
+def _spawn(app, listener):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _worker(app, listener)
+        except BaseException:
+            logger.exception('Процесс веб-отчетов %s остановлен с ошибкой', os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+def run(workers=None, host=None, port=None):
+    """
+    запускает процессы и следит за ними до сигнала остановки
+    """
+    from app import app
+    from bootstrap import init_db
+
+    workers = workers or config.WEB_WORKERS
+    init_db()
+    # соединения главного процесса не должны достаться дочерним
+    storage.close_all()
+
+    listener = socket.create_server((host or config.WEB_HOST, port or config.WEB_PORT), backlog=128)
+    listener.set_inheritable(True)
+    children = {_spawn(app, listener) for _ in range(workers)}
+    logger.info('Веб-отчеты: %s процессов на %s:%s', workers, *listener.getsockname()[:2])
+
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            children.discard(pid)
+            if not stopping:
+                logger.warning('Процесс веб-отчетов %s завершился (%s), перезапуск', pid, status)
+                time.sleep(RESTART_DELAY)
+                children.add(_spawn(app, listener))
+    finally:
+        listener.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Веб-отчеты в несколько процессов')
+    parser.add_argument('--workers', type=int, default=config.WEB_WORKERS)
+    parser.add_argument('--host', default=config.WEB_HOST)
+    parser.add_argument('--port', type=int, default=config.WEB_PORT)
+    parser.add_argument('--db', default=None)
+    args = parser.parse_args()
+
+    import metrics
+    metrics.configure_logging(config.LOG_FILE, config.LOG_LEVEL, config.LOG_SAMPLE_EVERY)
+    if args.db:
+        storage.configure(args.db)
+    run(args.workers, args.host, args.port)
+
+if __name__ == '__main__':
+    main()
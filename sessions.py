@@ -0,0 +1,51 @@
+"""
+Состояние диалога изменения записи, по чату и пользователю.
+
+Кнопка "Изменить" переводит нажавшего ее пользователя в режим изменения
+записи в этом чате (строка в edit_sessions), следующее его сообщение с записью
+меняет эту запись на месте и возвращает его в обычный режим; /cancel - выход
+без изменений. Сообщения других пользователей группы добавляют записи как обычно.
+Состояние хранится в БД и переживает перезапуск бота, устаревшее
+(старше config.EDIT_SESSION_MINUTES) не действует.
+"""
+import time
+
+import config
+import storage
+
+def create_tables(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS edit_sessions('
+                 'chat_id INTEGER NOT NULL,'
+                 'user_id INTEGER NOT NULL,'
+                 'record_id INTEGER NOT NULL,'
+                 'created INTEGER NOT NULL,'
+                 'PRIMARY KEY(chat_id, user_id)) WITHOUT ROWID')
+
+def start_edit(chat_id, user_id, record_id):
+    """
+    переводит пользователя в чате в режим изменения записи record_id (прежний режим заменяется)
+    """
+    with storage.transaction() as conn:
+        conn.execute('INSERT OR REPLACE INTO edit_sessions(chat_id, user_id, record_id, created) '
+                     'VALUES (?, ?, ?, ?)', (chat_id, user_id, record_id, int(time.time())))
+
+def editing(chat_id, user_id):
+    """
+    ИД записи, которую пользователь изменяет в чате, или None
+    """
+    row = storage.query_one('SELECT record_id, created FROM edit_sessions WHERE chat_id = ? AND user_id = ?',
+                            (chat_id, user_id))
+    if row is None:
+        return None
+    if row[1] < time.time() - config.EDIT_SESSION_MINUTES * 60:
+        finish(chat_id, user_id)
+        return None
+    return row[0]
+
+def finish(chat_id, user_id):
+    """
+    возвращает пользователя в чате в обычный режим; False, если режима изменения не было
+    """
+    with storage.transaction() as conn:
+        return conn.execute('DELETE FROM edit_sessions WHERE chat_id = ? AND user_id = ?',
+                            (chat_id, user_id)).rowcount > 0
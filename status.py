@@ -0,0 +1,84 @@
+"""
+Текущее состояние сотрудников: последняя запись каждого.
+
+Таблица current_status хранит по employee_key последнюю по времени запись
+(основная БД и архив). Интервал этой записи открыт, пока ее проект не
+"стоп"/"ушел": так /now и /api/now отвечают за O(сотрудников), не
+просматривая записи. Таблица обновляется в той же транзакции, что и записи:
+добавление сравнивает новую запись с текущей, удаление, изменение и
+псевдоним перечитывают последнюю запись сотрудника по индексу.
+"""
+from collections import namedtuple
+from operator import itemgetter
+
+import archive
+import storage
+from directory import ALL_DAYS
+
+Status = namedtuple('Status', 'key employee record_id ts project comment')
+
+LATEST_SQL = ('SELECT employee_key, employee, id, ts, project, comment FROM user '
+              'WHERE employee_key = ? AND ts IS NOT NULL ORDER BY ts DESC, id DESC LIMIT 1')
+
+def create_tables(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS current_status('
+                 'employee_key TEXT PRIMARY KEY,'
+                 'employee TEXT,'
+                 'record_id INTEGER NOT NULL,'
+                 'ts INTEGER NOT NULL,'
+                 'project TEXT,'
+                 'comment TEXT) WITHOUT ROWID')
+
+def record_entries(conn, rows):
+    """
+    учитывает новые записи (key, employee, id, ts, project, comment) внутри
+    транзакции записи: запись заменяет текущую, только если она позже
+    """
+    conn.executemany(
+        'INSERT INTO current_status(employee_key, employee, record_id, ts, project, comment) '
+        'VALUES (?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT(employee_key) DO UPDATE SET employee = excluded.employee, '
+        'record_id = excluded.record_id, ts = excluded.ts, project = excluded.project, comment = excluded.comment '
+        'WHERE excluded.ts > current_status.ts '
+        'OR excluded.ts = current_status.ts AND excluded.record_id > current_status.record_id',
+        [row for row in rows if row[0] and row[3] is not None])
+
+def refresh(conn, keys):
+    """
+    перечитывает последнюю запись сотрудников keys внутри транзакции (после удаления или изменения)
+    """
+    for key in {key for key in keys if key}:
+        row = conn.execute(LATEST_SQL, (key,)).fetchone()
+        if row is None:
+            # архивируются только закончившиеся месяцы: в архиве записи старше любых в основной БД
+            rows = archive.query(LATEST_SQL, (key,), *ALL_DAYS)
+            row = max(rows, key=itemgetter(3, 2)) if rows else None
+        if row is None:
+            conn.execute('DELETE FROM current_status WHERE employee_key = ?', (key,))
+        else:
+            conn.execute('INSERT OR REPLACE INTO current_status(employee_key, employee, record_id, ts, project, comment) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', row)
+
+def rebuild(conn):
+    """
+    заполняет таблицу заново по всем записям (миграция, массовая загрузка)
+    """
+    rows = archive.query('SELECT employee_key, employee, id, ts, project, comment FROM ('
+                         'SELECT *, ROW_NUMBER() OVER (PARTITION BY employee_key ORDER BY ts DESC, id DESC) AS n '
+                         "FROM user WHERE employee_key != '' AND ts IS NOT NULL) WHERE n = 1",
+                         (), *ALL_DAYS)
+    latest = {}
+    for row in rows:
+        current = latest.get(row[0])
+        if current is None or row[3:1:-1] > current[3:1:-1]:
+            latest[row[0]] = row
+    conn.execute('DELETE FROM current_status')
+    conn.executemany('INSERT INTO current_status(employee_key, employee, record_id, ts, project, comment) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', latest.values())
+
+def current():
+    """
+    последние записи всех сотрудников в порядке времени
+    """
+    return [Status._make(row) for row in storage.query(
+        'SELECT employee_key, employee, record_id, ts, project, comment FROM current_status ORDER BY ts, record_id')]
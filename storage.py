@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+DB_NAME = 'bd_nikos.sql'
+# соединения только на чтение (процессы веб-отчетов, serve.py)
+READ_ONLY = False
+
+# WAL позволяет читать отчеты параллельно с записью бота,
+# synchronous=NORMAL в режиме WAL не теряет целостность при сбое процесса
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -20000),
+    ('mmap_size', 268435456),
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),
+)
+# режим журнала и синхронизацию задает пишущий процесс
+READ_ONLY_PRAGMAS = (
+    ('query_only', 1),
+    ('cache_size', -20000),
+    ('mmap_size', 268435456),
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),
+)
+
+# размер кэша подготовленных выражений на соединение
+STATEMENT_CACHE_SIZE = 256
+# столько освобожденных соединений ждут следующего потока, остальные закрываются
+MAX_IDLE = 8
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = []
+_idle = []
+_generation = 0
+_write_lock = threading.RLock()
+
+def configure(db_name, read_only=False):
+    """
+    меняет путь к БД (и режим только на чтение) и закрывает соединения, открытые ранее
+    """
+    global DB_NAME, READ_ONLY
+    close_all()
+    DB_NAME = db_name
+    READ_ONLY = read_only
+
+def connect(db_name=None):
+    """
+    открывает новое соединение с настроенными PRAGMA
+    """
+    path = db_name or DB_NAME
+    if READ_ONLY:
+        path = f'file:{os.path.abspath(path)}?mode=ro'
+    conn = sqlite3.connect(path,
+                           uri=READ_ONLY,
+                           check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE,
+                           isolation_level=None)
+    for name, value in READ_ONLY_PRAGMAS if READ_ONLY else PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+def get_connection():
+    """
+    возвращает соединение текущего потока: свободное из пула или новое
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'generation', None) != _generation:
+        with _pool_lock:
+            conn = _idle.pop() if _idle else None
+            generation = _generation
+        if conn is None:
+            conn = connect()
+            with _pool_lock:
+                _pool.append(conn)
+        _local.conn = conn
+        _local.generation = generation
+    return conn
+
+def release():
+    """
+    Отдает соединение текущего потока в пул (например, в конце HTTP-запроса,
+    когда поток больше не нужен). Сверх MAX_IDLE свободных соединение закрывается.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        return
+    generation = getattr(_local, 'generation', None)
+    _local.conn = None
+    if generation != _generation:
+        # уже закрыто close_all
+        return
+    if conn.in_transaction:
+        conn.execute('ROLLBACK')
+    with _pool_lock:
+        if generation == _generation and len(_idle) < MAX_IDLE:
+            _idle.append(conn)
+            return
+        if conn in _pool:
+            _pool.remove(conn)
+    try:
+        conn.close()
+    except sqlite3.ProgrammingError:
+        pass
+
+def close_all():
+    """
+    закрывает все соединения пула
+    """
+    global _generation
+    with _pool_lock:
+        _generation += 1
+        _idle.clear()
+        while _pool:
+            conn = _pool.pop()
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+
+@metrics.timed(metrics.DB, 'query')
+def query(sql, params=()):
+    """
+    выполняет запрос на чтение и возвращает все строки
+    """
+    rows = get_connection().execute(sql, params).fetchall()
+    metrics.count_rows(len(rows))
+    return rows
+
+@metrics.timed(metrics.DB, 'query')
+def query_one(sql, params=()):
+    """
+    выполняет запрос на чтение и возвращает первую строку
+    """
+    row = get_connection().execute(sql, params).fetchone()
+    metrics.count_rows(row is not None)
+    return row
+
+@contextmanager
+def transaction():
+    """
+    транзакция на запись: писатель в процессе один, читатели не блокируются
+    """
+    conn = get_connection()
+    with _write_lock:
+        if conn.in_transaction:
+            # вложенная транзакция - работаем в рамках внешней
+            yield conn
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
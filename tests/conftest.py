@@ -0,0 +1,30 @@
+"""
+Общее для тестов: модули из корня репозитория и benchmarks импортируются
+как при запуске бота, db - временная БД со схемой текущей версии.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+@pytest.fixture
+def db(tmp_path):
+    """
+    путь к пустой БД, настроенной в storage; кэш отчетов очищен
+    """
+    import report_cache
+    import storage
+    from bootstrap import init_db
+
+    previous = storage.DB_NAME, storage.READ_ONLY
+    path = str(tmp_path / 'test.sql')
+    storage.configure(path)
+    init_db()
+    report_cache.clear()
+    yield path
+    report_cache.clear()
+    storage.configure(*previous)
@@ -0,0 +1,57 @@
+"""
+Пул обработчиков: обновления чата выполняются по очереди, тяжелый отчет
+не задерживает добавление записей того же чата, ошибка обработчика
+передается TeleBot.
+"""
+import threading
+from types import SimpleNamespace
+
+import dispatch
+
+WAIT = 5
+PROMPT = 1
+
+def message(chat_id, text, content_type='text'):
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id), text=text, content_type=content_type)
+
+def pool(exception_handler=None):
+    telebot = SimpleNamespace(exception_handler=exception_handler)
+    return dispatch.OrderedWorkerPool(telebot, fast_workers=4, heavy_workers=1, heavy_commands=['periodAll'])
+
+def test_updates_of_chat_run_in_order():
+    workers = pool()
+    done = []
+    finished = threading.Event()
+
+    def handle(update):
+        done.append(update.text)
+        if len(done) == 20:
+            finished.set()
+
+    for number in range(20):
+        workers.put(handle, message(1, str(number)))
+    assert finished.wait(WAIT)
+    workers.close()
+    assert done == [str(number) for number in range(20)]
+
+def test_heavy_report_does_not_delay_fast_updates():
+    workers = pool()
+    release = threading.Event()
+    added = threading.Event()
+    workers.put(lambda update: release.wait(WAIT), message(1, '/periodAll@bot 0101 3101'))
+    workers.put(lambda update: added.set(), message(1, '0501 0900\nиван\nАльфа'))
+    assert added.wait(PROMPT)
+    assert workers.pending()[dispatch.HEAVY_LANE] == 1
+    release.set()
+    workers.close()
+
+def test_handler_error_is_reported():
+    workers = pool()
+
+    def fail(update):
+        raise ValueError('ошибка')
+
+    workers.put(fail, message(1, '/start'))
+    assert workers.exception_event.wait(WAIT)
+    assert isinstance(workers.exception_info, ValueError)
+    workers.close()
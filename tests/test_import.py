@@ -0,0 +1,81 @@
+"""
+Массовая загрузка: записи читаются из итератора пачками, а не целиком;
+после ошибки на середине итоги, версии дней и триггеры согласованы
+с уже загруженными пачками.
+"""
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+import archive
+import database
+import importer
+import storage
+from schema import day_of, to_ts
+
+START = datetime(2025, 3, 1)
+
+def entries(count, consumed=None):
+    for i in range(count):
+        if consumed is not None:
+            consumed.append(i)
+        moment = START + timedelta(days=i // 10, hours=8 + i % 10)
+        yield f'сотрудник{i % 3}', 'Альфа', moment.strftime('%Y-%m-%d %H:%M:%S'), ''
+
+def triggers():
+    return {row[0] for row in storage.query("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+def test_entries_are_streamed_in_batches(db, monkeypatch):
+    consumed = []
+    read_at_insert = []
+    insert_batch = database._insert_batch
+
+    def recording_insert(rows):
+        read_at_insert.append(len(consumed))
+        return insert_batch(rows)
+
+    monkeypatch.setattr(database, '_insert_batch', recording_insert)
+    assert database.import_logs(entries(1050, consumed), batch_size=100) == 1050
+    assert read_at_insert == [100 * i for i in range(1, 11)] + [1050]
+    assert storage.query_one('SELECT COUNT(*) FROM user')[0] == 1050
+
+def test_versions_and_totals_after_import(db):
+    before = triggers()
+    database.import_logs(entries(30), batch_size=7)
+
+    assert triggers() == before
+    day = day_of(to_ts(START))
+    versions = dict(storage.query('SELECT employee_key, version FROM day_versions WHERE day = ?', (day,)))
+    assert set(versions) == {'', 'сотрудник0', 'сотрудник1', 'сотрудник2'}
+    assert storage.query_one('SELECT SUM(entries) FROM daily_totals')[0] == 30
+
+def test_failure_keeps_loaded_batches_consistent(db, monkeypatch):
+    archived = day_of(to_ts(START + timedelta(days=2)))
+
+    def check_writable(days):
+        if archived in days:
+            raise ValueError('месяц перенесен в архив')
+
+    monkeypatch.setattr(archive, 'check_writable', check_writable)
+    before = triggers()
+
+    with pytest.raises(ValueError):
+        database.import_logs(entries(40), batch_size=10)
+
+    # первые две пачки (дни 1 и 2 марта) загружены, третья отклонена целиком
+    assert storage.query_one('SELECT COUNT(*) FROM user')[0] == 20
+    assert storage.query_one('SELECT SUM(entries) FROM daily_totals')[0] == 20
+    assert triggers() == before
+    assert storage.query_one('SELECT COUNT(*) FROM current_status')[0] == 3
+
+def test_import_file_csv(db):
+    data = ('сотрудник;проект;дата;время;комментарий\n'
+            'Иван;Альфа;2025-03-01;0900;\n'
+            'иван;стоп;010325;18:00;\n'
+            ';Альфа;2025-03-01;0900;\n').encode('utf-8')
+    result = importer.import_file(io.BytesIO(data), 'csv')
+    assert (result.imported, result.skipped) == (2, 1)
+    assert result.errors[0][0] == 4
+    assert storage.query('SELECT employee, project, time_stamp FROM user ORDER BY id') == [
+        ('иван', 'Альфа', '2025-03-01 09:00:00'), ('иван', 'стоп', '2025-03-01 18:00:00')]
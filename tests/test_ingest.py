@@ -0,0 +1,116 @@
+"""
+Разбор сообщений с записями (ingest): сверка с прежним разбором из add_record
+на случайных сообщениях и крайние случаи прежнего регулярного выражения.
+Прежний разбор и генератор сообщений - из benchmarks/bench_ingest.py,
+замер скорости остается там.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import ingest
+from bench_ingest import expected_message, expected_parse, legacy_parse, parse_or_none, random_entry, random_now
+
+NOW = datetime(2026, 1, 5, 12)
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_fuzz_matches_legacy_parser(seed):
+    rnd = random.Random(seed)
+    for _ in range(1000):
+        now = random_now(rnd)
+        if rnd.random() < 0.8:
+            text = random_entry(rnd, now)
+            expected = expected_parse(text, now)
+            expected = None if expected is None else [expected]
+        else:
+            blocks = [random_entry(rnd, now) for _ in range(rnd.randint(2, 5))]
+            text = rnd.choice(['\n\n', '\n \n', '\n\n\n']).join(blocks)
+            expected = expected_message(blocks, now)
+        assert parse_or_none(text, now) == expected, (text, now)
+
+@pytest.mark.parametrize('text', [
+    '0501 0930 созвон\nиван\nАльфа',
+    '0930\nиван петр\nАльфа',
+    '  0930   два  пробела \n  Иван  \n  Проект 2  ',
+    # ДДММЧЧММ без пробела: дата - первые четыре цифры
+    '01011230\nиван\nАльфа',
+    # пять цифр даты: месяц - все цифры после дня
+    '01012 1230\nиван\nАльфа',
+    # ближайшая дата - прошлый год
+    '2812 0900\nиван\nАльфа',
+    '0101 0000\nиван\nАльфа',
+    '3112 2359\nиван\nАльфа',
+    '0501 0930\nиван\nАльфа\nлишняя строка',
+    '0501 0930 1230 ещё время\nиван\nАльфа',
+])
+def test_matches_legacy_parser(text):
+    assert parse_or_none(text, NOW) == [legacy_parse(text, NOW)]
+
+@pytest.mark.parametrize('text, error', [
+    ('0501 0930\nиван', ingest.FORMAT_ERROR),
+    ('', ingest.FORMAT_ERROR),
+    ('утром\nиван\nАльфа', ingest.TIME_LINE_ERROR),
+    ('093\nиван\nАльфа', ingest.TIME_LINE_ERROR),
+    ('3102 0930\nиван\nАльфа', ingest.DATE_ERROR + 'Неверная дата: 3102'),
+    ('0501 2400\nиван\nАльфа', ingest.DATE_ERROR + 'Неверное время: 2400'),
+    ('0501 0960\nиван\nАльфа', ingest.DATE_ERROR + 'Неверное время: 0960'),
+    ('١٢٣٤\nиван\nАльфа', ingest.TIME_LINE_ERROR),
+])
+def test_errors(text, error):
+    with pytest.raises(ValueError) as exc:
+        ingest.parse_message(text, NOW)
+    assert str(exc.value) == error
+    assert legacy_parse(text, NOW) is None
+
+def test_leap_day_without_last_year_is_rejected_like_legacy():
+    now = datetime(2024, 3, 1, 12)
+    text = '2902 0900\nиван\nАльфа'
+    assert legacy_parse(text, now) is None
+    assert parse_or_none(text, now) is None
+
+def test_full_date():
+    entry, = ingest.parse_message('150324 0815\nиван\nАльфа', NOW)
+    assert entry.date == datetime(2024, 3, 15)
+    assert entry.date_part == '150324'
+    assert entry.time_stamp == '2024-03-15 08:15:00'
+
+def test_without_date_uses_today():
+    entry, = ingest.parse_message('0815\nиван\nАльфа', datetime(2026, 2, 28, 9))
+    assert entry.date == datetime(2026, 2, 28)
+    assert entry.date_part == '2802'
+
+def test_several_entries():
+    entries = ingest.parse_message('0501 0900\nиван\nАльфа\n \n0501 1000\nпетр анна\nБета', NOW)
+    assert [(entry.time_stamp, entry.employees, entry.project) for entry in entries] == [
+        ('2026-01-05 09:00:00', ['иван'], 'Альфа'),
+        ('2026-01-05 10:00:00', ['петр', 'анна'], 'Бета'),
+    ]
+
+def test_error_in_one_of_several_entries():
+    with pytest.raises(ValueError) as exc:
+        ingest.parse_message('0501 0900\nиван\nАльфа\n\n0501 2500\nпетр\nБета', NOW)
+    assert str(exc.value) == f'Запись 2: {ingest.DATE_ERROR}Неверное время: 2500'
+
+def test_note_after_entry_is_ignored():
+    entries = ingest.parse_message('0501 0900\nиван\nАльфа\n\nзабыл отметиться вовремя\n\n0501 1000\nпетр\nБета', NOW)
+    assert [entry.time_stamp for entry in entries] == ['2026-01-05 09:00:00', '2026-01-05 10:00:00']
+    assert parse_or_none('0501 0900\nиван\nАльфа\n\nзаметка\nв две строки', NOW) == [
+        legacy_parse('0501 0900\nиван\nАльфа', NOW)]
+
+def test_short_first_block_is_an_error():
+    with pytest.raises(ValueError) as exc:
+        ingest.parse_message('заметка\n\n0501 0900\nиван\nАльфа', NOW)
+    assert str(exc.value) == f'Запись 1: {ingest.FORMAT_ERROR}'
+
+@pytest.mark.parametrize('moment', [time(0), time(0, 0, 0, 1), time(12), time(23, 59, 59, 999999)])
+def test_nearest_date_matches_legacy_at_any_time_of_day(moment):
+    # год с 29 февраля: сравниваются и годы по 365, и по 366 дней
+    day = date(2023, 9, 1)
+    while day < date(2024, 9, 1):
+        now = datetime.combine(day, moment)
+        # через 182-184 дня - граница полугода, где выбор года зависит от округления .days
+        for days in (-1, 0, 1, 182, 183, 184):
+            text = f'{(day + timedelta(days)).strftime("%d%m")} 0900\nиван\nАльфа'
+            assert parse_or_none(text, now) == expected_message([text], now), (text, now)
+        day += timedelta(days=1)
@@ -0,0 +1,90 @@
+"""
+Очередь исходящих сообщений: порядок и склейка внутри чата, 429 и медленные
+ответы задерживают только свой чат (или свой ответ на нажатие кнопки).
+"""
+import threading
+
+from telebot.apihelper import ApiTelegramException
+
+import outbound
+
+WAIT = 5
+# за столько секунд должен уйти ответ, которому никто не мешает
+PROMPT = 1
+
+class FakeBot:
+    """
+    запоминает вызовы; block - вызовы с этим первым аргументом отмечают started
+    и ждут release, rate_limited - первый вызов с этим первым аргументом получает 429
+    """
+
+    def __init__(self, block=None, rate_limited=None):
+        self.calls = []
+        self.block = block
+        self.rate_limited = rate_limited
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.sent = threading.Condition()
+
+    def _call(self, name, target, *args):
+        if target == self.block:
+            self.started.set()
+            self.release.wait(WAIT)
+        if target == self.rate_limited:
+            self.rate_limited = None
+            raise ApiTelegramException(name, None, {'error_code': 429, 'description': 'Too Many Requests',
+                                                    'parameters': {'retry_after': WAIT * 2}})
+        with self.sent:
+            self.calls.append((name, target, *args))
+            self.sent.notify_all()
+
+    def wait_for(self, predicate, timeout=WAIT):
+        with self.sent:
+            return self.sent.wait_for(lambda: predicate(self.calls), timeout)
+
+    def send_message(self, chat_id, text, **kwargs):
+        self._call('send_message', chat_id, text)
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        self._call('answer_callback_query', callback_query_id, text)
+
+def outbox(bot):
+    limiter = outbound.Limiter(global_rate=1000, chat_rate=1000, chat_burst=1000)
+    return outbound.Outbox(outbound.Sender(bot, workers=2, limiter=limiter))
+
+def test_messages_of_chat_are_ordered_and_coalesced():
+    bot = FakeBot(block=1)
+    box = outbox(bot)
+    box.send_message(1, 'первое')
+    # пока первое отправляется, следующие копятся в очереди чата
+    assert bot.started.wait(WAIT)
+    box.send_message(1, 'второе')
+    box.send_message(1, 'третье')
+    bot.release.set()
+    assert box.sender.flush(WAIT)
+    assert bot.calls == [('send_message', 1, 'первое'), ('send_message', 1, 'второе\nтретье')]
+
+def test_slow_callback_answer_does_not_delay_others():
+    bot = FakeBot(block='slow')
+    box = outbox(bot)
+    box.answer_callback_query('slow')
+    box.answer_callback_query('fast', text='готово')
+    assert bot.wait_for(lambda calls: ('answer_callback_query', 'fast', 'готово') in calls, PROMPT)
+    bot.release.set()
+    assert box.sender.flush(WAIT)
+
+def test_rate_limited_callback_answer_does_not_delay_others():
+    bot = FakeBot(rate_limited='limited')
+    box = outbox(bot)
+    box.answer_callback_query('limited')
+    box.answer_callback_query('other')
+    assert bot.wait_for(lambda calls: ('answer_callback_query', 'other', None) in calls, PROMPT)
+    assert ('answer_callback_query', 'limited', None) not in bot.calls
+
+def test_rate_limited_chat_does_not_delay_other_chats():
+    bot = FakeBot(rate_limited=1)
+    box = outbox(bot)
+    box.send_message(1, 'в чат с 429')
+    box.send_message(2, 'в другой чат')
+    assert bot.wait_for(lambda calls: ('send_message', 2, 'в другой чат') in calls, PROMPT)
+    assert ('send_message', 1, 'в чат с 429') not in bot.calls
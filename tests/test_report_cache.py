@@ -0,0 +1,102 @@
+"""
+Кэш отчетов: изменение записей сотрудника за день удаляет только отчеты,
+ключ которых покрывает этого сотрудника и день, - и в этом процессе
+(report_cache.invalidate), и при записи из другого (версии дней в БД).
+"""
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import commands
+import report_cache
+from database import add_log
+from schema import day_of, to_ts
+
+TODAY = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+YESTERDAY = TODAY - timedelta(days=1)
+EARLIER = TODAY - timedelta(days=3)
+
+def stamp(day, hour):
+    return (day + timedelta(hours=hour)).strftime('%Y-%m-%d %H:%M:%S')
+
+def cached(command, employee_key, day):
+    """
+    отчет через get_or_build; True, если он взят из кэша
+    """
+    built = []
+    day = day_of(to_ts(day))
+    report_cache.get_or_build(command, employee_key, day, day, lambda: (built.append(1) or 'отчет', True))
+    return not built
+
+@pytest.fixture
+def records(db):
+    for employee in ('иван', 'петр'):
+        for day in (EARLIER, YESTERDAY):
+            add_log(employee, 'Альфа', stamp(day, 9), '')
+            add_log(employee, 'стоп', stamp(day, 18), '')
+    report_cache.clear()
+    return db
+
+def other_process(path, employee, day):
+    """
+    запись сотрудника за день через отдельное соединение, как из importer или serve
+    """
+    conn = sqlite3.connect(path)
+    ts = to_ts(day + timedelta(hours=12))
+    conn.execute('INSERT INTO user(employee, project, time_stamp, comment, ts, employee_key, day) '
+                 'VALUES (?, ?, ?, ?, ?, ?, ?)', (employee, 'Бета', stamp(day, 12), '', ts, employee, day_of(ts)))
+    conn.commit()
+    conn.close()
+
+def test_prebuilt_report_survives_entry_for_today(records):
+    commands.prebuild_report_all(YESTERDAY, 3600)
+    assert cached('reportAll', None, YESTERDAY)
+
+    add_log('иван', 'Бета', stamp(TODAY, 9), '')
+
+    assert cached('reportAll', None, YESTERDAY)
+    stats = report_cache.stats()
+    assert stats['pinned'] == 1
+    assert stats['invalidations'] == 0
+
+@pytest.mark.parametrize('write', ['this_process', 'other_process'])
+def test_write_drops_only_covering_reports(records, write):
+    for employee_key in ('иван', 'петр', None):
+        for day in (EARLIER, YESTERDAY):
+            assert not cached('report', employee_key, day)
+
+    if write == 'this_process':
+        add_log('иван', 'Бета', stamp(YESTERDAY, 12), '')
+    else:
+        other_process(records, 'иван', YESTERDAY)
+
+    assert not cached('report', 'иван', YESTERDAY)
+    assert not cached('report', None, YESTERDAY)
+    assert cached('report', 'иван', EARLIER)
+    assert cached('report', 'петр', YESTERDAY)
+    assert cached('report', 'петр', EARLIER)
+    assert cached('report', None, EARLIER)
+
+def test_employee_list_change_drops_list_reports(records):
+    assert not cached('periodAll', None, EARLIER)
+    assert not cached('report', 'иван', EARLIER)
+
+    import directory
+    import storage
+    with storage.transaction() as conn:
+        directory._touch(conn, lists_changed=True)
+
+    assert not cached('periodAll', None, EARLIER)
+    assert cached('report', 'иван', EARLIER)
+
+def test_rollup_rebuild_drops_everything(records):
+    from rollup import rebuild
+    from schema import reset_data_version
+    import storage
+
+    assert not cached('report', 'иван', EARLIER)
+    with storage.transaction() as conn:
+        rebuild(conn)
+        reset_data_version(conn)
+    assert not cached('report', 'иван', EARLIER)
@@ -0,0 +1,61 @@
+"""
+Прием обновлений Telegram через webhook в Flask-приложении (app.py).
+
+Запрос от Telegram только кладется в ограниченную очередь и сразу получает
+ответ 200; разбор и обработку выполняет отдельный поток, который передает
+обновления в пул обработчиков бота. При переполненной очереди отвечаем 503,
+и Telegram повторит доставку позже.
+"""
+import logging
+import queue
+import threading
+
+from flask import Blueprint, abort, request
+from telebot import types
+
+import config
+
+logger = logging.getLogger(__name__)
+
+updates = queue.Queue(maxsize=config.WEBHOOK_QUEUE_SIZE)
+blueprint = Blueprint('webhook', __name__)
+
+@blueprint.route(config.WEBHOOK_PATH, methods=['POST'])
+def receive_update():
+    if config.WEBHOOK_SECRET and \
+            request.headers.get('X-Telegram-Bot-Api-Secret-Token') != config.WEBHOOK_SECRET:
+        abort(403)
+    try:
+        updates.put_nowait(request.get_data(as_text=True))
+    except queue.Full:
+        return 'Очередь обновлений переполнена', 503
+    return ''
+
+def _consume(bot):
+    """
+    разбирает обновления из очереди и передает их боту
+    """
+    while True:
+        payload = updates.get()
+        try:
+            bot.process_new_updates([types.Update.de_json(payload)])
+        except Exception:
+            logger.exception('Ошибка обработки обновления')
+        finally:
+            updates.task_done()
+
+def init_webhook(app):
+    """
+    подключает webhook к приложению, запускает обработку очереди
+    и регистрирует адрес webhook в Telegram
+    """
+    from handlers import bot
+
+    app.register_blueprint(blueprint)
+    threading.Thread(target=_consume, args=(bot,), daemon=True, name='webhook-consumer').start()
+
+    if config.WEBHOOK_URL:
+        bot.remove_webhook()
+        bot.set_webhook(url=config.WEBHOOK_URL.rstrip('/') + config.WEBHOOK_PATH,
+                        secret_token=config.WEBHOOK_SECRET or None)
+    return bot